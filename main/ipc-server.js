@@ -30,6 +30,8 @@ class IPCServer {
         this.handlers.set('/api/webview/submit', this.handleSubmitSearch.bind(this));
         this.handlers.set('/api/webview/execute-script', this.handleExecuteScript.bind(this));
         this.handlers.set('/api/webview/page-info', this.handleGetPageInfo.bind(this));
+        this.handlers.set('/api/webview/batch', this.handleBatch.bind(this));
+        this.handlers.set('/api/webview/wait', this.handleWait.bind(this));
 
         // 健康检查
         this.handlers.set('/api/health', this.handleHealth.bind(this));
@@ -86,12 +88,13 @@ class IPCServer {
             return { success: false, error: 'WebView控制器未初始化' };
         }
         
-        const { selector, text } = data;
+        // submit为true时输入后立即提交（代替单独的submit请求），为false时不自动提交
+        const { selector, text, submit } = data;
         if (!selector || text === undefined) {
             return { success: false, error: '缺少选择器或文本参数' };
         }
         
-        return await this.webViewController.inputText(selector, text);
+        return await this.webViewController.inputText(selector, text, submit);
     }
 
     async handleSubmitSearch(data) {
@@ -124,6 +127,163 @@ class IPCServer {
         return await this.webViewController.getPageInfo();
     }
     
+    // 等待页面满足指定条件
+    async handleWait(data) {
+        if (!this.webViewController) {
+            return { success: false, error: 'WebView控制器未初始化' };
+        }
+
+        const { condition, timeout = 10 } = data;
+        if (!condition || !condition.type) {
+            return { success: false, error: '缺少等待条件' };
+        }
+
+        return await this.webViewController.waitForCondition(condition, timeout * 1000);
+    }
+
+    // 批量执行操作计划，一次请求完成多个步骤
+    async handleBatch(data) {
+        if (!this.webViewController) {
+            return { success: false, error: 'WebView控制器未初始化' };
+        }
+
+        // deadlineMs: 客户端命令剩余的时间预算，用完后不再执行后续步骤和重试
+        const { steps, stopOnError = false, deadlineMs } = data;
+        if (!Array.isArray(steps) || steps.length === 0) {
+            return { success: false, error: '缺少操作步骤' };
+        }
+
+        const batchStart = Date.now();
+        const deadline = deadlineMs !== undefined ? batchStart + deadlineMs : Infinity;
+        const results = [];
+
+        for (let index = 0; index < steps.length; index++) {
+            const step = steps[index];
+            const stepStart = Date.now();
+            if (stepStart >= deadline) {
+                results.push({
+                    index: index,
+                    action: step.action,
+                    success: false,
+                    result: { success: false, error: '命令的时间预算已用完', error_code: 'DEADLINE_EXCEEDED' },
+                    attempts: 0,
+                    selector: step.target,
+                    elapsed_ms: 0
+                });
+                break;
+            }
+            const maxRetries = step.retries || (['input', 'click'].includes(step.action) ? 3 : 1);
+            const retryDelay = step.retryDelayMs !== undefined ? step.retryDelayMs : 2000;
+            // 重试间隔按指数增长（不超过retryMaxDelayMs，未指定时间隔固定）并加入抖动
+            const maxDelay = step.retryMaxDelayMs !== undefined ? step.retryMaxDelayMs : retryDelay;
+            // 备选选择器依次各尝试一次（不等待），之后只按间隔重试首选选择器
+            const candidates = ['input', 'click'].includes(step.action) && Array.isArray(step.alternatives)
+                ? [step.target, ...step.alternatives]
+                : [step.target];
+            const maxAttempts = candidates.length - 1 + maxRetries;
+
+            let result = null;
+            let attempts = 0;
+            let selector = step.target;
+            while (attempts < maxAttempts) {
+                selector = attempts < candidates.length ? candidates[attempts] : step.target;
+                attempts++;
+                try {
+                    result = await this.executeBatchStep({ ...step, target: selector }, deadline);
+                } catch (error) {
+                    result = { success: false, error: error.message };
+                }
+                if (result && result.success) {
+                    break;
+                }
+                // 与 retry_policy.classify 一致：只有元素未找到（可能还没渲染出来）值得等待后重试，
+                // 其他失败（元素不可见、脚本出错等）重试也不会成功
+                const reason = result ? `${result.error || ''} ${result.message || ''}` : '';
+                if (attempts >= candidates.length && !/未找到|not found/i.test(reason)) {
+                    break;
+                }
+                if (attempts < maxAttempts && attempts >= candidates.length) {
+                    const retry = attempts - candidates.length;
+                    const backoff = Math.min(maxDelay, retryDelay * Math.pow(2, retry));
+                    const delay = Math.min(backoff * (1 - 0.5 * Math.random()), deadline - Date.now());
+                    if (delay < 0) {
+                        break;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, delay));
+                }
+            }
+
+            results.push({
+                index: index,
+                action: step.action,
+                success: !!(result && result.success),
+                result: result,
+                attempts: attempts,
+                selector: selector,
+                elapsed_ms: Date.now() - stepStart
+            });
+
+            if (stopOnError && !(result && result.success)) {
+                break;
+            }
+        }
+
+        return {
+            success: results.some(r => r.success),
+            results: results,
+            completed: results.length,
+            total: steps.length,
+            elapsed_ms: Date.now() - batchStart
+        };
+    }
+
+    /**
+     * 执行批量计划中的一个步骤
+     * @param {Object} step - 操作步骤
+     * @param {number} deadline - 批量请求时间预算的截止时刻，所有等待都不超过剩余时间
+     */
+    async executeBatchStep(step, deadline = Infinity) {
+        const { action, target, value } = step;
+        const waitMs = (ms) => Math.max(0, Math.min(ms, deadline - Date.now()));
+
+        switch (action) {
+            case 'navigate': {
+                // 导航后等待新页面可用，代替固定等待
+                const waitReady = step.wait !== false;
+                const before = waitReady ? await this.webViewController.probePage() : null;
+                const result = await this.handleNavigate({ url: target });
+                if (!result || !result.success || !waitReady) {
+                    return result;
+                }
+
+                const conditions = [{ type: 'loaded' }];
+                if (before && before.url && before.url.replace(/\/$/, '') !== String(target).replace(/\/$/, '')) {
+                    conditions.unshift({ type: 'url_changed', from: before.url });
+                }
+                const ready = await this.webViewController.waitForCondition(
+                    { type: 'all', conditions }, waitMs((step.timeout || 10) * 1000)
+                );
+                return { ...result, ready: ready.success, ready_ms: ready.elapsed_ms };
+            }
+            case 'click':
+                return await this.handleClick({ selector: target });
+            case 'input':
+                return await this.handleInput({ selector: target, text: value || '', submit: step.submit });
+            case 'submit':
+                return await this.handleSubmitSearch({ selector: target });
+            case 'wait': {
+                if (step.condition) {
+                    return await this.webViewController.waitForCondition(step.condition, waitMs((step.timeout || 10) * 1000));
+                }
+                const seconds = parseFloat(value) || 2;
+                await new Promise(resolve => setTimeout(resolve, waitMs(seconds * 1000)));
+                return { success: true, message: `等待 ${seconds} 秒` };
+            }
+            default:
+                return { success: false, error: `不支持的操作类型: ${action}` };
+        }
+    }
+
     async handleHealth(data) {
         return {
             success: true,
@@ -234,6 +234,11 @@ app.on('activate', () => {
 app.on('before-quit', async () => {
     console.log('🔄 应用退出前清理...');
 
+    // 停止常驻Python自动化进程
+    if (PythonAutomationBridge && typeof PythonAutomationBridge.stopDaemons === 'function') {
+        PythonAutomationBridge.stopDaemons();
+    }
+
     // 停止AI服务器
     if (aiServer) {
         try {
@@ -295,9 +295,10 @@ class WebViewController {
     }
 
     // 输入文本 - 超简化版本
-    async inputText(selector, text) {
+    // submit: 未指定时输入约1秒后自动提交搜索（兼容旧行为）；true表示输入后立即提交；false表示只输入不提交
+    async inputText(selector, text, submit) {
         try {
-            // 跳过waitForReady，直接执行
+            // 跳过waitForReady，直接执行；等待页面脚本返回实际输入的元素（自动提交在页面内延后进行，不等待）
             const result = await this.mainWindow.webContents.executeJavaScript(`
                 (function() {
                     try {
@@ -306,69 +307,91 @@ class WebViewController {
                             return { success: false, error: 'WebView元素未找到' };
                         }
 
-                        // 直接执行，不等待回调
-                        webview.executeJavaScript(\`
-                            try {
-                                const selectors = ['${selector}', '#q', 'input[name="q"]', '.search-combobox-input'];
-                                let element = null;
-
-                                for (const sel of selectors) {
-                                    const el = document.querySelector(sel);
-                                    if (el) {
-                                        element = el;
-                                        break;
-                                    }
-                                }
-
-                                if (element) {
-                                    element.focus();
-                                    element.value = '${text.replace(/'/g, "\\'")}';
-                                    element.dispatchEvent(new Event('input', { bubbles: true }));
-                                    console.log('输入成功: ${text}');
+                        return new Promise((resolve) => {
+                            const webviewTimeout = setTimeout(() => {
+                                resolve({ success: false, error: 'WebView脚本执行超时' });
+                            }, 10000);
+
+                            webview.executeJavaScript(\`
+                                (function() {
+                                    try {
+                                        const selectors = ['${selector}', '#q', 'input[name="q"]', '.search-combobox-input'];
+                                        let element = null;
+                                        let matched = null;
+
+                                        for (const sel of selectors) {
+                                            const el = document.querySelector(sel);
+                                            if (el) {
+                                                element = el;
+                                                matched = sel;
+                                                break;
+                                            }
+                                        }
 
-                                    // 自动提交搜索
-                                    setTimeout(() => {
-                                        // 方法1: 按回车键
-                                        const enterEvent = new KeyboardEvent('keydown', {
-                                            key: 'Enter',
-                                            code: 'Enter',
-                                            keyCode: 13,
-                                            which: 13,
-                                            bubbles: true,
-                                            cancelable: true
-                                        });
-                                        element.dispatchEvent(enterEvent);
-                                        console.log('回车键已发送');
+                                        if (!element) {
+                                            console.log('未找到输入框');
+                                            return { success: false, message: '元素未找到' };
+                                        }
 
-                                        // 方法2: 尝试点击搜索按钮
-                                        setTimeout(() => {
-                                            const searchButtons = [
-                                                '.btn-search',
-                                                '#su',
-                                                'button[type="submit"]',
-                                                '.search-button',
-                                                '.s_btn'
-                                            ];
-
-                                            for (const btnSelector of searchButtons) {
-                                                const button = document.querySelector(btnSelector);
-                                                if (button && button.offsetParent !== null) {
-                                                    button.click();
-                                                    console.log('搜索按钮已点击:', btnSelector);
-                                                    break;
+                                        element.focus();
+                                        element.value = '${text.replace(/'/g, "\\'")}';
+                                        element.dispatchEvent(new Event('input', { bubbles: true }));
+                                        console.log('输入成功: ${text}');
+
+                                        // 自动提交搜索
+                                        if (${submit !== false}) setTimeout(() => {
+                                            // 方法1: 按回车键
+                                            const enterEvent = new KeyboardEvent('keydown', {
+                                                key: 'Enter',
+                                                code: 'Enter',
+                                                keyCode: 13,
+                                                which: 13,
+                                                bubbles: true,
+                                                cancelable: true
+                                            });
+                                            element.dispatchEvent(enterEvent);
+                                            console.log('回车键已发送');
+
+                                            // 方法2: 尝试点击搜索按钮
+                                            setTimeout(() => {
+                                                const searchButtons = [
+                                                    '.btn-search',
+                                                    '#su',
+                                                    'button[type="submit"]',
+                                                    '.search-button',
+                                                    '.s_btn'
+                                                ];
+
+                                                for (const btnSelector of searchButtons) {
+                                                    const button = document.querySelector(btnSelector);
+                                                    if (button && button.offsetParent !== null) {
+                                                        button.click();
+                                                        console.log('搜索按钮已点击:', btnSelector);
+                                                        break;
+                                                    }
                                                 }
-                                            }
-                                        }, 500);
-                                    }, 1000);
-                                } else {
-                                    console.log('未找到输入框');
-                                }
-                            } catch (error) {
-                                console.error('输入失败:', error);
-                            }
-                        \`);
-
-                        return { success: true, message: '输入命令已发送到WebView' };
+                                            }, 500);
+                                        }, ${submit === true ? 0 : 1000});
+
+                                        // selector为实际输入的元素所用的选择器，可能是默认输入框而不是请求的选择器
+                                        return {
+                                            success: true,
+                                            message: '输入完成',
+                                            element: { selector: matched, tagName: element.tagName }
+                                        };
+                                    } catch (error) {
+                                        console.error('输入失败:', error);
+                                        return { success: false, message: '输入失败: ' + error.message };
+                                    }
+                                })();
+                            \`).then((result) => {
+                                clearTimeout(webviewTimeout);
+                                resolve(result);
+                            }).catch((error) => {
+                                clearTimeout(webviewTimeout);
+                                resolve({ success: false, error: error.message });
+                            });
+                        });
 
                     } catch (error) {
                         return { success: false, error: error.message };
@@ -434,6 +457,18 @@ class WebViewController {
                 name: '京东',
                 searchSelectors: ['#key', 'input[name="keyword"]', '.text'],
                 submitSelectors: ['.button', 'button[type="submit"]', '.search-m']
+            },
+            'google': {
+                url: 'https://www.google.com',
+                name: '谷歌',
+                searchSelectors: ['textarea[name="q"]', 'input[name="q"]'],
+                submitSelectors: ['input[name="btnK"]', 'button[type="submit"]']
+            },
+            'bing': {
+                url: 'https://www.bing.com',
+                name: '必应',
+                searchSelectors: ['#sb_form_q', 'input[name="q"]'],
+                submitSelectors: ['#search_icon', 'label[for="sb_form_go"]', 'button[type="submit"]']
             }
         };
 
@@ -559,6 +594,131 @@ class WebViewController {
         `);
     }
 
+    // 探测页面状态：URL、加载状态、选择器是否存在、距最近一次DOM变化的时间
+    async probePage(selectors = []) {
+        // 脚本会嵌入模板字符串执行，选择器用字符编码传递以避免引号和反斜杠被改写
+        const encoded = selectors.map(selector =>
+            'String.fromCodePoint(' + Array.from(selector).map(c => c.codePointAt(0)).join(',') + ')'
+        );
+        const script = `
+            (function() {
+                var selectors = [${encoded.join(', ')}];
+                if (!window.__webviewWaiter) {
+                    window.__webviewWaiter = { lastMutation: Date.now() };
+                    try {
+                        new MutationObserver(function() {
+                            window.__webviewWaiter.lastMutation = Date.now();
+                        }).observe(document.documentElement, { subtree: true, childList: true, attributes: true, characterData: true });
+                    } catch (e) {}
+                }
+                return {
+                    url: window.location.href,
+                    readyState: document.readyState,
+                    found: selectors.map(function(selector) {
+                        try { return !!document.querySelector(selector); } catch (e) { return false; }
+                    }),
+                    quietMs: Date.now() - window.__webviewWaiter.lastMutation
+                };
+            })();
+        `;
+
+        try {
+            const result = await this.executeScript(script);
+            return result.success ? result.result : null;
+        } catch (error) {
+            // 页面切换过程中脚本可能执行失败，视为条件尚未满足
+            return null;
+        }
+    }
+
+    // 收集条件树中的选择器
+    collectSelectors(condition, selectors = []) {
+        if (condition.type === 'all' || condition.type === 'any') {
+            (condition.conditions || []).forEach(sub => this.collectSelectors(sub, selectors));
+        } else if (condition.type === 'selector' && condition.selector && !selectors.includes(condition.selector)) {
+            selectors.push(condition.selector);
+        }
+        return selectors;
+    }
+
+    // 判断页面状态是否满足条件，与 python_automation/page_waiter.py 保持一致
+    conditionMet(condition, state, selectors) {
+        const url = state.url || '';
+        switch (condition.type) {
+            case 'all':
+                return (condition.conditions || []).every(c => this.conditionMet(c, state, selectors));
+            case 'any':
+                return (condition.conditions || []).some(c => this.conditionMet(c, state, selectors));
+            case 'selector': {
+                const index = selectors.indexOf(condition.selector);
+                return index >= 0 && !!(state.found || [])[index];
+            }
+            case 'url_changed':
+                return !!url && url !== condition.from;
+            case 'url_contains':
+                return url.includes(condition.value || '');
+            case 'url_lacks':
+                return !!url && !url.includes(condition.value || '');
+            case 'loaded':
+                return state.readyState === 'interactive' || state.readyState === 'complete';
+            case 'ready':
+                return state.readyState === 'complete';
+            case 'dom_quiet':
+                return state.readyState !== 'loading' && (state.quietMs || 0) >= (condition.quiet_ms || 500);
+            default:
+                return false;
+        }
+    }
+
+    // 轮询等待条件满足，轮询间隔逐渐增大，超过timeoutMs返回失败；
+    // condition.fail_if 满足时（如被重定向到登录页）不再等待，立即返回失败
+    async waitForCondition(condition, timeoutMs = 10000) {
+        const start = Date.now();
+        const deadline = start + timeoutMs;
+        let failIf = condition.fail_if || null;
+        const selectors = this.collectSelectors(condition);
+        if (failIf) {
+            this.collectSelectors(failIf, selectors);
+        }
+        let interval = 100;
+        let polls = 0;
+        let state = null;
+
+        while (true) {
+            polls++;
+            state = await this.probePage(selectors);
+            if (polls === 1) {
+                condition = this.fillUrlChanged(condition, state ? state.url : null);
+                failIf = failIf && this.fillUrlChanged(failIf, state ? state.url : null);
+            }
+
+            if (state && this.conditionMet(condition, state, selectors)) {
+                return { success: true, message: '等待条件已满足', elapsed_ms: Date.now() - start, polls, state };
+            }
+            if (state && failIf && this.conditionMet(failIf, state, selectors)) {
+                return { success: false, error: `页面已不是等待的页面（${state.url}），停止等待`, elapsed_ms: Date.now() - start, polls, state };
+            }
+
+            const remaining = deadline - Date.now();
+            if (remaining <= 0) {
+                return { success: false, error: `等待条件超时（${timeoutMs / 1000}秒）`, elapsed_ms: Date.now() - start, polls, state };
+            }
+
+            await new Promise(resolve => setTimeout(resolve, Math.min(interval, remaining)));
+            interval = Math.min(interval * 1.5, 1000);
+        }
+    }
+
+    fillUrlChanged(condition, currentUrl) {
+        if (condition.type === 'all' || condition.type === 'any') {
+            return { ...condition, conditions: (condition.conditions || []).map(c => this.fillUrlChanged(c, currentUrl)) };
+        }
+        if (condition.type === 'url_changed' && !condition.from) {
+            return { ...condition, from: currentUrl };
+        }
+        return condition;
+    }
+
     // 获取当前页面信息
     async getPageInfo() {
         const script = `
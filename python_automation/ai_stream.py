@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+AI流式响应 - 读取chat-completions的SSE流，边接收边解析操作计划
+
+模型生成计划的同时，IncrementalPlanParser 逐字符跟踪JSON结构，
+recommended_actions 数组中的每个对象一闭合就被解析出来交给调用方执行，
+不必等待整个响应结束。完整内容仍会保留，结束后照常做整体解析和校验。
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+PLAN_KEY = "recommended_actions"
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """从SSE行流中取出每个事件的data内容，遇到 [DONE] 结束"""
+    data_lines: List[str] = []
+    for line in lines:
+        if line is None:
+            continue
+        line = line.rstrip("\r")
+        if not line:
+            # 空行表示一个事件结束
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data.strip() == "[DONE]":
+                    return
+                yield data
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data.strip() != "[DONE]":
+            yield data
+
+
+def iter_content_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """逐个产出流式响应中的文本增量"""
+    for data in iter_sse_data(lines):
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        choices = chunk.get("choices") or [{}]
+        delta = choices[0].get("delta") or choices[0].get("message") or {}
+        content = delta.get("content")
+        if content:
+            yield content
+
+
+class IncrementalPlanParser:
+    """增量解析AI返回的JSON，逐个取出 recommended_actions 中已完整的操作"""
+
+    def __init__(self, key: str = PLAN_KEY):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        # 当前所在的容器（'{' 或 '['）
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        # 操作数组所在的深度，以及当前操作对象的起始位置
+        self._actions_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.finished = False
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加一段文本，返回本次新完成的操作"""
+        self.text += chunk
+        text = self.text
+        completed = []
+
+        for index in range(self._pos, len(text)):
+            if self.finished:
+                break
+            char = text[index]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._expect_key and len(self._stack) == 1:
+                        self._last_key = text[self._string_start + 1:index]
+                continue
+
+            if not self._stack and char != "{":
+                # 跳过JSON之前的说明文字或代码块标记
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._stack.append(char)
+                self._expect_key = char == "{"
+                depth = len(self._stack)
+                if char == "[" and depth == 2 and self._last_key == self.key:
+                    self._actions_depth = depth
+                elif char == "{" and self._actions_depth is not None and depth == self._actions_depth + 1:
+                    self._item_start = index
+            elif char in "}]":
+                depth = len(self._stack)
+                if char == "}" and self._item_start is not None and depth == self._actions_depth + 1:
+                    try:
+                        item = json.loads(text[self._item_start:index + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._item_start = None
+                elif char == "]" and depth == self._actions_depth:
+                    self._actions_depth = None
+                self._stack.pop()
+                if not self._stack:
+                    self.finished = True
+            elif char == ",":
+                self._expect_key = self._stack[-1] == "{"
+            elif char == ":":
+                self._expect_key = False
+
+        self._pos = len(text)
+        self.emitted += len(completed)
+        return completed
+
+
+def stream_plan(lines: Iterable[str], on_action: Callable[[Dict[str, Any]], None]) -> str:
+    """
+    读取流式响应，每完成一个操作就回调on_action
+
+    Returns:
+        模型返回的完整文本，供调用方做最终解析和校验
+    """
+    parser = IncrementalPlanParser()
+    for delta in iter_content_deltas(lines):
+        for action in parser.feed(delta):
+            on_action(action)
+    return parser.text
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+页面分析记忆 - 同一任务在同一页面布局上复用AI分析结果
+
+页面指纹由三部分组成：去掉查询参数的URL、提炼后DOM的结构哈希（只看元素类型和选择器，
+不看商品标题等会变化的文本）、规范化后的任务描述。命中时直接返回缓存的
+elements_found/recommended_actions，条目按数量（LRU）和存活时间淘汰，执行失败时失效。
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from intent_cache import normalize_command
+
+# 缓存的分析字段，其余字段（原始响应等）不保存
+MEMO_FIELDS = ("analysis", "elements_found", "recommended_actions", "success", "confidence")
+
+
+def normalize_page_url(url: Optional[str]) -> str:
+    """保留协议、主机和路径；查询参数通常是搜索词，不影响页面布局"""
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def structure_hash(distilled: Optional[Dict[str, Any]]) -> str:
+    """提炼结果的结构哈希，链接地址和文本不参与计算"""
+    digest = hashlib.sha1()
+    for element in (distilled or {}).get("elements", []):
+        selectors = [s for s in element.get("selectors", []) if not s.startswith("a[href=")]
+        digest.update(f"{element.get('tag')}|{element.get('type', '')}|{','.join(selectors)}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def page_fingerprint(url: Optional[str], distilled: Optional[Dict[str, Any]], task_description: str) -> str:
+    """由URL、DOM结构和任务描述生成的记忆键"""
+    return f"{normalize_page_url(url)}#{structure_hash(distilled)}#{normalize_command(task_description)}"
+
+
+class AnalysisMemo:
+    """带TTL的页面分析LRU缓存"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        """
+        初始化分析记忆
+
+        Args:
+            max_entries: 最多保留的条目数，超出时淘汰最久未使用的条目
+            ttl_seconds: 条目的有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存的分析结果，未命中或已过期返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return dict(entry[0])
+
+    def put(self, key: str, analysis: Dict[str, Any]) -> bool:
+        """缓存成功且包含操作步骤的分析结果"""
+        if not analysis.get("success") or not analysis.get("recommended_actions"):
+            return False
+        with self._lock:
+            self._entries[key] = ({k: analysis[k] for k in MEMO_FIELDS if k in analysis}, time.time())
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return True
+
+    def invalidate(self, key: Optional[str]) -> bool:
+        """删除缓存的分析结果（例如按它执行失败时）"""
+        with self._lock:
+            if key is None or self._entries.pop(key, None) is None:
+                return False
+            self._stats["invalidations"] += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries)
+            }
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+异步WebView自动化 - WebViewAutomation/EnhancedWebViewAutomation 的asyncio版本
+
+每个阻塞的HTTP调用都交给线程池执行，底层仍复用共享的连接池传输层。
+互不依赖的页面数据（截图、HTML、页面信息）并发获取，多个自动化会话可以在同一个事件循环中运行。
+
+线程池中的调用在协程的上下文中执行（继承当前截止时间），并绑定一个自己的截止时间：
+协程被取消时取消该截止时间，线程中的阻塞调用在下一次IPC/AI请求或等待处停止，不会在取消后继续操作页面。
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from enhanced_webview_automation import EnhancedWebViewAutomation
+from http_transport import HttpTransport
+from retry_policy import Deadline, current_deadline, deadline_scope
+from webview_automation import WebViewAutomation
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_shared_executor(max_workers: int = 16) -> ThreadPoolExecutor:
+    """获取异步客户端共享的线程池（多个线程同时首次使用时只创建一个）"""
+    global _shared_executor
+    if _shared_executor is None:
+        with _shared_executor_lock:
+            if _shared_executor is None:
+                _shared_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="webview-async")
+    return _shared_executor
+
+
+class _AsyncRunner:
+    """把同步调用放到线程池中执行"""
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor]):
+        self.executor = executor or get_shared_executor()
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = Deadline(parent=current_deadline())
+
+        def run():
+            with deadline_scope(deadline=deadline):
+                return func(*args, **kwargs)
+
+        try:
+            return await loop.run_in_executor(self.executor, contextvars.copy_context().run, run)
+        except asyncio.CancelledError:
+            deadline.cancel("异步任务已取消")
+            raise
+
+
+class AsyncWebViewAutomation(_AsyncRunner):
+    """异步WebView自动化控制器"""
+
+    def __init__(self, ipc_port=3001, transport: Optional[HttpTransport] = None,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 automation: Optional[WebViewAutomation] = None):
+        """
+        初始化异步控制器
+
+        Args:
+            ipc_port: IPC通信端口
+            transport: HTTP传输层，默认使用共享连接池
+            executor: 执行阻塞调用的线程池，默认使用共享线程池
+            automation: 复用已有的同步控制器
+        """
+        super().__init__(executor)
+        self.automation = automation or WebViewAutomation(ipc_port=ipc_port, transport=transport)
+
+    def set_ai_api(self, ai_api_url: str):
+        """设置AI API地址"""
+        self.automation.set_ai_api(ai_api_url)
+
+    async def send_ipc_command(self, endpoint: str, **kwargs) -> Dict[str, Any]:
+        return await self._call(self.automation.send_ipc_command, endpoint, **kwargs)
+
+    async def navigate(self, url: str) -> Dict[str, Any]:
+        return await self._call(self.automation.navigate, url)
+
+    async def search(self, query: str, site: str = "baidu") -> Dict[str, Any]:
+        return await self._call(self.automation.search, query, site)
+
+    async def click_element(self, selector: str) -> Dict[str, Any]:
+        return await self._call(self.automation.click_element, selector)
+
+    async def input_text(self, selector: str, text: str) -> Dict[str, Any]:
+        return await self._call(self.automation.input_text, selector, text)
+
+    async def execute_script(self, script: str) -> Dict[str, Any]:
+        return await self._call(self.automation.execute_script, script)
+
+    async def get_page_info(self) -> Dict[str, Any]:
+        return await self._call(self.automation.get_page_info)
+
+    async def send_to_ai(self, prompt: str, context: str = "") -> Dict[str, Any]:
+        return await self._call(self.automation.send_to_ai, prompt, context)
+
+    async def execute_universal_command(self, command: str, use_ai: bool = True) -> Dict[str, Any]:
+        return await self._call(self.automation.execute_universal_command, command, use_ai=use_ai)
+
+
+class AsyncEnhancedWebViewAutomation(_AsyncRunner):
+    """异步增强WebView自动化控制器"""
+
+    def __init__(self, ipc_port=3001, transport: Optional[HttpTransport] = None,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 automation: Optional[EnhancedWebViewAutomation] = None):
+        super().__init__(executor)
+        self.automation = automation or EnhancedWebViewAutomation(ipc_port=ipc_port, transport=transport)
+
+    def set_ai_api(self, ai_api_url: str):
+        """设置AI API地址"""
+        self.automation.set_ai_api(ai_api_url)
+
+    async def send_ipc_command(self, endpoint: str, **kwargs) -> Dict[str, Any]:
+        return await self._call(self.automation.send_ipc_command, endpoint, **kwargs)
+
+    async def get_page_screenshot(self) -> Optional[str]:
+        return await self._call(self.automation.get_page_screenshot)
+
+    async def get_page_html(self) -> Optional[str]:
+        return await self._call(self.automation.get_page_html)
+
+    async def get_page_info(self) -> Dict[str, Any]:
+        return await self._call(self.automation.get_page_info)
+
+    async def fetch_page_data(self, include_page_info: bool = True) -> Dict[str, Any]:
+        """
+        并发获取截图、HTML和页面信息
+
+        任一子请求被取消时其余请求一并取消；单个请求失败不影响其他结果。
+        """
+        fetches = [self.get_page_screenshot(), self.get_page_html()]
+        if include_page_info:
+            fetches.append(self.get_page_info())
+
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        screenshot, html = (None if isinstance(r, Exception) else r for r in results[:2])
+        page_info = {}
+        if include_page_info and isinstance(results[2], dict):
+            page_info = results[2]
+
+        return {"screenshot": screenshot, "html": html, "page_info": page_info}
+
+    async def analyze_page_with_ai(self, task_description: str) -> Dict[str, Any]:
+        """并发获取页面数据后使用AI分析页面"""
+        if not self.automation.ai_api_url:
+            return {"success": False, "error": "AI API未配置"}
+
+        page_data = await self.fetch_page_data()
+        return await self._call(self.automation.analyze_page_with_ai, task_description, page_data=page_data)
+
+    async def execute_single_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._call(self.automation.execute_single_action, action)
+
+    async def execute_action_plan(self, actions: List[Dict[str, Any]],
+                                  stop_on_error: bool = False) -> Dict[str, Any]:
+        return await self._call(self.automation.execute_action_plan, actions, stop_on_error=stop_on_error)
+
+    async def execute_ai_guided_task(self, task_description: str, timeout: Optional[float] = None,
+                                     use_ai: bool = True) -> Dict[str, Any]:
+        """执行AI指导的任务，与同步版本的流程完全相同（计划模板、流式执行、规则分析）"""
+        return await self._call(self.automation.execute_ai_guided_task, task_description,
+                                timeout=timeout, use_ai=use_ai)
+
+
+async def run_sessions(sessions: List[AsyncEnhancedWebViewAutomation], tasks: List[str],
+                       timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    在同一个事件循环中并发驱动多个自动化会话
+
+    Args:
+        sessions: 自动化会话列表，与tasks一一对应
+        tasks: 任务描述列表
+        timeout: 整体超时（秒），超时后取消未完成的任务；同时作为各任务的截止时间，
+                 线程中的请求和等待不会超过剩余时间
+
+    Returns:
+        与tasks顺序一致的结果列表
+    """
+    # 任务创建时复制当前上下文，各任务继承这里的截止时间
+    with deadline_scope(timeout):
+        pending = [asyncio.ensure_future(session.execute_ai_guided_task(task))
+                   for session, task in zip(sessions, tasks)]
+
+    done, not_done = await asyncio.wait(pending, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+
+    results = []
+    for future, task in zip(pending, tasks):
+        if future in done and not future.cancelled() and future.exception() is None:
+            results.append(future.result())
+        elif future in done and not future.cancelled():
+            results.append({"success": False, "error": str(future.exception()), "task_description": task})
+        else:
+            results.append({"success": False, "error": "任务已取消", "task_description": task})
+    return results
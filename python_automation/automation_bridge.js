@@ -7,6 +7,171 @@ const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs').promises;
 
+// 常驻进程单条命令的默认时间预算，随请求的timeout字段传给Python端
+const DAEMON_REQUEST_TIMEOUT_MS = 120000;
+// Python端在时间预算内自行结束命令，客户端多等这么久仍没有响应就认为进程已挂起
+const DAEMON_TIMEOUT_GRACE_MS = 5000;
+
+/**
+ * 常驻Python自动化进程
+ * 以 --server 模式启动脚本，通过stdin/stdout的JSON Lines协议复用同一个进程处理多条命令
+ */
+class PythonAutomationDaemon {
+    constructor(pythonCmd, scriptPath, args = []) {
+        this.pythonCmd = pythonCmd;
+        this.scriptPath = scriptPath;
+        this.args = args;
+        this.process = null;
+        this.ready = null;
+        this.pending = new Map();
+        this.nextId = 1;
+        this.buffer = '';
+        this.stderr = '';
+    }
+
+    start() {
+        if (this.ready) {
+            return this.ready;
+        }
+
+        this.ready = new Promise((resolve, reject) => {
+            const python = spawn(this.pythonCmd, [this.scriptPath, '--server', ...this.args], {
+                stdio: ['pipe', 'pipe', 'pipe'],
+                cwd: __dirname,
+                env: {
+                    ...process.env,
+                    PYTHONIOENCODING: 'utf-8',
+                    LANG: 'zh_CN.UTF-8',
+                    LC_ALL: 'zh_CN.UTF-8'
+                }
+            });
+            this.process = python;
+
+            python.stdout.on('data', (data) => {
+                this.buffer += data.toString('utf8');
+                let index;
+                while ((index = this.buffer.indexOf('\n')) >= 0) {
+                    const line = this.buffer.slice(0, index).trim();
+                    this.buffer = this.buffer.slice(index + 1);
+                    if (line) {
+                        this.handleLine(line, resolve);
+                    }
+                }
+            });
+
+            python.stderr.on('data', (data) => {
+                // 只保留最近的stderr输出，用于错误信息
+                this.stderr = (this.stderr + data.toString('utf8')).slice(-8192);
+            });
+
+            // 进程退出时的写入错误由close事件统一处理
+            python.stdin.on('error', () => {});
+
+            python.on('close', (code) => {
+                const error = new Error(`Python常驻进程退出码: ${code}, 错误: ${this.stderr}`);
+                reject(error);
+                if (this.process !== python) {
+                    // 已经被kill()结束，等待中的请求已经失败
+                    return;
+                }
+                this.rejectPending(error);
+                this.process = null;
+                this.ready = null;
+            });
+
+            python.on('error', (error) => {
+                this.process = null;
+                this.ready = null;
+                reject(new Error(`启动Python常驻进程失败: ${error.message}`));
+            });
+        });
+
+        return this.ready;
+    }
+
+    handleLine(line, onReady) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (error) {
+            return;
+        }
+
+        if (message.type === 'ready') {
+            onReady(message);
+            return;
+        }
+
+        const entry = this.pending.get(message.id);
+        if (entry) {
+            this.pending.delete(message.id);
+            clearTimeout(entry.timer);
+            entry.resolve(message);
+        }
+    }
+
+    /**
+     * 发送一条请求
+     * @param {Object} payload - 请求内容
+     * @param {number} timeoutMs - 等待响应的最长时间，超时后请求以DAEMON_TIMEOUT错误失败
+     */
+    async request(payload, timeoutMs = DAEMON_REQUEST_TIMEOUT_MS + DAEMON_TIMEOUT_GRACE_MS) {
+        await this.start();
+
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                if (!this.pending.delete(id)) {
+                    return;
+                }
+                const error = new Error(`Python常驻进程在${timeoutMs}ms内没有响应`);
+                error.code = 'DAEMON_TIMEOUT';
+                reject(error);
+                // 常驻进程依次处理请求，挂起的命令会阻塞之后的所有请求，结束进程让下次请求重新启动
+                this.kill();
+            }, timeoutMs);
+            this.pending.set(id, {
+                resolve,
+                reject: (error) => {
+                    clearTimeout(timer);
+                    reject(error);
+                },
+                timer
+            });
+            this.process.stdin.write(JSON.stringify({ id, ...payload }) + '\n', 'utf8');
+        });
+    }
+
+    rejectPending(error) {
+        for (const { reject } of this.pending.values()) {
+            reject(error);
+        }
+        this.pending.clear();
+    }
+
+    /**
+     * 结束挂起的进程，排队中的请求立即失败，下次请求重新启动进程
+     */
+    kill() {
+        if (this.process) {
+            const python = this.process;
+            this.process = null;
+            this.ready = null;
+            this.rejectPending(new Error('Python常驻进程已被结束'));
+            python.kill();
+        }
+    }
+
+    stop() {
+        if (this.process) {
+            this.process.stdin.end(JSON.stringify({ type: 'shutdown' }) + '\n');
+        }
+    }
+}
+
+// 所有桥接器实例共享常驻进程，按脚本路径和参数区分
+const sharedDaemons = new Map();
+
 class PythonAutomationBridge {
     constructor() {
         this.pythonPaths = ['python', 'python3', 'py']; // 尝试多个Python命令
@@ -58,10 +223,27 @@ class PythonAutomationBridge {
 
 
 
-            // 添加IPC端口参数
-            args.push('--ipc-port', '3001');
+            // 添加IPC端口参数（多个Electron实例时由Python端按健康状态和负载分发）
+            args.push(...this.ipcPortArgs(options));
 
+            // 优先使用常驻进程，避免每条命令都启动一次Python解释器
+            if (options.persistent !== false) {
+                try {
+                    return await this.runDaemonCommand(scriptPath, command, options);
+                } catch (error) {
+                    if (error.code === 'DAEMON_TIMEOUT') {
+                        // 命令可能已经执行了一部分，不能再用单次进程重复执行
+                        throw error;
+                    }
+                    console.warn('常驻进程执行失败，回退到单次进程:', error.message);
+                }
+            }
 
+            if (options.noAi) {
+                // 不使用AI的规则命令由快速启动入口执行，只加载标准库和规则引擎，进程启动更快
+                args[0] = path.join(__dirname, 'quick_command.py');
+                args.push('--no-ai');
+            }
 
             // 执行Python脚本
             const result = await this.runPythonScript(args);
@@ -128,6 +310,74 @@ class PythonAutomationBridge {
         }
     }
 
+    /**
+     * 通过常驻进程执行命令
+     * @param {string} scriptPath - 脚本路径
+     * @param {string} command - 自然语言命令
+     * @param {Object} options - 选项
+     * @returns {Promise<Object>} 执行结果，格式与runPythonScript一致
+     */
+    async runDaemonCommand(scriptPath, command, options = {}) {
+        const pythonCmd = await this.findPythonPath();
+        if (!pythonCmd) {
+            throw new Error('未找到可用的Python命令');
+        }
+
+        const args = this.ipcPortArgs(options);
+        const key = [pythonCmd, scriptPath, ...args].join(' ');
+        let daemon = sharedDaemons.get(key);
+        if (!daemon) {
+            daemon = new PythonAutomationDaemon(pythonCmd, scriptPath, args);
+            sharedDaemons.set(key, daemon);
+        }
+
+        const request = { command: command };
+        if (options.aiApi) {
+            // 未指定时沿用常驻进程启动时的AI接口
+            request.ai_api = options.aiApi;
+        }
+        if (options.noAi) {
+            request.use_ai = false;
+        }
+        if (options.session) {
+            // 同一会话的命令固定在同一个Electron实例上执行
+            request.session = options.session;
+        }
+        const timeoutMs = options.timeoutMs || DAEMON_REQUEST_TIMEOUT_MS;
+        request.timeout = timeoutMs / 1000;
+        const response = await daemon.request(request, timeoutMs + DAEMON_TIMEOUT_GRACE_MS);
+
+        return {
+            success: true,
+            message: 'Python自动化执行成功',
+            result: response.result || { success: response.success, error: response.error },
+            elapsedMs: response.elapsed_ms
+        };
+    }
+
+    /**
+     * 构建IPC端口参数
+     * @param {Object} options - 选项，ipcPorts为多个实例的端口（数组或逗号分隔的字符串）
+     * @returns {Array} 命令行参数，未配置多实例时使用默认的3001端口
+     */
+    ipcPortArgs(options = {}) {
+        const ports = options.ipcPorts || process.env.WEBVIEW_IPC_PORTS;
+        if (ports && ports.length) {
+            return ['--ipc-ports', Array.isArray(ports) ? ports.join(',') : String(ports)];
+        }
+        return ['--ipc-port', '3001'];
+    }
+
+    /**
+     * 停止所有常驻Python进程
+     */
+    static stopDaemons() {
+        for (const daemon of sharedDaemons.values()) {
+            daemon.stop();
+        }
+        sharedDaemons.clear();
+    }
+
     /**
      * 运行Python脚本
      * @param {Array} args - 命令行参数
@@ -356,6 +606,7 @@ class PythonAutomationBridge {
 // 导出类和便捷函数
 module.exports = {
     PythonAutomationBridge,
+    PythonAutomationDaemon,
     
     // 便捷函数：执行淘宝搜索
     async searchTaobao(query, options = {}) {
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+常驻自动化服务 - 让同一个自动化实例在一个Python进程内处理多条命令
+
+协议为JSON Lines，每行一个请求/响应，通过 stdin/stdout 或本地Unix Socket传输：
+
+    请求: {"id": 1, "command": "打开淘宝搜索手机", "use_ai": false, "timeout": 30}
+    响应: {"id": 1, "success": true, "result": {...}, "elapsed_ms": 12.3}
+
+特殊请求类型（"type" 字段）：
+    - ping: 存活检测
+    - stats: 运行统计（如多实例端口池中各实例的负载和错误率）
+    - cancel: 取消排队中或正在执行的命令（"target" 为该命令请求的id），
+      正在进行的等待和重试立即结束，后续IPC/AI请求不再发出；需要通过Unix Socket的另一个连接发送
+    - shutdown: 处理完当前请求后退出
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, Optional, TextIO
+
+from retry_policy import Deadline, deadline_scope
+
+
+class AutomationServer:
+    """常驻自动化服务"""
+
+    def __init__(self, runner: Callable[[Dict[str, Any]], Dict[str, Any]], name: str = "automation",
+                 stats: Optional[Callable[[], Dict[str, Any]]] = None):
+        """
+        初始化常驻服务
+
+        Args:
+            runner: 执行单个命令请求并返回结果字典的函数
+            name: 服务名称，出现在ready消息中
+            stats: 返回运行统计的函数，响应stats请求
+        """
+        self.runner = runner
+        self.name = name
+        self.stats = stats
+        self.handled = 0
+        self._running = False
+        # 自动化实例不是线程安全的，同一时间只执行一个命令
+        self._lock = threading.Lock()
+        # 排队中和正在执行的命令，按请求ID取消
+        self._active: Dict[Any, Deadline] = {}
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理单个请求，返回带请求ID的响应"""
+        request_id = request.get("id")
+        request_type = request.get("type", "execute")
+
+        if request_type == "ping":
+            return {"id": request_id, "success": True, "type": "pong", "handled": self.handled}
+
+        if request_type == "stats":
+            return {"id": request_id, "success": True, "type": "stats", "handled": self.handled,
+                    **(self.stats() if self.stats else {})}
+
+        if request_type == "cancel":
+            deadline = self._active.get(request.get("target"))
+            if deadline is None:
+                return {"id": request_id, "success": False, "type": "cancel", "error": "没有找到要取消的命令"}
+            deadline.cancel()
+            return {"id": request_id, "success": True, "type": "cancel"}
+
+        if request_type == "shutdown":
+            self._running = False
+            return {"id": request_id, "success": True, "type": "shutdown"}
+
+        if request_type != "execute":
+            return {"id": request_id, "success": False, "error": f"不支持的请求类型: {request_type}"}
+
+        if not request.get("command"):
+            return {"id": request_id, "success": False, "error": "缺少command参数"}
+
+        start = time.perf_counter()
+        deadline = Deadline()
+        if request_id is not None:
+            self._active[request_id] = deadline
+        try:
+            with self._lock:
+                try:
+                    # 命令执行过程中的进度输出转到stderr，避免破坏JSON Lines协议
+                    with redirect_stdout(sys.stderr), deadline_scope(deadline=deadline):
+                        result = self.runner(request)
+                except Exception as e:
+                    result = {"success": False, "error": str(e), "command": request.get("command")}
+                self.handled += 1
+        finally:
+            if self._active.get(request_id) is deadline:
+                del self._active[request_id]
+
+        return {
+            "id": request_id,
+            "success": bool(result.get("success")),
+            "result": result,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def handle_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """解析一行请求并处理，空行返回None"""
+        line = line.strip()
+        if not line:
+            return None
+
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"id": None, "success": False, "error": f"请求JSON解析失败: {e}"}
+
+        if not isinstance(request, dict):
+            return {"id": None, "success": False, "error": "请求必须是JSON对象"}
+
+        return self.handle_request(request)
+
+    def _ready_message(self, **extra) -> Dict[str, Any]:
+        return {"type": "ready", "server": self.name, "pid": os.getpid(), **extra}
+
+    def serve_stdio(self, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None):
+        """通过stdin/stdout提供服务，直到stdin关闭或收到shutdown请求"""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+
+        def write(message: Dict[str, Any]):
+            stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+            stdout.flush()
+
+        self._running = True
+        write(self._ready_message())
+
+        for line in stdin:
+            response = self.handle_line(line)
+            if response is not None:
+                write(response)
+            if not self._running:
+                break
+
+        self._running = False
+
+    def serve_unix_socket(self, path: str):
+        """通过本地Unix Socket提供服务，每个连接可以发送多行请求"""
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("当前平台不支持Unix Socket，请使用stdio模式")
+
+        if os.path.exists(path):
+            os.unlink(path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        server.settimeout(0.5)
+        self._running = True
+        print(json.dumps(self._ready_message(socket=path), ensure_ascii=False), flush=True)
+
+        try:
+            while self._running:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _serve_connection(self, conn: socket.socket):
+        """处理单个Socket连接上的所有请求"""
+        with conn, conn.makefile("r", encoding="utf-8") as reader, \
+                conn.makefile("w", encoding="utf-8") as writer:
+            for line in reader:
+                response = self.handle_line(line)
+                if response is not None:
+                    writer.write(json.dumps(response, ensure_ascii=False) + "\n")
+                    writer.flush()
+                if not self._running:
+                    break
+
+
+def run_server(runner: Callable[[Dict[str, Any]], Dict[str, Any]], name: str,
+               socket_path: Optional[str] = None, stats: Optional[Callable[[], Dict[str, Any]]] = None):
+    """按命令行参数启动常驻服务"""
+    server = AutomationServer(runner, name=name, stats=stats)
+    if socket_path:
+        server.serve_unix_socket(socket_path)
+    else:
+        server.serve_stdio()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+JSON Lines批量执行 - 一个进程内以有限并发执行成千上万条命令
+
+输入每行一个请求（与常驻服务的请求格式相同，也可以只是一个JSON字符串）：
+
+    {"id": "job-1", "command": "打开淘宝搜索手机", "use_ai": false}
+    "百度搜索今天天气"
+
+没有id的请求使用行号作为id。结果按完成顺序逐行输出：
+
+    {"id": "job-1", "success": true, "result": {...}, "elapsed_ms": 12.3}
+
+指定结果文件时结果追加写入该文件；中断后用同样的参数重新运行，已有结果的命令会被跳过
+（--retry-failed 时只跳过成功的命令），实现断点续跑。
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, TextIO
+
+
+def read_requests(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """解析输入行，无法解析的行产出带error字段的请求"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"id": line_number, "error": f"请求JSON解析失败: {e}"}
+            continue
+        if isinstance(request, str):
+            request = {"command": request}
+        if not isinstance(request, dict):
+            yield {"id": line_number, "error": "请求必须是JSON对象或字符串"}
+            continue
+        request.setdefault("id", line_number)
+        if not request.get("command"):
+            request["error"] = "缺少command参数"
+        yield request
+
+
+def load_completed(path: Optional[str], retry_failed: bool = False) -> Set[str]:
+    """读取已有结果文件中完成的请求id（统一转换成字符串比较）"""
+    completed: Set[str] = set()
+    if not path:
+        return completed
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下写了一半的最后一行
+                    continue
+                if isinstance(record, dict) and "id" in record and (record.get("success") or not retry_failed):
+                    completed.add(str(record["id"]))
+    except FileNotFoundError:
+        pass
+    return completed
+
+
+class BatchRunner:
+    """以有限并发执行批量命令，结果按完成顺序写出"""
+
+    def __init__(self, run_command: Callable[[Dict[str, Any]], Dict[str, Any]], concurrency: int = 1):
+        """
+        初始化批量执行器
+
+        Args:
+            run_command: 执行单个请求并返回结果字典的函数，会在多个线程中同时调用，
+                每次调用应使用独立的会话状态（如每条命令新建自动化实例）
+            concurrency: 同时执行的命令数
+        """
+        self.run_command = run_command
+        self.concurrency = max(1, concurrency)
+        self.stats = {"total": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+    def _execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        if "error" in request:
+            result = {"success": False, "error": request["error"]}
+        else:
+            try:
+                result = self.run_command(request)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "command": request.get("command")}
+        return {
+            "id": request["id"],
+            "success": bool(result.get("success")),
+            "result": result,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def run(self, requests: Iterable[Dict[str, Any]], output: TextIO,
+            completed: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        执行所有请求
+
+        最多同时提交concurrency个请求，输入按需读取，不会一次读入内存。
+        命令执行期间的进度输出转到stderr，output中只有结果行。
+
+        Args:
+            requests: 请求迭代器（read_requests的返回值）
+            output: 结果输出流，每完成一条命令写入一行并立即刷新
+            completed: 已完成、需要跳过的请求id
+
+        Returns:
+            执行统计
+        """
+        completed = completed or set()
+        start = time.perf_counter()
+        pending: Set[Future] = set()
+
+        def write(record: Dict[str, Any]):
+            self.stats["succeeded" if record["success"] else "failed"] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+        def drain(block_until: int):
+            nonlocal pending
+            while len(pending) > block_until:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        try:
+            with redirect_stdout(sys.stderr):
+                for request in requests:
+                    self.stats["total"] += 1
+                    if str(request["id"]) in completed:
+                        self.stats["skipped"] += 1
+                        continue
+                    drain(self.concurrency - 1)
+                    pending.add(executor.submit(self._execute, request))
+                drain(0)
+        finally:
+            # 中断时不再开始排队中的命令，正在执行的命令完成后照常写出结果
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for future in pending:
+                if not future.cancelled():
+                    write(future.result())
+
+        return {**self.stats, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def run_batch(source: str, run_command: Callable[[Dict[str, Any]], Dict[str, Any]], concurrency: int = 1,
+              output_path: Optional[str] = None, retry_failed: bool = False) -> Dict[str, Any]:
+    """
+    按命令行参数执行批量命令
+
+    Args:
+        source: 输入文件路径，"-" 表示stdin
+        run_command: 执行单个请求的函数
+        concurrency: 同时执行的命令数
+        output_path: 结果文件（追加写入，用于断点续跑），为空时输出到stdout
+        retry_failed: 续跑时是否重新执行之前失败的命令
+    """
+    completed = load_completed(output_path, retry_failed)
+    runner = BatchRunner(run_command, concurrency)
+    input_file = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    output = open(output_path, "a", encoding="utf-8") if output_path else sys.stdout
+    try:
+        summary = runner.run(read_requests(input_file), output, completed)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps({"type": "summary", **summary}, ensure_ascii=False), file=sys.stderr)
+    return summary
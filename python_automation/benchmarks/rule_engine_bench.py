@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则解析引擎微基准
+
+先用黄金语料校验解析结果与原实现一致，再分别测量无缓存（每条命令都完整解析）
+和重复命令（按Zipf分布抽样，命中解析缓存）两种情况下的单条命令耗时。
+
+    python benchmarks/rule_engine_bench.py [--iterations 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import command_rules  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_golden_corpus.json")
+
+
+def describe(parsed: command_rules.ParsedCommand) -> dict:
+    """把解析结果转换成黄金语料中的格式"""
+    if parsed.error:
+        return {"error": parsed.error}
+    if parsed.action == "search":
+        return {"action": "search", "query": parsed.query, "site": parsed.site}
+    if parsed.action == "navigate":
+        return {"action": "navigate", "url": parsed.url}
+    return {"action": "click", "selector": parsed.selector}
+
+
+def verify(corpus) -> int:
+    """校验黄金语料，返回不一致的条数"""
+    mismatches = 0
+    for entry in corpus:
+        command = entry["command"]
+        site, query = command_rules.extract_search_info.__wrapped__(command)
+        actual = describe(command_rules.parse_command.__wrapped__(command))
+        if (site, query) != (entry["site"], entry["query"]) or actual != entry["expected"]:
+            mismatches += 1
+            print(f"不一致: {command!r} 期望 {entry} 实际 {(site, query, actual)}", file=sys.stderr)
+    return mismatches
+
+
+def measure(func, commands) -> float:
+    """返回单条命令的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for command in commands:
+        func(command)
+    return (time.perf_counter() - start) / len(commands) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则解析引擎微基准")
+    parser.add_argument("--iterations", type=int, default=20000, help="每项测量的命令条数")
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    mismatches = verify(corpus)
+    commands = [entry["command"] for entry in corpus]
+
+    rng = random.Random(42)
+    uncached = [rng.choice(commands) for _ in range(args.iterations)]
+    # 高频命令占绝大多数的真实负载
+    weights = [1 / (rank + 1) for rank in range(len(commands))]
+    repeated = rng.choices(commands, weights=weights, k=args.iterations)
+
+    command_rules.parse_command.cache_clear()
+    report = {
+        "corpus_size": len(corpus),
+        "mismatches": mismatches,
+        "uncached_us_per_command": round(measure(command_rules.parse_command.__wrapped__, uncached), 3),
+        "repeated_us_per_command": round(measure(command_rules.parse_command, repeated), 3),
+        "cache": command_rules.parse_command.cache_info()._asdict()
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
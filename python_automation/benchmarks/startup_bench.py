@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动基准
+
+桥接层每条命令启动一个Python进程时，解释器启动加模块导入的时间就是每条命令的延迟下限。
+这里用 `python -X importtime` 测量各入口模块的累计导入耗时，并对本地替身IPC服务器
+实际执行一条无AI搜索命令，报告进程从启动到退出的总耗时。
+
+    python benchmarks/startup_bench.py [--repeat 5] [--budget-ms 40] [--output report.json]
+
+快速启动入口（quick_command）的导入耗时超过预算，或者导入了不应在快速路径上加载的模块
+（requests、lxml、Pillow等）时退出码为1，可直接用于CI。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Set
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from stub_servers import StubIpcServer  # noqa: E402
+
+ENTRY_MODULES = ["quick_command", "webview_automation", "enhanced_webview_automation"]
+QUICK_MODULE = "quick_command"
+# 快速路径上不应出现的模块（顶层包名）
+FORBIDDEN_MODULES = ("requests", "urllib3", "http", "ssl", "sqlite3", "lxml", "PIL", "bs4", "numpy", "subprocess")
+COMMAND = "百度搜索今天天气"
+
+
+def measure_imports(module: str) -> Dict[str, Any]:
+    """在新进程中导入模块，返回累计导入耗时（毫秒）和导入的全部模块"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_DIR, capture_output=True, text=True, encoding="utf-8", check=True
+    )
+    total_us = None
+    modules: Set[str] = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            # 表头行
+            continue
+        modules.add(name.strip())
+        if name.strip() == module and not name[1:].startswith(" "):
+            total_us = int(cumulative)
+    return {"import_ms": round((total_us or 0) / 1000, 2), "modules": modules}
+
+
+def measure_command(args: List[str]) -> float:
+    """执行一次命令行，返回从启动进程到退出的耗时（毫秒）"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=PACKAGE_DIR, capture_output=True, check=True)
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准（导入耗时和单条命令的进程耗时）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数，取中位数")
+    parser.add_argument("--budget-ms", type=float, default=40.0, help="快速启动入口允许的导入耗时（毫秒）")
+    parser.add_argument("--output", type=str, help="把报告写入JSON文件")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "config": {"repeat": args.repeat, "budget_ms": args.budget_ms},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "imports": {},
+        "commands": {}
+    }
+
+    quick_modules: Set[str] = set()
+    for module in ENTRY_MODULES:
+        print(f"测量 {module} 的导入耗时 ...", file=sys.stderr)
+        samples = [measure_imports(module) for _ in range(args.repeat)]
+        if module == QUICK_MODULE:
+            quick_modules = samples[0]["modules"]
+        report["imports"][module] = {
+            "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+            "modules": len(samples[0]["modules"])
+        }
+
+    with StubIpcServer() as server:
+        port = str(server.port)
+        commands = {
+            "quick_command": ["quick_command.py", "--command", COMMAND, "--no-ai", "--ipc-port", port],
+            "webview_automation": ["webview_automation.py", "--command", COMMAND, "--no-ai",
+                                   "--ipc-port", port, "--no-selector-store"]
+        }
+        for name, command_args in commands.items():
+            print(f"测量 {name} 执行单条命令的耗时 ...", file=sys.stderr)
+            samples = [measure_command(command_args) for _ in range(args.repeat)]
+            report["commands"][name] = {"median_ms": statistics.median(samples), "max_ms": max(samples)}
+
+    violations = []
+    quick_ms = report["imports"][QUICK_MODULE]["import_ms"]
+    if quick_ms > args.budget_ms:
+        violations.append(f"{QUICK_MODULE} 导入耗时 {quick_ms}ms 超过预算 {args.budget_ms}ms")
+    loaded = sorted({name for name in quick_modules if name.split(".")[0] in FORBIDDEN_MODULES})
+    if loaded:
+        violations.append(f"{QUICK_MODULE} 导入了快速路径不应加载的模块: {', '.join(loaded)}")
+    report["violations"] = violations
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    for violation in violations:
+        print(f"❌ {violation}", file=sys.stderr)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
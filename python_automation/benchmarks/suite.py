@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准套件
+
+用本地替身服务器（stub_servers）代替Electron的IPC服务器和模型接口，按可配置的
+耗时、故障率和页面大小，驱动 WebViewAutomation 和 EnhancedWebViewAutomation 执行
+有代表性的命令组合，报告每个场景的p50/p95延迟、吞吐量和峰值内存。
+
+    python benchmarks/suite.py [--iterations 50] [--ipc-latency 2] [--ai-latency 50]
+                               [--failure-rate 0.02] [--html-kb 200] [--output report.json]
+                               [--baseline baseline.json] [--tolerance 0.25]
+
+指定 --baseline 时与基准报告比较，任一场景p95延迟变长或吞吐量下降超过容差时退出码为1，
+可直接用于CI。报告本身就是基准文件的格式。
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_webview_automation import EnhancedWebViewAutomation  # noqa: E402
+from http_transport import HttpTransport  # noqa: E402
+from selector_store import SelectorStore  # noqa: E402
+from stub_servers import StubAiServer, StubIpcServer  # noqa: E402
+from webview_automation import WebViewAutomation  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_golden_corpus.json")
+
+# 增强控制器的任务组合：以搜索为主，夹杂导航和点击
+ENHANCED_TASKS = [
+    "打开淘宝搜索手机",
+    "在百度搜索今天天气",
+    "打开淘宝搜索笔记本电脑",
+    "百度搜索Python教程",
+    "打开京东首页",
+    "点击第一个搜索结果"
+]
+
+SEARCH_PLAN = {
+    "analysis": "搜索页面",
+    "elements_found": [{"type": "搜索框", "selector": "#q", "confidence": 0.95}],
+    "recommended_actions": [
+        {"action": "navigate", "target": "https://www.taobao.com", "description": "打开首页", "order": 1},
+        {"action": "input", "target": "#q", "alternatives": ["input[name='q']"], "role": "search_input",
+         "value": "手机", "description": "输入关键词", "order": 2},
+        {"action": "wait", "condition": {"type": "selector", "selector": ".item"}, "timeout": 5,
+         "description": "等待结果", "order": 3},
+        {"action": "click", "target": ".item a", "role": "first_result", "description": "打开第一个结果", "order": 4}
+    ],
+    "success": True,
+    "confidence": 0.9
+}
+
+INTENT_REPLY = {"action": "search", "target": "手机", "site": "taobao", "query": "手机", "confidence": 0.9}
+
+
+def build_html(size_kb: int) -> str:
+    """生成约size_kb大小的搜索结果页，结构与电商结果列表相似"""
+    head = ('<html><head><title>搜索结果</title><style>.item{margin:4px}</style></head><body>'
+            '<form action="/search"><input id="q" name="q" placeholder="搜索"><button type="submit">搜索</button></form>'
+            '<div id="content_left">')
+    items = []
+    size = len(head)
+    index = 0
+    while size < size_kb * 1024:
+        item = (f'<div class="item" data-id="{index}"><a href="/item/{index}">商品 {index} 高性价比</a>'
+                f'<span class="price">¥{index % 997}.00</span><button class="add-cart">加入购物车</button></div>')
+        items.append(item)
+        size += len(item.encode("utf-8"))
+        index += 1
+    return head + "".join(items) + "</div></body></html>"
+
+
+def build_screenshot(width: int) -> Optional[str]:
+    """生成带噪点的截图（宽width、高宽比16:10），没有Pillow时返回None使用替身的默认截图"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    height = width * 10 // 16
+    image = Image.effect_noise((width, height), 48).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Scenario:
+    """一个基准场景：创建控制器的函数和要执行的命令组合"""
+
+    def __init__(self, name: str, description: str, make: Callable[[StubIpcServer, StubAiServer], Any],
+                 run: Callable[[Any, str], Dict[str, Any]], commands: List[str],
+                 batch_supported: bool = True, ai_reply: Any = None):
+        self.name = name
+        self.description = description
+        self.make = make
+        self.run = run
+        self.commands = commands
+        self.batch_supported = batch_supported
+        self.ai_reply = ai_reply
+
+
+def _basic(ipc, ai, use_ai: bool) -> WebViewAutomation:
+    automation = WebViewAutomation(ipc_port=ipc.port, transport=HttpTransport(),
+                                   selector_store=SelectorStore(":memory:"))
+    if use_ai:
+        automation.set_ai_api(ai.url)
+    return automation
+
+
+def _enhanced(ipc, ai, **options) -> EnhancedWebViewAutomation:
+    automation = EnhancedWebViewAutomation(ipc_port=ipc.port, transport=HttpTransport(),
+                                           selector_store=SelectorStore(":memory:"), **options)
+    automation.set_ai_api(ai.url)
+    return automation
+
+
+def build_scenarios(rule_commands: List[str]) -> List[Scenario]:
+    return [
+        Scenario("basic_rules", "WebViewAutomation 规则解析（不使用AI）",
+                 lambda ipc, ai: _basic(ipc, ai, use_ai=False),
+                 lambda automation, command: automation.execute_universal_command(command, use_ai=False),
+                 rule_commands),
+        Scenario("basic_ai", "WebViewAutomation AI意图分析（不使用意图缓存）",
+                 lambda ipc, ai: _basic(ipc, ai, use_ai=True),
+                 lambda automation, command: automation.execute_universal_command(command, use_ai=True),
+                 rule_commands, ai_reply=INTENT_REPLY),
+        Scenario("enhanced_batch", "EnhancedWebViewAutomation AI分析 + 批量执行",
+                 lambda ipc, ai: _enhanced(ipc, ai),
+                 lambda automation, command: automation.execute_ai_guided_task(command),
+                 ENHANCED_TASKS, ai_reply=SEARCH_PLAN),
+        Scenario("enhanced_pipeline", "EnhancedWebViewAutomation AI分析 + 客户端流水线执行",
+                 lambda ipc, ai: _enhanced(ipc, ai),
+                 lambda automation, command: automation.execute_ai_guided_task(command),
+                 ENHANCED_TASKS, batch_supported=False, ai_reply=SEARCH_PLAN),
+        Scenario("enhanced_stream", "EnhancedWebViewAutomation 流式AI分析，操作边生成边执行",
+                 lambda ipc, ai: _enhanced(ipc, ai, stream_ai=True),
+                 lambda automation, command: automation.execute_ai_guided_task(command),
+                 ENHANCED_TASKS, batch_supported=False, ai_reply=SEARCH_PLAN)
+    ]
+
+
+def configure_servers(ipc: StubIpcServer, ai: StubAiServer, args, html: str, screenshot: Optional[str]):
+    ipc.latency, ipc.jitter = args.ipc_latency / 1000, args.ipc_latency / 2000
+    ai.latency, ai.jitter = args.ai_latency / 1000, args.ai_latency / 4000
+    ipc.failure_rate = ai.failure_rate = args.failure_rate
+    ipc.rng.seed(args.seed)
+    ai.rng.seed(args.seed + 1)
+    ipc.html = html
+    if screenshot:
+        ipc.screenshot = screenshot
+    # 结果列表选择器总是存在，等待条件在第一次探测时满足
+    ipc.missing_selectors = set()
+
+
+def run_scenario(scenario: Scenario, args, html: str, screenshot: Optional[str]) -> Dict[str, Any]:
+    """执行一个场景：先测延迟和吞吐量，再在tracemalloc下测一小段的峰值内存"""
+    rng = random.Random(args.seed)
+    commands = [rng.choice(scenario.commands) for _ in range(args.iterations)]
+
+    with StubIpcServer(batch_supported=scenario.batch_supported) as ipc, \
+            StubAiServer(scenario.ai_reply, chunk_size=48, chunk_delay=args.ai_chunk_delay / 1000) as ai:
+        configure_servers(ipc, ai, args, html, screenshot)
+        automation = scenario.make(ipc, ai)
+        sink = io.StringIO()
+
+        with redirect_stdout(sink):
+            for command in commands[:args.warmup]:
+                scenario.run(automation, command)
+
+        latencies = []
+        successes = 0
+        wall_start = time.perf_counter()
+        with redirect_stdout(sink):
+            for command in commands:
+                start = time.perf_counter()
+                result = scenario.run(automation, command)
+                latencies.append((time.perf_counter() - start) * 1000)
+                successes += 1 if result.get("success") else 0
+                sink.seek(0)
+                sink.truncate()
+        wall = time.perf_counter() - wall_start
+
+        memory_commands = commands[:max(1, min(args.memory_iterations, len(commands)))]
+        tracemalloc.start()
+        with redirect_stdout(sink):
+            for command in memory_commands:
+                scenario.run(automation, command)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        automation.transport.close()
+        requests_sent = len(ipc.calls) + len(ai.calls)
+
+    return {
+        "description": scenario.description,
+        "iterations": len(commands),
+        "success_rate": round(successes / len(commands), 4),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "max_ms": round(max(latencies), 3),
+        "throughput_per_s": round(len(commands) / wall, 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "server_requests": requests_sent
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基准报告比较，返回超出容差的回归说明"""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] > 0 and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_per_s"] < previous["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: 吞吐量 {previous['throughput_per_s']}/s -> {current['throughput_per_s']}/s")
+        if current["success_rate"] < previous["success_rate"] - tolerance / 10:
+            regressions.append(f"{name}: 成功率 {previous['success_rate']} -> {current['success_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准套件（使用本地替身服务器）")
+    parser.add_argument("--iterations", type=int, default=50, help="每个场景执行的命令条数")
+    parser.add_argument("--warmup", type=int, default=3, help="每个场景正式计时前的预热命令条数")
+    parser.add_argument("--memory-iterations", type=int, default=10, help="测量峰值内存时执行的命令条数")
+    parser.add_argument("--scenarios", type=str, help="只运行指定的场景，逗号分隔")
+    parser.add_argument("--ipc-latency", type=float, default=2.0, help="IPC服务器每个请求的耗时（毫秒）")
+    parser.add_argument("--ai-latency", type=float, default=50.0, help="AI接口返回第一个字节前的耗时（毫秒）")
+    parser.add_argument("--ai-chunk-delay", type=float, default=2.0, help="AI回复每个分块的生成耗时（毫秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="替身服务器返回HTTP 500的概率")
+    parser.add_argument("--html-kb", type=int, default=200, help="页面HTML的大小（KB）")
+    parser.add_argument("--screenshot-width", type=int, default=1280, help="截图宽度（像素），0表示使用1x1截图")
+    parser.add_argument("--seed", type=int, default=42, help="命令抽样和故障注入的随机种子")
+    parser.add_argument("--output", type=str, help="把报告写入JSON文件（可作为之后的基准）")
+    parser.add_argument("--baseline", type=str, help="与之比较的基准报告")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的性能退化比例")
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        rule_commands = [entry["command"] for entry in json.load(f) if "error" not in entry["expected"]]
+
+    scenarios = build_scenarios(rule_commands)
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(",")}
+        unknown = wanted - {scenario.name for scenario in scenarios}
+        if unknown:
+            parser.error(f"未知的场景: {', '.join(sorted(unknown))}")
+        scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+
+    html = build_html(args.html_kb)
+    screenshot = build_screenshot(args.screenshot_width) if args.screenshot_width > 0 else None
+
+    report = {
+        "config": {
+            key: getattr(args, key) for key in (
+                "iterations", "ipc_latency", "ai_latency", "ai_chunk_delay", "failure_rate",
+                "html_kb", "screenshot_width", "seed"
+            )
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "scenarios": {}
+    }
+    for scenario in scenarios:
+        print(f"运行场景 {scenario.name} ...", file=sys.stderr)
+        report["scenarios"][scenario.name] = run_scenario(scenario, args, html, screenshot)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("警告: 基准报告的配置与本次运行不同，比较结果仅供参考", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+熔断器 - Electron应用或AI服务不可用时快速失败，不再让每个请求都等到连接超时
+
+每个后端（host:port）一个熔断器，状态转换：
+    closed    正常放行；连续失败达到阈值后 -> open
+    open      直接拒绝（CircuitOpenError，结果中的error_code为CIRCUIT_OPEN）；
+              冷却时间过后，如有健康检查且结果（缓存）为不健康则继续保持open，否则 -> half_open
+    half_open 只放行一个试探请求：成功 -> closed，失败 -> open
+
+只有连接失败、超时和502/503/504计为失败，业务错误（如找不到元素）不影响熔断状态。
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+CIRCUIT_OPEN = "CIRCUIT_OPEN"
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 说明后端本身不可用的HTTP状态码
+UNAVAILABLE_STATUS = (502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """熔断器处于打开状态，请求没有发出"""
+
+    error_code = CIRCUIT_OPEN
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"{name} 暂时不可用（熔断中，{retry_in:.1f}秒后重试）")
+
+
+def is_failure(error: Optional[BaseException] = None, status_code: Optional[int] = None) -> bool:
+    """判断一次请求的结果是否说明后端不可用"""
+    if error is not None:
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+    return status_code in UNAVAILABLE_STATUS
+
+
+def log_state_change(name: str, old: str, new: str):
+    """默认的状态变化通知，输出到stderr以免混入结果JSON"""
+    print(f"⚡ 熔断器 {name}: {old} -> {new}", file=sys.stderr)
+
+
+class CircuitBreaker:
+    """单个后端的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 5.0,
+                 health_check: Optional[Callable[[], bool]] = None,
+                 on_state_change: Optional[Callable[[str, str, str], None]] = log_state_change):
+        """
+        初始化熔断器
+
+        Args:
+            name: 后端名称（host:port），出现在错误信息和统计中
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 打开后多久允许试探（秒）
+            health_check: 冷却结束后调用的健康检查（可返回缓存结果），不健康时继续保持打开
+            on_state_change: 状态变化回调 (name, old_state, new_state)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_check = health_check
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"rejected": 0, "failures": 0, "successes": 0, "transitions": {}}
+
+    def _transition(self, new_state: str) -> Optional[tuple]:
+        """切换状态（调用方持有锁），返回需要在锁外通知的状态变化"""
+        if new_state == self.state:
+            return None
+        old, self.state = self.state, new_state
+        key = f"{old}->{new_state}"
+        self._stats["transitions"][key] = self._stats["transitions"].get(key, 0) + 1
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        if new_state != HALF_OPEN:
+            self._probe_in_flight = False
+        return old, new_state
+
+    def _notify(self, change: Optional[tuple]):
+        if change and self.on_state_change:
+            try:
+                self.on_state_change(self.name, *change)
+            except Exception:
+                pass
+
+    def before_call(self):
+        """请求发出前调用，熔断中时抛出CircuitOpenError"""
+        change = None
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                change = self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probe_in_flight = True
+        self._notify(change)
+
+        if change and self.health_check is not None and not self._healthy():
+            with self._lock:
+                change = self._transition(OPEN)
+                self._stats["rejected"] += 1
+            self._notify(change)
+            raise CircuitOpenError(self.name, self.reset_timeout)
+
+    def _healthy(self) -> bool:
+        try:
+            return bool(self.health_check())
+        except Exception:
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            change = self._transition(CLOSED)
+        self._notify(change)
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            change = None
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                change = self._transition(OPEN)
+        self._notify(change)
+
+    def record(self, error: Optional[BaseException] = None, status_code: Optional[int] = None):
+        """按请求结果更新状态，业务错误视为后端可用"""
+        if is_failure(error, status_code):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def release(self):
+        """请求被调用方中止（如命令的时间预算用完），不计成败；半开状态下允许再发一个试探请求"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "rejected": self._stats["rejected"],
+                "failures": self._stats["failures"],
+                "successes": self._stats["successes"],
+                "transitions": dict(self._stats["transitions"])
+            }
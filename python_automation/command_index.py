@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+相似命令索引 - 措辞不同但意思相同的命令复用已验证的AI指令
+
+意图缓存只能命中规范化后完全相同的命令，"在京东买笔记本电脑"、"京东搜索笔记本电脑"、
+"京东 笔记本电脑 价格"都会各自请求一次AI。这里对执行成功的命令建立字符n-gram倒排索引
+（每个n-gram对应一个按写入顺序递增的条目编号数组，NumPy存储），查询时计算二值n-gram集合的
+余弦相似度，取超过阈值的最近邻，把它的指令换上新命令的搜索词后直接执行。
+
+查询只需要扫描少量稀有n-gram的倒排表：余弦相似度不低于t时两条命令至少共享 ceil(t²·|q|) 个
+n-gram，所以候选条目一定出现在查询中最稀有的 |q| - ceil(t²·|q|) + 1 个n-gram的倒排表里，
+再对候选条目用二分查找逐个n-gram统计重叠数。网站名、动作词这类常见n-gram的倒排表很长，
+生成候选时只取其中最近写入的 SCAN_LIMIT 条（句式相同的命令只需找到一条），因此结果是近似的
+最近邻：包含稀有n-gram（通常是搜索词）的条目总会被考虑。几十万条命令时单次查询仍在亚毫秒级。
+
+容量有上限，写满后覆盖最早写入的条目；倒排表中失效的编号在查询时按需截掉。
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from command_rules import extract_search_info
+from intent_cache import normalize_command
+from selector_store import domain_of
+from site_registry import get_site
+
+DEFAULT_THRESHOLD = 0.4
+DEFAULT_MAX_ENTRIES = 200_000
+NGRAM_SIZES = (2, 3)
+# 生成候选时每个倒排表最多取的条目数（最近写入的）
+SCAN_LIMIT = 256
+QUERY_SLOT = "\0"
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class SimilarCommand(NamedTuple):
+    """命中的相似命令"""
+    command: str                   # 索引中的原命令（规范化后）
+    instruction: Dict[str, Any]    # 换上新搜索词后的指令
+    similarity: float
+
+
+def command_ngrams(command: str) -> List[str]:
+    """规范化并去掉空白后的字符n-gram（首尾加边界符，短命令也有足够的n-gram）"""
+    text = "^" + "".join(normalize_command(command).split()) + "$"
+    return list(dict.fromkeys(text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)))
+
+
+def _replace_query(instruction: Dict[str, Any], old: str, new: str) -> Dict[str, Any]:
+    """换上新的搜索词：只改query字段，target正好是原搜索词时一起改，选择器、网站等字段原样保留"""
+    replaced = dict(instruction)
+    if isinstance(instruction.get("query"), str):
+        replaced["query"] = new
+    target = instruction.get("target")
+    if isinstance(target, str) and target.strip() in (old, instruction.get("query")):
+        replaced["target"] = new
+    return replaced
+
+
+class _Posting:
+    """一个n-gram的倒排表：按写入顺序递增的条目编号"""
+
+    __slots__ = ("ids", "size")
+
+    def __init__(self):
+        self.ids = np.empty(4, dtype=np.int64)
+        self.size = 0
+
+    def append(self, entry_id: int):
+        if self.size == len(self.ids):
+            grown = np.empty(len(self.ids) * 2, dtype=np.int64)
+            grown[:self.size] = self.ids[:self.size]
+            self.ids = grown
+        self.ids[self.size] = entry_id
+        self.size += 1
+
+    def live(self, oldest: int) -> np.ndarray:
+        """截掉已被覆盖的编号（编号递增，失效的总在前面），返回仍可能有效的部分"""
+        start = int(np.searchsorted(self.ids[:self.size], oldest))
+        if start and start * 2 >= self.size:
+            # 失效部分过半时压缩，倒排表的内存随条目淘汰回收
+            remaining = self.size - start
+            self.ids[:remaining] = self.ids[start:self.size]
+            self.size = remaining
+            start = 0
+        return self.ids[start:self.size]
+
+
+class CommandIndex:
+    """进程内的相似命令最近邻索引"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        初始化相似命令索引
+
+        Args:
+            threshold: 复用指令要求的最低余弦相似度（0-1）
+            max_entries: 最多保留的命令数，超出时覆盖最早写入的命令
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._postings: Dict[str, _Posting] = {}
+        # 按槽位（编号 % max_entries）保存的条目编号和n-gram数，编号为-1表示空槽或已删除
+        self._slot_ids = np.full(max_entries, -1, dtype=np.int64)
+        self._slot_sizes = np.zeros(max_entries, dtype=np.float64)
+        self._entries: List[Optional[tuple]] = [None] * max_entries
+        self._by_command: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "unslotted": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._by_command)
+
+    def add(self, command: str, instruction: Dict[str, Any]):
+        """加入一条执行成功的命令及其指令，同一命令再次加入时替换原条目"""
+        key = normalize_command(command)
+        grams = command_ngrams(command)
+        if not grams:
+            return
+        query = instruction.get("query") or ""
+        # 搜索词在原命令中的位置决定句式，新命令句式相同时可以直接取出新的搜索词
+        pattern = key.replace(normalize_command(query), QUERY_SLOT, 1) if query else None
+        if pattern is not None and QUERY_SLOT not in pattern:
+            pattern = None
+
+        with self._lock:
+            self._discard(key)
+            entry_id = self._next_id
+            self._next_id += 1
+            slot = entry_id % self.max_entries
+            evicted = self._entries[slot]
+            if evicted is not None and self._by_command.get(evicted[0]) == int(self._slot_ids[slot]):
+                del self._by_command[evicted[0]]
+                self._stats["evictions"] += 1
+            self._slot_ids[slot] = entry_id
+            self._slot_sizes[slot] = len(grams)
+            self._entries[slot] = (key, dict(instruction), query, pattern)
+            self._by_command[key] = entry_id
+            for gram in grams:
+                posting = self._postings.get(gram)
+                if posting is None:
+                    posting = self._postings[gram] = _Posting()
+                posting.append(entry_id)
+            self._stats["stores"] += 1
+
+    def invalidate(self, command: str) -> bool:
+        """删除命令对应的条目（例如复用的指令执行失败时）"""
+        with self._lock:
+            removed = self._discard(normalize_command(command))
+            if removed:
+                self._stats["invalidations"] += 1
+            return removed
+
+    def lookup(self, command: str) -> Optional[SimilarCommand]:
+        """
+        查找最相似的已知命令
+
+        Returns:
+            相似度不低于阈值、且能换上新搜索词的最近邻；没有时返回None
+        """
+        grams = command_ngrams(command)
+        with self._lock:
+            best = self._nearest(grams) if grams else None
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            entry_id, similarity = best
+            key, instruction, query, pattern = self._entries[entry_id % self.max_entries]
+            instruction = self._reslot(command, instruction, query, pattern)
+            if instruction is None:
+                self._stats["unslotted"] += 1
+                return None
+            self._stats["hits"] += 1
+            return SimilarCommand(key, instruction, round(similarity, 4))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"] + self._stats["unslotted"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._by_command),
+                "ngrams": len(self._postings)
+            }
+
+    def _discard(self, key: str) -> bool:
+        entry_id = self._by_command.pop(key, None)
+        if entry_id is None:
+            return False
+        # 倒排表中的编号随之失效（槽位中的编号不再相同）
+        self._slot_ids[entry_id % self.max_entries] = -1
+        return True
+
+    def _nearest(self, grams: List[str]) -> Optional[tuple]:
+        oldest = max(0, self._next_id - self.max_entries)
+        # 索引中没有出现过的n-gram是最稀有的，倒排表为空
+        postings = sorted(
+            (posting.live(oldest) if posting is not None else _EMPTY
+             for posting in (self._postings.get(gram) for gram in grams)),
+            key=len
+        )
+
+        # 前缀过滤：只有共享足够多n-gram的条目才可能超过阈值
+        min_overlap = max(1, math.ceil(self.threshold ** 2 * len(grams)))
+        prefix = len(grams) - min_overlap + 1
+        if prefix <= 0:
+            return None
+        # 常见n-gram（如网站名和动作词）的倒排表很长，只取最近写入的一段作为候选
+        candidates = np.unique(np.concatenate([ids[-SCAN_LIMIT:] for ids in postings[:prefix]]))
+        candidates = candidates[self._slot_ids[candidates % self.max_entries] == candidates]
+        if candidates.size == 0:
+            return None
+
+        overlap = np.zeros(candidates.size, dtype=np.float64)
+        for ids in postings:
+            if ids.size == 0:
+                continue
+            positions = np.searchsorted(ids, candidates)
+            np.minimum(positions, len(ids) - 1, out=positions)
+            overlap += ids[positions] == candidates
+
+        similarity = overlap / np.sqrt(len(grams) * self._slot_sizes[candidates % self.max_entries])
+        index = int(np.argmax(similarity))
+        if similarity[index] < self.threshold:
+            return None
+        return int(candidates[index]), float(similarity[index])
+
+    @staticmethod
+    def _reslot(command: str, instruction: Dict[str, Any], query: str,
+                pattern: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        换上新命令的搜索词
+
+        新命令的网站必须与指令相同（导航指令比较目标地址的域名）；搜索词按规则重新提取，
+        必须与原搜索词完全相同，或者新命令与原命令句式相同、占位符处正好是新的搜索词。
+        不满足时返回None。
+        """
+        site, raw_query = extract_search_info(command)
+        if not CommandIndex._same_site(instruction, site):
+            # 新命令指向了别的网站
+            return None
+        if not query:
+            # 没有搜索词的指令只复用导航（目标网站已经核对过）
+            return dict(instruction) if instruction.get("action") == "navigate" else None
+
+        new_query = normalize_command(raw_query)
+        if not new_query:
+            return None
+        if new_query == normalize_command(query):
+            # 搜索词相同，只是措辞不同
+            return dict(instruction)
+        if pattern is not None:
+            before, _, after = pattern.partition(QUERY_SLOT)
+            text = normalize_command(command)
+            if (text.startswith(before) and text.endswith(after)
+                    and text[len(before):len(text) - len(after)].strip() == new_query):
+                return _replace_query(instruction, query, raw_query.strip())
+        return None
+
+    @staticmethod
+    def _same_site(instruction: Dict[str, Any], site: str) -> bool:
+        """指令是否作用于命令所指的网站"""
+        if instruction.get("site"):
+            return instruction["site"] == site
+        if instruction.get("action") == "navigate":
+            spec = get_site(site)
+            target = domain_of(instruction.get("target"))
+            return spec is not None and bool(target) and target == domain_of(spec.home_url)
+        return True
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+规则命令解析引擎 - 无AI路径（--no-ai）的命令解析
+
+所有网站和动作关键词在模块加载时编译成一个多模式匹配器，一次线性扫描得到命令中出现的全部关键词，
+再据此确定网站、动作和搜索关键词；搜索关键词的正则也只在对应关键词出现时才执行。
+解析结果与原先逐个 `in` 判断和正则匹配的实现完全一致。
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+# 网站检测模式（顺序即优先级，baidu为默认值，只有没有检测到其他网站时才使用）
+SITE_PATTERNS: Dict[str, List[str]] = {
+    'taobao': ['淘宝', 'taobao', '天猫', 'tmall'],
+    'jd': ['京东', 'jd', '京东商城'],
+    'baidu': ['百度', 'baidu'],
+    'google': ['谷歌', 'google'],
+    'bing': ['必应', 'bing']
+}
+
+# 动作关键词
+ACTION_KEYWORDS: Dict[str, List[str]] = {
+    'search': ['搜索', 'search'],
+    'navigate': ['打开', '访问', 'navigate'],
+    'click': ['点击', 'click'],
+}
+FIRST_KEYWORDS = ['第一', 'first']
+
+# 导航命令中可直接识别的网站（按顺序匹配）
+NAVIGATE_SITES: List[Tuple[str, str]] = [
+    ('淘宝', 'https://www.taobao.com'),
+    ('百度', 'https://www.baidu.com'),
+    ('京东', 'https://www.jd.com'),
+]
+
+FIRST_RESULT_SELECTOR = '.result:first-child a, .c-container:first-child a'
+
+# 提取搜索关键词的多种模式，每个模式附带执行前必须出现的关键词
+QUERY_PATTERNS: List[Tuple["re.Pattern", Tuple[str, ...]]] = [
+    (re.compile(r'搜索["""]?([^"""]+?)["""]?(?:在|$)'), ('搜索',)),  # "搜索手机"
+    (re.compile(r'(?:在|用|打开).*?搜索["""]?([^"""]+)["""]?'), ('在', '用', '打开')),  # "在淘宝搜索手机"
+    (re.compile(r'(?:查找|找|买)["""]?([^"""]+)["""]?'), ('找', '买')),  # "买手机"
+    (re.compile(r'(?:淘宝|百度|京东|谷歌|必应).*?["""]?([^"""]+?)["""]?(?:怎么样|价格|评价|$)'),
+     ('淘宝', '百度', '京东', '谷歌', '必应')),  # "淘宝手机"
+]
+
+# 没有匹配到模式时，移除网站名称和动作词，剩下的作为搜索词。
+# 等价于 (在|...)?(淘宝|...)?(搜索|...)? 的替换，但不再在每个位置产生空匹配
+_CLEANUP_PREFIX = r'(在|用|打开|访问|去|到)'
+_CLEANUP_SITE = r'(淘宝|百度|京东|谷歌|必应|天猫|京东商城)'
+_CLEANUP_VERB = r'(搜索|查找|找|买|看|要)'
+CLEANUP_PATTERN = re.compile(
+    f'{_CLEANUP_PREFIX}{_CLEANUP_SITE}?{_CLEANUP_VERB}?|{_CLEANUP_SITE}{_CLEANUP_VERB}?|{_CLEANUP_VERB}'
+)
+PUNCTUATION_PATTERN = re.compile(r'[，。！？、；：""''（）【】《》]')
+URL_PATTERN = re.compile(r'(https?://[^\s]+)')
+
+
+class KeywordMatcher:
+    """
+    多模式关键词匹配器
+
+    所有关键词按长度降序编译进一个正则，一次扫描找出不重叠的最长匹配；
+    被匹配关键词包含的关键词、以及与匹配关键词首尾重叠而被跳过的关键词
+    都在构建时预先计算，扫描后用集合运算补全，结果与逐个 `in` 判断完全一致。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted(set(keywords), key=len, reverse=True)
+        self._scanner = re.compile('|'.join(re.escape(k) for k in self.keywords))
+
+        # 复合关键词包含的关键词，如 京东商城 -> 京东
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        # 可能从关键词中间开始并越过其结尾的关键词，如 search -> http（"searchttp"）
+        self._overlaps: Dict[str, Tuple[str, ...]] = {}
+        for keyword in self.keywords:
+            contained = frozenset(k for k in self.keywords if k != keyword and k in keyword)
+            if contained:
+                self._implied[keyword] = contained
+            overlapping = tuple(
+                k for k in self.keywords
+                if k not in contained and k != keyword
+                and any(keyword.endswith(k[:i]) for i in range(1, len(k)))
+            )
+            if overlapping:
+                self._overlaps[keyword] = overlapping
+        self._compound = frozenset(self._implied)
+        self._overlapping = frozenset(self._overlaps)
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """返回text中出现的全部关键词"""
+        found = set(self._scanner.findall(text))
+        if not self._overlapping.isdisjoint(found):
+            for keyword in self._overlapping & found:
+                found.update(k for k in self._overlaps[keyword] if k in text)
+        if not self._compound.isdisjoint(found):
+            for keyword in self._compound & found:
+                found |= self._implied[keyword]
+        return frozenset(found)
+
+
+def _all_keywords() -> List[str]:
+    keywords = [k for patterns in SITE_PATTERNS.values() for k in patterns]
+    keywords += [k for patterns in ACTION_KEYWORDS.values() for k in patterns]
+    keywords += FIRST_KEYWORDS
+    keywords += [name for name, _ in NAVIGATE_SITES]
+    keywords += [k for _, gates in QUERY_PATTERNS for k in gates]
+    keywords.append('http')
+    return keywords
+
+
+MATCHER = KeywordMatcher(_all_keywords())
+
+# 预先计算的关键词集合，判断时只做集合运算
+_SITE_KEYWORDS: List[Tuple[str, FrozenSet[str]]] = [
+    (site, frozenset(patterns)) for site, patterns in SITE_PATTERNS.items() if site != 'baidu'
+]
+_ACTION_KEYWORDS: Dict[str, FrozenSet[str]] = {
+    action: frozenset(patterns) for action, patterns in ACTION_KEYWORDS.items()
+}
+_FIRST_KEYWORDS = frozenset(FIRST_KEYWORDS)
+_QUERY_PATTERNS = [(pattern, frozenset(gates)) for pattern, gates in QUERY_PATTERNS]
+
+
+class ParsedCommand(NamedTuple):
+    """规则解析结果"""
+    action: Optional[str]       # search/navigate/click，无法识别时为None
+    site: str                   # 检测到的网站标识
+    query: str                  # 搜索关键词（仅search）
+    url: Optional[str] = None   # 导航地址（仅navigate）
+    selector: Optional[str] = None  # 点击目标（仅click）
+    error: Optional[str] = None  # 无法执行时的说明
+
+
+def detect_site(keywords: FrozenSet[str]) -> str:
+    """按SITE_PATTERNS的顺序选择第一个出现的非默认网站"""
+    for site, patterns in _SITE_KEYWORDS:
+        if not patterns.isdisjoint(keywords):
+            return site
+    return 'baidu'
+
+
+def extract_query(command: str, keywords: FrozenSet[str]) -> str:
+    """提取搜索关键词"""
+    for pattern, gates in _QUERY_PATTERNS:
+        if gates.isdisjoint(keywords):
+            continue
+        match = pattern.search(command)
+        if match:
+            query = match.group(1).strip()
+            if query:
+                return query
+            # 与原实现一致：第一个匹配的模式只捕获到空白时不再尝试其他模式，改用宽泛提取
+            break
+
+    cleaned = CLEANUP_PATTERN.sub('', command).strip()
+    return PUNCTUATION_PATTERN.sub('', cleaned).strip()
+
+
+@lru_cache(maxsize=4096)
+def extract_search_info(command: str) -> Tuple[str, str]:
+    """智能提取搜索网站和关键词"""
+    keywords = MATCHER.scan(command.lower())
+    return detect_site(keywords), extract_query(command, keywords)
+
+
+@lru_cache(maxsize=4096)
+def parse_command(command: str) -> ParsedCommand:
+    """一次扫描解析命令的动作、网站和参数（结果不可变，按命令文本缓存）"""
+    keywords = MATCHER.scan(command.lower())
+    site = detect_site(keywords)
+
+    # 搜索命令
+    if not _ACTION_KEYWORDS['search'].isdisjoint(keywords):
+        query = extract_query(command, keywords)
+        if not query:
+            return ParsedCommand('search', site, '', error="无法提取搜索关键词")
+        return ParsedCommand('search', site, query)
+
+    # 导航命令
+    if not _ACTION_KEYWORDS['navigate'].isdisjoint(keywords):
+        url_match = URL_PATTERN.search(command) if 'http' in keywords else None
+        if url_match:
+            return ParsedCommand('navigate', site, '', url=url_match.group(1))
+        for name, url in NAVIGATE_SITES:
+            if name in keywords:
+                return ParsedCommand('navigate', site, '', url=url)
+        return ParsedCommand('navigate', site, '', error="无法确定要访问的网站")
+
+    # 点击命令
+    if not _ACTION_KEYWORDS['click'].isdisjoint(keywords):
+        if not _FIRST_KEYWORDS.isdisjoint(keywords):
+            return ParsedCommand('click', site, '', selector=FIRST_RESULT_SELECTOR)
+        return ParsedCommand('click', site, '', error="暂不支持复杂的点击操作")
+
+    return ParsedCommand(None, site, '', error=f"无法理解命令: {command}")
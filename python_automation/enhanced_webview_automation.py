@@ -7,18 +7,38 @@
 import json
 import sys
 import os
-import re
 import requests
 import time
-import base64
-from typing import Dict, List, Optional, Any
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Any
+
+from urllib3.exceptions import NewConnectionError
+
+from ai_stream import stream_plan
+from command_rules import parse_command
+from circuit_breaker import CIRCUIT_OPEN, CircuitOpenError
+from analysis_memo import AnalysisMemo, page_fingerprint
+from html_distiller import distill_html, format_for_prompt
+from page_prefetcher import PagePrefetcher
+from page_waiter import PageWaiter, wait_condition_from_action
+from plan_decoder import decode_plan, validate_action
+from plan_optimizer import OptimizedPlan, optimize_plan
+from plan_templates import PlanTemplateStore, TemplateMatch
+from profiler import profile_call, span
+from retry_policy import (CANCELLED, CONNECTION_ERROR, DEADLINE_EXCEEDED, TIMEOUT, DeadlineError, RetryPolicy,
+                          classify, current_deadline, deadline_scope, interrupted, within_deadline)
+from retry_policy import sleep as retry_sleep
+from screenshot_pipeline import ScreenshotProcessor, parse_crop
+from selector_store import SelectorStore, confirms_selector, domain_of
+from site_registry import get_site, search_plan
+from http_transport import HttpTransport, configure_shared_transport, get_shared_transport, parse_timeouts
+from instance_pool import InstancePool, parse_ports
 
 # 设置UTF-8编码
 if sys.platform.startswith('win'):
-    import locale
     import codecs
-    
-    os.system('chcp 65001 > nul')
+
+    # 不再调用chcp切换控制台代码页：启动子进程要几十毫秒，而标准输出已经直接按UTF-8重新配置
     os.environ['PYTHONIOENCODING'] = 'utf-8'
     os.environ['LANG'] = 'zh_CN.UTF-8'
     os.environ['LC_ALL'] = 'zh_CN.UTF-8'
@@ -30,28 +50,97 @@ if sys.platform.startswith('win'):
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.detach())
         sys.stderr = codecs.getwriter('utf-8')(sys.stderr.detach())
 
+# 执行后页面通常会变化、值得预取新页面状态的操作（webview的输入操作会自动提交搜索）
+PAGE_CHANGING_ACTIONS = ("navigate", "submit", "input")
+# 说明选择器本身有问题的错误类别（None表示成功），只有这些结果记入选择器经验库
+SELECTOR_ERROR_CLASSES = (None, "element_missing", "other")
+
+
+def _not_sent(error: Exception) -> bool:
+    """请求是否在建立连接时就失败了（服务器没有收到请求）"""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, CircuitOpenError)):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
 class EnhancedWebViewAutomation:
     """增强的WebView自动化控制器 - 集成AI视觉分析"""
     
-    def __init__(self, ipc_port=3001):
+    def __init__(self, ipc_port=3001, transport: Optional[HttpTransport] = None,
+                 screenshot_processor: Optional[ScreenshotProcessor] = None,
+                 analysis_memo: Optional[AnalysisMemo] = None,
+                 selector_store: Optional[SelectorStore] = None, stream_ai: bool = False,
+                 prefetch: bool = False, prefetch_ttl: float = 10.0, optimize_plans: bool = True,
+                 plan_templates: Optional[PlanTemplateStore] = None, retry_policy: Optional[RetryPolicy] = None,
+                 command_timeout: Optional[float] = None):
         self.ipc_port = ipc_port
         self.ai_api_url = None
         self.last_screenshot = None
+        self.screenshots = screenshot_processor or ScreenshotProcessor()
+        # 最近一次成功的AI分析：任务、URL、截图哈希和结果，页面外观未变化时复用
+        self.last_analysis: Optional[Dict[str, Any]] = None
+        # 按页面指纹缓存的分析结果，None表示不使用；last_memo_key为最近一次分析对应的键
+        self.analysis_memo = analysis_memo
+        self.last_memo_key: Optional[str] = None
+        # 选择器经验库，None表示按计划给出的顺序尝试选择器
+        self.selector_store = selector_store
+        # 流式读取AI回复，计划中的操作生成一个执行一个
+        self.stream_ai = stream_ai
+        # 执行前去掉计划中多余的导航、提交和等待
+        self.optimize_plans = optimize_plans
+        # 计划模板库，None表示每条新命令都请求AI分析
+        self.plan_templates = plan_templates
+        # 点击/输入失败后按错误类别决定是否重试
+        self.retry_policy = retry_policy or RetryPolicy()
+        # 每条命令的默认时间预算（秒），None表示只受各请求自身的超时限制
+        self.command_timeout = command_timeout
+        # 导航/提交后在后台预取页面状态，供下一次分析直接使用
+        self.prefetcher = PagePrefetcher(
+            {
+                "page_info": lambda: self.send_ipc_command("page-info"),
+                "html": self._prefetch_html,
+                "screenshot": self.get_page_screenshot
+            },
+            ttl=prefetch_ttl,
+            settle=self._settle_page
+        ) if prefetch else None
         self.last_html = None
+        self.last_page_url = None
+        # 最近一次提炼的页面可交互元素
+        self.last_distilled = None
+        self.transport = transport or get_shared_transport()
+        # None表示尚未探测服务器是否支持批量接口
+        self.batch_supported: Optional[bool] = None
+        self.waiter = PageWaiter(self.send_ipc_command)
         
     def set_ai_api(self, ai_api_url: str):
         """设置AI API地址"""
         self.ai_api_url = ai_api_url
+
+    def get_prefetch_stats(self) -> Dict[str, Any]:
+        """获取预取的使用、取消和过期次数"""
+        return self.prefetcher.get_stats() if self.prefetcher else {}
+
+    def get_transport_stats(self) -> Dict[str, Any]:
+        """获取HTTP连接复用统计"""
+        return self.transport.get_stats()
+
+    def close(self):
+        """停止后台预取（共享的传输层、缓存和经验库不受影响）"""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
     
     def send_ipc_command(self, endpoint: str, **kwargs) -> Dict[str, Any]:
         """发送HTTP请求到Electron IPC服务器"""
         try:
             url = f"http://localhost:{self.ipc_port}/api/webview/{endpoint}"
-            response = requests.post(
+            response = self.transport.post(
                 url,
+                endpoint="ipc",
+                default_timeout=10,
                 json=kwargs,
-                headers={"Content-Type": "application/json"},
-                timeout=10
+                headers={"Content-Type": "application/json"}
             )
             
             if response.status_code == 200:
@@ -59,13 +148,33 @@ class EnhancedWebViewAutomation:
             else:
                 return {
                     "success": False,
-                    "error": f"HTTP {response.status_code}: {response.text}"
+                    "error": f"HTTP {response.status_code}: {response.text}",
+                    "status": response.status_code
                 }
                 
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": f"Electron应用{e}",
+                "error_code": CIRCUIT_OPEN
+            }
+        except DeadlineError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": e.error_code
+            }
         except requests.exceptions.ConnectionError:
             return {
                 "success": False,
-                "error": "无法连接到Electron应用，请确保应用正在运行"
+                "error": "无法连接到Electron应用，请确保应用正在运行",
+                "error_code": CONNECTION_ERROR
+            }
+        except requests.exceptions.Timeout:
+            return {
+                "success": False,
+                "error": "IPC请求超时",
+                "error_code": TIMEOUT
             }
         except Exception as e:
             return {
@@ -77,44 +186,115 @@ class EnhancedWebViewAutomation:
         """获取页面截图"""
         try:
             url = f"http://localhost:{self.ipc_port}/api/capture-screenshot"
-            response = requests.get(url, timeout=10)
+            response = self.transport.get(url, endpoint="page_data", default_timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get("success"):
-                    self.last_screenshot = result.get("url")
+                    # 只保留压缩后的截图，原始PNG可能有数MB
+                    self.last_screenshot = self._compress_screenshot(result.get("url"))
                     return self.last_screenshot
             return None
         except Exception as e:
             print(f"获取截图失败: {e}")
             return None
     
+    def _process_screenshot(self, screenshot: Optional[str]) -> Optional[Dict[str, Any]]:
+        """压缩截图并计算哈希，截图为空或无法解码时返回None"""
+        try:
+            with span("screenshot"):
+                return self.screenshots.process(screenshot)
+        except Exception as e:
+            print(f"截图压缩失败，使用原图: {e}")
+            return None
+
+    def _compress_screenshot(self, screenshot: Optional[str]) -> Optional[str]:
+        """压缩截图，处理失败时原样返回"""
+        info = self._process_screenshot(screenshot)
+        return info["data_url"] if info else screenshot
+
     def get_page_html(self) -> Optional[str]:
         """获取页面HTML"""
         try:
             url = f"http://localhost:{self.ipc_port}/api/extract-page-data"
-            response = requests.get(url, timeout=10)
+            response = self.transport.get(url, endpoint="page_data", default_timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
                 self.last_html = result.get("html", "")
+                self.last_page_url = result.get("url")
                 return self.last_html
             return None
         except Exception as e:
             print(f"获取HTML失败: {e}")
             return None
     
-    def analyze_page_with_ai(self, task_description: str) -> Dict[str, Any]:
-        """使用AI分析页面内容和截图"""
+    def analyze_page_with_ai(self, task_description: str,
+                             page_data: Optional[Dict[str, Any]] = None,
+                             on_action: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        使用AI分析页面内容和截图
+
+        Args:
+            task_description: 任务描述
+            page_data: 已获取的页面数据（screenshot/html/page_info），为空时现场获取
+            on_action: 开启流式模式时，每解析出一个完整的操作就回调一次（模型仍在生成后续内容）
+        """
         if not self.ai_api_url:
             return {"success": False, "error": "AI API未配置"}
         
-        # 获取页面数据
-        screenshot = self.get_page_screenshot()
-        html = self.get_page_html()
+        # 获取页面数据（优先使用上一步操作之后预取的快照）
+        if page_data is None and self.prefetcher is not None:
+            with span("prefetch_take"):
+                page_data = self._page_data_from_snapshot(self.prefetcher.take())
+        if page_data is None:
+            screenshot = self.get_page_screenshot()
+            self.last_page_url = None
+            html = self.get_page_html()
+            # 页面数据接口同时返回当前URL
+            page_info = {"url": self.last_page_url} if self.last_page_url else {}
+        else:
+            screenshot = page_data.get("screenshot")
+            html = page_data.get("html")
+            page_info = page_data.get("page_info") or {}
         
         if not screenshot and not html:
             return {"success": False, "error": "无法获取页面数据"}
+
+        # 同一任务在相同布局的页面上分析过，直接复用
+        if page_data and page_data.get("distilled") is not None:
+            self.last_distilled = page_data["distilled"]
+        elif html:
+            with span("distill", chars=len(html)):
+                self.last_distilled = distill_html(html)
+        else:
+            self.last_distilled = None
+        self.last_memo_key = None
+        if self.analysis_memo is not None and self.last_distilled:
+            self.last_memo_key = page_fingerprint(
+                page_info.get("url") or self.last_page_url, self.last_distilled, task_description
+            )
+            memoized = self.analysis_memo.get(self.last_memo_key)
+            if memoized:
+                print("📒 页面布局已分析过，使用缓存的分析结果")
+                return {**memoized, "memo_hit": True}
+
+        # 截图外观与上次分析时相同：同一任务直接复用结果，否则有HTML时不再上传截图
+        screenshot_info = self._process_screenshot(screenshot)
+        if screenshot_info:
+            screenshot = screenshot_info["data_url"]
+        screenshot_hash = screenshot_info["hash"] if screenshot_info else None
+        previous = self.last_analysis
+        if previous and self.screenshots.is_unchanged(previous["screenshot_hash"], screenshot_hash):
+            if previous["task"] == task_description and previous["url"] and not page_info.get("url"):
+                # 外观相同的不同页面不能复用，URL未知时先查询一次
+                page_info = {**page_info, "url": self.get_page_info().get("url")}
+            if (previous["task"] == task_description and previous["url"]
+                    and previous["url"] == page_info.get("url")):
+                print("♻️ 页面外观未变化，复用上次的分析结果")
+                return {**previous["result"], "reused_analysis": True}
+            if html:
+                screenshot = None
         
         # 构建AI分析提示
         prompt = f"""
@@ -123,6 +303,7 @@ class EnhancedWebViewAutomation:
         任务描述: {task_description}
 
         页面信息:
+        - 当前URL: {page_info.get("url", "未知")}
         - 有截图: {"是" if screenshot else "否"}
         - 有HTML: {"是" if html else "否"}
 
@@ -144,7 +325,11 @@ class EnhancedWebViewAutomation:
                 {{
                     "action": "navigate|click|input|wait",
                     "target": "目标选择器或URL",
+                    "alternatives": ["备选选择器"],
+                    "role": "search_input|search_button|first_result(元素用途，可选)",
                     "value": "输入值(如果是input操作)",
+                    "condition": {{"type": "selector|url_changed|url_contains|dom_quiet", "selector": "等待出现的选择器", "value": "URL片段"}},
+                    "timeout": 8,
                     "description": "操作描述",
                     "order": 1
                 }}
@@ -158,6 +343,7 @@ class EnhancedWebViewAutomation:
         2. 提供多个备选选择器以提高成功率
         3. 确保选择器的准确性和可用性
         4. 按操作顺序排列recommended_actions
+        5. wait操作使用condition描述要等待的页面状态（如结果列表选择器出现），不要使用固定秒数
         """
         
         try:
@@ -177,62 +363,203 @@ class EnhancedWebViewAutomation:
             if screenshot:
                 payload["image"] = screenshot
             
-            # 如果有HTML，添加到上下文中
-            if html:
-                payload["messages"][0]["content"] += f"\n\nHTML片段(前2000字符):\n{html[:2000]}"
+            # 如果有HTML，提炼出可交互元素添加到上下文中
+            if self.last_distilled:
+                payload["messages"][0]["content"] += (
+                    f"\n\n页面可交互元素(共{len(self.last_distilled['elements'])}个):\n"
+                    f"{format_for_prompt(self.last_distilled)}"
+                )
             
-            response = requests.post(
+            stream = self.stream_ai and on_action is not None
+            if stream:
+                payload["stream"] = True
+            response = self.transport.post(
                 self.ai_api_url,
+                endpoint="ai",
+                default_timeout=60,
                 json=payload,
                 headers={"Content-Type": "application/json"},
-                timeout=60
+                stream=stream
             )
             
             if response.status_code == 200:
-                result = response.json()
-                ai_content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                
-                # 尝试解析AI返回的JSON
-                try:
-                    ai_analysis = json.loads(ai_content)
-                    return ai_analysis
-                except json.JSONDecodeError:
-                    # 如果不是JSON，尝试提取JSON部分
-                    json_match = re.search(r'\{.*\}', ai_content, re.DOTALL)
-                    if json_match:
-                        try:
-                            ai_analysis = json.loads(json_match.group())
-                            return ai_analysis
-                        except json.JSONDecodeError:
-                            pass
-                    
-                    return {
-                        "success": False,
-                        "error": "AI返回格式错误",
-                        "raw_response": ai_content
-                    }
+                ai_content = self._read_ai_content(response, on_action if stream else None)
+
+                # 从回复中取出JSON并按计划格式校验（容忍说明文字、代码块、多余逗号和字符串类型的数字）
+                decoded = decode_plan(ai_content)
+                if decoded.repairs:
+                    print(f"🔧 已修正AI返回的计划: {'; '.join(decoded.repairs)}")
+                if decoded.ok:
+                    return self._remember_analysis(task_description, page_info, screenshot_hash, decoded.value)
+                return {
+                    "success": False,
+                    "error": f"AI返回格式错误: {'; '.join(decoded.errors)}",
+                    "decode_errors": decoded.errors,
+                    "raw_response": ai_content
+                }
             else:
                 return {
                     "success": False,
                     "error": f"AI API请求失败: {response.status_code}"
                 }
                 
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": f"AI服务{e}",
+                "error_code": CIRCUIT_OPEN
+            }
+        except DeadlineError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": e.error_code
+            }
         except Exception as e:
             return {
                 "success": False,
                 "error": f"AI分析异常: {str(e)}"
             }
     
-    def execute_ai_guided_task(self, task_description: str) -> Dict[str, Any]:
-        """执行AI指导的任务"""
+    def _read_ai_content(self, response, on_action: Optional[Callable[[Dict[str, Any]], None]]) -> str:
+        """读取AI回复文本；SSE流式响应边读边把完成的操作交给on_action"""
+        if on_action is not None and response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            # 按到达的分块读取；SSE固定使用UTF-8，逐行解码避免多字节字符被截断
+            # 读取超时只限制每个分块，整体耗时受命令的截止时间约束
+            lines = (line.decode("utf-8", errors="replace")
+                     for line in within_deadline(response.iter_lines(chunk_size=None)))
+            with span("ai_stream"):
+                content = stream_plan(lines, on_action)
+                for _ in lines:
+                    # 读完 [DONE] 之后的剩余数据，连接才能放回连接池
+                    pass
+            return content
+        # 服务器不支持流式时返回普通JSON
+        result = response.json()
+        return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    def _remember_analysis(self, task_description: str, page_info: Dict[str, Any],
+                           screenshot_hash: Optional[str], analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """记录成功的分析结果，供页面外观未变化或布局相同时复用"""
+        if not isinstance(analysis, dict):
+            return analysis
+        if self.analysis_memo is not None and self.last_memo_key:
+            self.analysis_memo.put(self.last_memo_key, analysis)
+        if analysis.get("success") and screenshot_hash:
+            self.last_analysis = {
+                "task": task_description,
+                "url": page_info.get("url"),
+                "screenshot_hash": screenshot_hash,
+                "result": analysis
+            }
+        return analysis
+
+    def get_page_info(self) -> Dict[str, Any]:
+        """获取页面信息（URL、标题、加载状态）"""
+        if self.prefetcher is not None:
+            page_info = self.prefetcher.take_part("page_info")
+            if page_info:
+                return page_info
+        return self.send_ipc_command("page-info")
+
+    def _prefetch_html(self) -> Optional[Dict[str, Any]]:
+        """预取HTML并在后台完成提炼"""
+        html = self.get_page_html()
+        if html is None:
+            return None
+        with span("distill", chars=len(html)):
+            return {"html": html, "distilled": distill_html(html)}
+
+    def _settle_page(self):
+        """提交搜索后等待新页面加载并稳定下来再预取"""
+        with span("sleep", seconds=0.3):
+            time.sleep(0.3)
+        self.waiter.wait_for(
+            {"type": "all", "conditions": [{"type": "loaded"}, {"type": "dom_quiet", "quiet_ms": 500}]},
+            timeout=5
+        )
+
+    @staticmethod
+    def _page_data_from_snapshot(snapshot: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """把预取快照转换成analyze_page_with_ai的page_data"""
+        if not snapshot:
+            return None
+        html = snapshot.get("html") or {}
+        page_info = snapshot.get("page_info") or {}
+        if not html.get("html") and not snapshot.get("screenshot"):
+            return None
+        print(f"📦 使用预取的页面快照（{snapshot.get('prefetch_age_ms')}ms前开始获取）")
+        return {
+            "screenshot": snapshot.get("screenshot"),
+            "html": html.get("html"),
+            "distilled": html.get("distilled"),
+            "page_info": page_info if "url" in page_info else {}
+        }
+
+    def execute_ai_guided_task(self, task_description: str, analysis: Optional[Dict[str, Any]] = None,
+                               timeout: Optional[float] = None, use_ai: bool = True) -> Dict[str, Any]:
+        """
+        执行AI指导的任务
+
+        Args:
+            task_description: 任务描述
+            analysis: 预先完成的页面分析结果，为空时现场分析
+            timeout: 整条命令的时间预算（秒），默认使用command_timeout；
+                     分析、执行、等待和重试中的每个请求都不会超过剩余时间
+            use_ai: 为False时只按规则分析命令，不请求AI也不套用计划模板
+        """
+        with deadline_scope(timeout if timeout is not None else self.command_timeout):
+            return self._execute_ai_guided_task(task_description, analysis, use_ai)
+
+    def _execute_ai_guided_task(self, task_description: str, analysis: Optional[Dict[str, Any]],
+                                use_ai: bool) -> Dict[str, Any]:
         print(f"🤖 开始AI指导的任务: {task_description}")
 
-        # 1. 尝试AI分析页面
-        analysis = self.analyze_page_with_ai(task_description)
-        if not analysis.get("success"):
+        # 1. 同类命令套用计划模板，否则尝试AI分析页面（流式模式下操作边生成边执行）
+        streamed: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+        template = None
+        learnable = True
+        if analysis is None and not use_ai:
+            # 不使用AI时直接按规则分析（规则计划不需要做成模板）
+            self.last_memo_key = None
+            learnable = False
+            with span("rule_parse"):
+                analysis = self.fallback_rule_analysis(task_description)
+            if not analysis.get("success"):
+                return {
+                    "success": False,
+                    "error": f"分析失败: {analysis.get('error')}",
+                    "analysis": analysis
+                }
+        if analysis is None and self.plan_templates is not None:
+            with span("template_match"):
+                template = self.plan_templates.match(task_description)
+            if template is not None:
+                print(f"📐 套用计划模板（成功率 {template.score}），不请求AI")
+                self.last_memo_key = None
+                analysis = {
+                    "success": True,
+                    "analysis": "计划模板",
+                    "elements_found": [],
+                    "recommended_actions": template.actions,
+                    "confidence": template.score,
+                    "template_id": template.template_id
+                }
+        if analysis is None:
+            on_action = self._stream_executor(streamed) if self.stream_ai else None
+            with span("analyze", stream=self.stream_ai):
+                analysis = self.analyze_page_with_ai(task_description, on_action=on_action)
+        if streamed and not analysis.get("success"):
+            # 部分操作已经执行，不能再回退到规则分析重复执行
+            print(f"⚠️ 完整计划校验失败，保留已执行的 {len(streamed)} 个操作: {analysis.get('error')}")
+        elif not analysis.get("success"):
             print(f"⚠️ AI分析失败，回退到规则分析: {analysis.get('error')}")
-            # 回退到基于规则的分析
-            analysis = self.fallback_rule_analysis(task_description)
+            # 回退到基于规则的分析（规则计划不需要做成模板）
+            self.last_memo_key = None
+            learnable = False
+            with span("rule_parse"):
+                analysis = self.fallback_rule_analysis(task_description)
             if not analysis.get("success"):
                 return {
                     "success": False,
@@ -244,184 +571,506 @@ class EnhancedWebViewAutomation:
         print(f"📋 找到 {len(analysis.get('elements_found', []))} 个相关元素")
         print(f"🎯 推荐 {len(analysis.get('recommended_actions', []))} 个操作")
         
-        # 2. 执行推荐的操作
-        results = []
-        actions = analysis.get("recommended_actions", [])
+        # 2. 执行推荐的操作（整个计划一次提交；流式模式下只补充执行遗漏的操作）
+        actions = sorted(analysis.get("recommended_actions", []), key=lambda x: x.get("order", 0))
+        optimized = None
+        if self.optimize_plans and not streamed:
+            # 流式模式下操作已经边生成边执行，不再改写
+            optimized = self._optimize_plan(actions)
+            actions = optimized.actions
+        with span("execute", actions=len(actions)) as record:
+            if streamed:
+                plan_result = self._finish_streamed_plan(actions, streamed, analysis.get("success", False), start)
+            else:
+                plan_result = self.execute_action_plan(actions)
+            if record is not None:
+                record["mode"] = plan_result["mode"]
+        results = plan_result["results"]
+        direct_results = None
+        if analysis.get("fallback_actions") and not streamed and self._should_fall_back(results):
+            print("↩️ 搜索结果页未就绪，改用首页搜索")
+            direct_results = results
+            with span("execute", actions=len(analysis["fallback_actions"]), fallback=True):
+                fallback_result = self.execute_action_plan(analysis["fallback_actions"])
+            results = fallback_result["results"]
+            plan_result = {**fallback_result, "elapsed_ms": plan_result["elapsed_ms"] + fallback_result["elapsed_ms"]}
         
-        for i, action in enumerate(sorted(actions, key=lambda x: x.get("order", 0))):
+        # 3. 汇总结果
+        successful_actions = [r for r in results if r["success"]]
+        # 时间预算用完或被取消时计划本身未必有问题，不降低模板成功率，也不作废分析结果
+        stopped = any(interrupted(r.get("result") or {}) for r in results)
+        template_report = None if stopped else self._update_plan_templates(
+            task_description, analysis, template,
+            learnable and direct_results is None and bool(results) and len(successful_actions) == len(results)
+        )
+        if len(successful_actions) < len(results) and not stopped:
+            # 执行失败的分析结果不再复用
+            self.last_analysis = None
+            if self.analysis_memo is not None and self.analysis_memo.invalidate(self.last_memo_key):
+                print("🗑️ 缓存的分析结果执行失败，已失效")
+        
+        summary = {
+            "success": len(successful_actions) > 0,
+            "message": f"完成 {len(successful_actions)}/{len(results)} 个操作",
+            "analysis": analysis,
+            "action_results": results,
+            "execution_mode": plan_result["mode"],
+            "execution_ms": plan_result["elapsed_ms"],
+            "task_description": task_description
+        }
+        if "plan_valid" in plan_result:
+            summary["plan_valid"] = plan_result["plan_valid"]
+        if template_report:
+            summary["plan_template"] = template_report
+        if direct_results is not None:
+            summary["search_fallback"] = {"direct_results": direct_results}
+        retries = sum(r.get("retries", 0) for r in results)
+        if retries:
+            summary["retries"] = retries
+        if optimized is not None:
+            summary["plan_optimization"] = {
+                "original_steps": len(actions) + len(optimized.changes),
+                "steps": len(actions),
+                "changes": optimized.changes
+            }
+        return summary
+
+    def _update_plan_templates(self, task_description: str, analysis: Dict[str, Any],
+                               template: Optional[TemplateMatch], succeeded: bool) -> Optional[Dict[str, Any]]:
+        """记录套用模板的结果；AI计划全部执行成功时学习为模板"""
+        if self.plan_templates is None:
+            return None
+        if template is not None:
+            self.plan_templates.record(template.template_id, succeeded)
+            if not succeeded:
+                print("📉 套用计划模板失败，已降低该模板的成功率")
+            return {"template_id": template.template_id, "replayed": True, "success": succeeded}
+        if not succeeded or not analysis.get("success"):
+            return None
+        actions = sorted(analysis.get("recommended_actions", []), key=lambda x: x.get("order", 0))
+        template_id = self.plan_templates.learn(task_description, actions)
+        return {"template_id": template_id, "learned": True} if template_id else None
+
+    @staticmethod
+    def _should_fall_back(results: List[Dict[str, Any]]) -> bool:
+        """直达计划有步骤失败、且不是因为Electron应用不可用或命令已停止时改用备用计划"""
+        failed = [r for r in results if not r["success"]]
+        return bool(failed) and all(
+            (r.get("result") or {}).get("error_code") not in (CIRCUIT_OPEN, DEADLINE_EXCEEDED, CANCELLED)
+            for r in failed
+        )
+
+    def _optimize_plan(self, actions: List[Dict[str, Any]]) -> OptimizedPlan:
+        """执行前改写计划；计划中有导航时查询一次当前页面，判断导航是否多余"""
+        current_url = None
+        if any(action.get("action") == "navigate" for action in actions):
+            current_url = self.get_page_info().get("url")
+        with span("optimize", steps=len(actions)) as record:
+            optimized = optimize_plan(actions, current_url)
+            if record is not None:
+                record["removed"] = len(optimized.changes)
+        for change in optimized.changes:
+            print(f"✂️ 优化计划，去掉第{change['index'] + 1}步（{change['action']}）: {change['reason']}")
+        return optimized
+
+    def _stream_executor(self, results: List[Dict[str, Any]]) -> Callable[[Dict[str, Any]], None]:
+        """返回流式解析的回调：每个完整的操作立即执行，结果追加到results"""
+        def run(action: Dict[str, Any]):
+            print(f"⚡ 执行流式操作 {len(results) + 1}: {action.get('description', '')}")
+            step_start = time.perf_counter()
+            # 与完整计划做相同的校验和类型转换，结束后才能逐个比对
+            checked = validate_action(action)
+            if checked.ok:
+                action = checked.value
+                action_result = self.execute_single_action(action)
+            else:
+                action_result = {"success": False, "error": f"操作格式错误: {'; '.join(checked.errors)}"}
+            results.append({
+                "action": action,
+                "result": action_result,
+                "success": action_result.get("success", False),
+                "elapsed_ms": round((time.perf_counter() - step_start) * 1000, 2),
+                "streamed": True
+            })
+            if not action_result.get("success"):
+                print(f"❌ 操作失败: {action_result.get('error') or action_result.get('message')}")
+        return run
+
+    def _finish_streamed_plan(self, actions: List[Dict[str, Any]], streamed: List[Dict[str, Any]],
+                              analysis_ok: bool, start: float) -> Dict[str, Any]:
+        """
+        用完整计划校验流式阶段执行的操作
+
+        已执行的操作必须与排序后完整计划的前几步一致，此时按位置补充执行完整计划中剩下的操作。
+        不一致时（例如解析器漏掉了中间的某一步）无法确定哪些操作还没有执行，只报告不一致，不再补充执行。
+        """
+        dispatched = [r["action"] for r in streamed]
+        plan_valid = analysis_ok and dispatched == actions[:len(dispatched)]
+        if analysis_ok and not plan_valid:
+            print(f"⚠️ 流式执行的 {len(dispatched)} 个操作与完整计划（{len(actions)} 个操作）的顺序不一致，不补充执行")
+
+        results = list(streamed)
+        remaining = actions[len(dispatched):] if plan_valid else []
+        if remaining:
+            print(f"🔄 补充执行完整计划中的 {len(remaining)} 个操作")
+            results += self.execute_action_plan(remaining)["results"]
+        return {
+            "mode": "stream",
+            "results": results,
+            "plan_valid": plan_valid,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def execute_action_plan(self, actions: List[Dict[str, Any]],
+                            stop_on_error: bool = False) -> Dict[str, Any]:
+        """
+        执行有序的操作计划
+
+        优先通过 /api/webview/batch 一次请求提交整个计划；服务器不支持批量接口时，
+        在客户端依次流水线执行各步骤，步骤之间不再固定等待。
+
+        Args:
+            actions: 已按order排序的操作列表
+            stop_on_error: 某一步失败后是否停止执行后续步骤
+
+        Returns:
+            包含执行模式、每步结果和耗时的字典
+        """
+        start = time.perf_counter()
+
+        if actions and self.batch_supported is not False:
+            steps = self._batch_steps(actions)
+            if self.prefetcher is not None:
+                self.prefetcher.invalidate()
+            batch = self._send_batch(steps, stop_on_error)
+            if batch is not None and not isinstance(batch.get("results"), list):
+                # 没有拿到步骤结果时各步骤是否执行未知，全部记为失败
+                print(f"❌ 批量执行失败: {batch.get('error')}")
+                failure = {"success": False, "error": f"批量执行失败，步骤执行情况未知: {batch.get('error')}"}
+                if batch.get("error_code"):
+                    failure["error_code"] = batch["error_code"]
+                return {
+                    "mode": "batch",
+                    "results": [{"action": action, "result": failure, "success": False, "attempts": 0,
+                                 "retries": 0, "elapsed_ms": None} for action in actions],
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+                }
+            if batch is not None:
+                if self.prefetcher is not None and any(a.get("action") in PAGE_CHANGING_ACTIONS for a in actions):
+                    self.prefetcher.schedule("batch", settle=True)
+                results = []
+                for step in batch["results"]:
+                    index = step.get("index", len(results)) if isinstance(step, dict) else None
+                    if not isinstance(index, int) or not 0 <= index < len(actions):
+                        print(f"⚠️ 忽略无法对应到操作的批量步骤结果: {step}")
+                        continue
+                    action = actions[index]
+                    step_result = step.get("result") or {"success": False, "error": "缺少步骤结果"}
+                    self._record_batch_step(steps[index], step)
+                    attempts = step.get("attempts", 1)
+                    results.append({
+                        "action": action,
+                        "result": step_result,
+                        "success": bool(step.get("success")),
+                        "attempts": attempts,
+                        # 备选选择器各尝试一次不算重试
+                        "retries": max(0, attempts - 1 - len(steps[index].get("alternatives", []))),
+                        "elapsed_ms": step.get("elapsed_ms")
+                    })
+                    print(f"{'✅' if step.get('success') else '❌'} 操作 {len(results)}/{len(actions)}: {action.get('description', '')}")
+                return {
+                    "mode": "batch",
+                    "results": results,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+                }
+
+        results = []
+        for i, action in enumerate(actions):
             print(f"🔄 执行操作 {i+1}/{len(actions)}: {action.get('description', '')}")
-            
+
+            step_start = time.perf_counter()
             action_result = self.execute_single_action(action)
             results.append({
                 "action": action,
                 "result": action_result,
-                "success": action_result.get("success", False)
+                "success": action_result.get("success", False),
+                "retries": action_result.get("retries", 0),
+                "retry_ms": action_result.get("retry_ms", 0.0),
+                "elapsed_ms": round((time.perf_counter() - step_start) * 1000, 2)
             })
-            
+
             if not action_result.get("success"):
-                print(f"❌ 操作失败: {action_result.get('error')}")
+                print(f"❌ 操作失败: {action_result.get('error') or action_result.get('message')}")
+                if stop_on_error or action_result.get("error_code") in (CIRCUIT_OPEN, DEADLINE_EXCEEDED, CANCELLED):
+                    # Electron应用不可用、时间预算用完或命令被取消时后续操作也都会失败
+                    break
                 # 继续执行其他操作，不要因为一个失败就停止
             else:
                 print(f"✅ 操作成功")
-                # 操作间隔
-                time.sleep(1)
-        
-        # 3. 汇总结果
-        successful_actions = [r for r in results if r["success"]]
-        
+
         return {
-            "success": len(successful_actions) > 0,
-            "message": f"完成 {len(successful_actions)}/{len(results)} 个操作",
-            "analysis": analysis,
-            "action_results": results,
-            "task_description": task_description
+            "mode": "pipeline",
+            "results": results,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
         }
+
+    def _batch_steps(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把操作计划转换成批量接口的步骤，点击/输入步骤附带排好序的备选选择器"""
+        domains = self._plan_domains(actions)
+        steps = []
+        for action, domain in zip(actions, domains):
+            step = {
+                "action": action.get("action"),
+                "target": action.get("target"),
+                "value": action.get("value", "")
+            }
+            if action.get("action") == "wait":
+                spec = wait_condition_from_action(action)
+                step["condition"] = spec["condition"]
+                step["timeout"] = spec["timeout"]
+            elif "timeout" in action:
+                step["timeout"] = action["timeout"]
+            if "wait" in action:
+                step["wait"] = action["wait"]
+            if "submit" in action:
+                step["submit"] = action["submit"]
+            if action.get("action") in ("click", "input"):
+                selectors = self._rank_selectors(action, domain)
+                if selectors:
+                    step["target"], step["alternatives"] = selectors[0], selectors[1:]
+                # 服务器端按元素未找到的规则重试，已知失效的选择器不再重试
+                rule = self.retry_policy.rule_for("element_missing")
+                dead = self.selector_store is not None and self.selector_store.is_dead(domain, step["target"])
+                step["retries"] = 1 if dead else rule.max_attempts
+                step["retryDelayMs"] = int(rule.base_delay * 1000)
+                step["retryMaxDelayMs"] = int(rule.max_delay * 1000)
+                # 以下字段只在客户端记录结果时使用
+                step["domain"], step["role"] = domain, action.get("role")
+            steps.append(step)
+        return steps
+
+    def _record_batch_step(self, step: Dict[str, Any], outcome: Dict[str, Any]):
+        """根据批量接口的步骤结果更新选择器经验库"""
+        if self.selector_store is None or step.get("action") not in ("click", "input"):
+            return
+        if interrupted(outcome.get("result") or {}):
+            # 时间预算用完，步骤没有执行完
+            return
+        if not confirms_selector(step["action"], outcome.get("result") or {}, outcome.get("selector")):
+            return
+        tried = [step["target"]] + step.get("alternatives", [])
+        used = outcome.get("selector") if outcome.get("success") else None
+        for selector in tried:
+            if selector == used:
+                latency = outcome.get("elapsed_ms") if outcome.get("attempts") == 1 else None
+                self.selector_store.record(step["domain"], selector, True, latency, step.get("role"))
+                return
+            self.selector_store.record(step["domain"], selector, False, role=step.get("role"))
+
+    def _send_batch(self, steps: List[Dict[str, Any]], stop_on_error: bool) -> Optional[Dict[str, Any]]:
+        """提交批量操作，服务器不支持批量接口时返回None"""
+        payload: Dict[str, Any] = {"steps": steps, "stopOnError": stop_on_error}
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() is not None:
+            payload["deadlineMs"] = int(deadline.remaining() * 1000)
+        try:
+            url = f"http://localhost:{self.ipc_port}/api/webview/batch"
+            response = self.transport.post(
+                url,
+                endpoint="batch",
+                default_timeout=60,
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            )
+        except Exception as e:
+            if _not_sent(e):
+                # 服务器没有收到请求，可以改用客户端流水线
+                return None
+            # 请求已经发出，服务器可能执行了部分步骤，不能再逐步重新执行
+            return {"success": False, "error": str(e), "error_code": getattr(e, "error_code", None)}
+
+        if response.status_code == 404:
+            # 旧版服务器没有批量接口，之后直接使用客户端流水线
+            self.batch_supported = False
+            return None
+        if response.status_code != 200:
+            return {"success": False, "error": f"HTTP {response.status_code}: {response.text}",
+                    "status": response.status_code}
+
+        self.batch_supported = True
+        try:
+            return response.json()
+        except ValueError as e:
+            return {"success": False, "error": f"批量接口返回的不是JSON: {e}"}
     
     def execute_single_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
-        """执行单个操作（带重试机制）"""
+        """执行单个操作，页面可能因此变化时作废旧快照并开始预取新的页面状态"""
+        action_type = action.get("action")
+        # 操作执行时仍可使用当前页面的快照（如查询所在网站），执行后快照作废
+        with span("action", action=action_type) as record:
+            result = self._execute_action(action)
+            if record is not None:
+                record["success"] = bool(result.get("success"))
+        if self.prefetcher is not None and action_type != "wait":
+            self.prefetcher.invalidate()
+        if self.prefetcher is not None and action_type in PAGE_CHANGING_ACTIONS and result.get("success"):
+            # 导航已经等待过页面加载；输入和提交之后需要先等新页面稳定
+            self.prefetcher.schedule(action_type, settle=action_type != "navigate")
+        return result
+
+    def _execute_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个操作，点击和输入操作会依次尝试备选选择器并重试"""
         action_type = action.get("action")
         target = action.get("target")
-        value = action.get("value", "")
-
-        # 对于关键操作，添加重试机制
-        max_retries = 3 if action_type in ["input", "click"] else 1
-
-        for attempt in range(max_retries):
-            try:
-                if action_type == "navigate":
-                    result = self.send_ipc_command("navigate", url=target)
-                elif action_type == "click":
-                    result = self.send_ipc_command("click", selector=target)
-                elif action_type == "input":
-                    result = self.send_ipc_command("input", selector=target, text=value)
-                elif action_type == "submit":
-                    result = self.send_ipc_command("submit", selector=target)
-                elif action_type == "wait":
-                    wait_time = float(value) if value else 2.0
-                    time.sleep(wait_time)
-                    result = {"success": True, "message": f"等待 {wait_time} 秒"}
-                else:
-                    result = {
-                        "success": False,
-                        "error": f"不支持的操作类型: {action_type}"
-                    }
 
-                # 如果成功，直接返回
-                if result.get("success"):
-                    return result
-
-                # 如果失败且还有重试机会
-                if attempt < max_retries - 1:
-                    print(f"🔄 操作失败，重试 {attempt + 1}/{max_retries}: {result.get('error')}")
-                    time.sleep(2)  # 等待2秒后重试
-                else:
-                    return result
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"🔄 操作异常，重试 {attempt + 1}/{max_retries}: {str(e)}")
-                    time.sleep(2)
-                else:
-                    return {
-                        "success": False,
-                        "error": f"操作异常: {str(e)}"
-                    }
+        if action_type in ("click", "input"):
+            return self._execute_selector_action(action)
 
-        return {
-            "success": False,
-            "error": "重试次数已用完"
-        }
+        try:
+            if action_type == "navigate":
+                return self._navigate_and_wait(target, action)
+            if action_type == "submit":
+                return self.send_ipc_command("submit", selector=target)
+            if action_type == "wait":
+                spec = wait_condition_from_action(action)
+                return self.waiter.wait_for(spec["condition"], spec["timeout"])
+            return {
+                "success": False,
+                "error": f"不支持的操作类型: {action_type}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"操作异常: {str(e)}"
+            }
 
-    def fallback_rule_analysis(self, task_description: str) -> Dict[str, Any]:
-        """基于规则的回退分析"""
-        print("🔄 使用规则分析模式")
+    def _execute_selector_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行点击/输入操作
 
-        task_lower = task_description.lower()
+        目标选择器和备选选择器按经验库的成功率排序后各尝试一次；都失败时按重试策略决定是否
+        对排名第一的选择器重试：元素不存在时等元素出现再重试，服务器错误按带抖动的指数退避重试，
+        熔断、超时、4xx和时间预算用完时不重试（已失效的选择器也不再重试）。
+        与选择器有关的结果和耗时写回经验库。结果中附带尝试次数、重试次数和重试等待的总耗时。
+        """
+        action_type = action.get("action")
+        domain = action.get("domain") or self._current_domain()
+        selectors = self._rank_selectors(action, domain) or [action.get("target")]
+        dead = self.selector_store is not None and self.selector_store.is_dead(domain, selectors[0])
 
-        # 检测任务类型和目标网站
-        if '淘宝' in task_description and '搜索' in task_description:
-            # 提取搜索关键词
-            search_match = re.search(r'搜索["""]?([^"""]+)["""]?', task_description)
-            query = search_match.group(1).strip() if search_match else ""
+        result = {"success": False, "error": "重试次数已用完"}
+        error_class = None
+        index = attempts = retries = 0
+        retry_ms = 0.0
+        while True:
+            selector = selectors[index] if index < len(selectors) else selectors[0]
+            start = time.perf_counter()
+            if action_type == "click":
+                result = self.send_ipc_command("click", selector=selector)
+            else:
+                params = {"submit": action["submit"]} if "submit" in action else {}
+                result = self.send_ipc_command("input", selector=selector, text=action.get("value", ""), **params)
+            index += 1
+            attempts += 1
+            error_class = None if result.get("success") else classify(result)
+            if (self.selector_store is not None and error_class in SELECTOR_ERROR_CLASSES
+                    and confirms_selector(action_type, result, selector)):
+                latency = round((time.perf_counter() - start) * 1000, 2)
+                self.selector_store.record(domain, selector, bool(result.get("success")), latency, action.get("role"))
 
-            if not query:
-                # 尝试其他提取方式
-                query = re.sub(r'(打开|在|用|访问)?(淘宝|天猫)?(搜索|查找|买)?', '', task_description).strip()
+            if result.get("success"):
+                return {**result, "selector": selector, "attempts": attempts, "retries": retries,
+                        "retry_ms": round(retry_ms, 2)}
+            if index < len(selectors) and error_class in SELECTOR_ERROR_CLASSES[1:]:
+                # 换一个选择器；其他错误（如连接失败）换选择器也没有用
+                continue
+            if dead or not self.retry_policy.should_retry(error_class, retries):
+                break
 
-            return {
-                "success": True,
-                "analysis": "规则分析：淘宝搜索任务",
-                "elements_found": [
-                    {
-                        "type": "搜索框",
-                        "selector": "#q",
-                        "confidence": 0.8,
-                        "description": "淘宝主搜索框"
-                    }
-                ],
-                "recommended_actions": [
-                    {
-                        "action": "navigate",
-                        "target": "https://www.taobao.com",
-                        "description": "导航到淘宝首页",
-                        "order": 1
-                    },
-                    {
-                        "action": "input",
-                        "target": "#q",
-                        "value": query,
-                        "description": f"在搜索框输入: {query}",
-                        "order": 2
-                    },
-                    {
-                        "action": "wait",
-                        "target": "",
-                        "value": "5",
-                        "description": "等待搜索完成",
-                        "order": 3
-                    }
-                ],
-                "confidence": 0.8
-            }
+            retries += 1
+            delay = self.retry_policy.delay(error_class, retries)
+            print(f"🔄 操作失败（{error_class}），{delay:.1f}秒后重试 {retries}: "
+                  f"{result.get('error') or result.get('message')}")
+            wait_start = time.perf_counter()
+            element = selectors[0] if self.retry_policy.rule_for(error_class).wait_for_element else None
+            self._wait_before_retry(element, delay)
+            retry_ms += (time.perf_counter() - wait_start) * 1000
+            # 重试只针对排名第一的选择器
+            index = len(selectors)
+
+        return {**result, "attempts": attempts, "retries": retries, "retry_ms": round(retry_ms, 2),
+                "error_class": error_class}
+
+    def _current_domain(self) -> str:
+        """当前页面所在网站，没有经验库时不查询"""
+        if self.selector_store is None:
+            return ""
+        return domain_of(self.get_page_info().get("url"))
+
+    def _plan_domains(self, actions: List[Dict[str, Any]]) -> List[str]:
+        """推算计划中每一步所在的网站：从当前页面开始，遇到导航步骤切换到目标网站"""
+        if self.selector_store is None:
+            return [""] * len(actions)
+        domain = self._current_domain()
+        domains = []
+        for action in actions:
+            if action.get("action") == "navigate" and action.get("target"):
+                domain = domain_of(action["target"])
+            domains.append(action.get("domain") or domain)
+        return domains
+
+    def _rank_selectors(self, action: Dict[str, Any], domain: str) -> List[str]:
+        """目标选择器、备选选择器和同用途下学到的选择器，按成功率排序"""
+        candidates = [action.get("target")] + list(action.get("alternatives") or [])
+        if self.selector_store is None:
+            return list(dict.fromkeys(c for c in candidates if c))
+        return self.selector_store.candidates(domain, action.get("role"), candidates)
+
+    def _navigate_and_wait(self, url: str, action: Dict[str, Any]) -> Dict[str, Any]:
+        """导航并等待新页面开始可用，代替导航后的固定等待"""
+        before_url = self.waiter.current_url() if action.get("wait", True) else None
+        result = self.send_ipc_command("navigate", url=url)
+        if not result.get("success") or not action.get("wait", True):
+            return result
+
+        conditions = [{"type": "loaded"}]
+        if before_url and before_url.rstrip("/") != (url or "").rstrip("/"):
+            conditions.insert(0, {"type": "url_changed", "from": before_url})
+        ready = self.waiter.wait_for({"type": "all", "conditions": conditions}, action.get("timeout", 10))
+        return {**result, "ready": ready["success"], "ready_ms": ready["elapsed_ms"]}
+
+    def _wait_before_retry(self, selector: Optional[str], timeout: float):
+        """重试前等待（不超过命令的截止时间）；给出选择器时等待目标元素出现，元素出现即重试"""
+        with span("retry", selector=selector):
+            if selector:
+                self.waiter.wait_for({"type": "selector", "selector": selector}, timeout)
+            else:
+                retry_sleep(timeout)
 
-        elif '百度' in task_description and '搜索' in task_description:
-            search_match = re.search(r'搜索["""]?([^"""]+)["""]?', task_description)
-            query = search_match.group(1).strip() if search_match else ""
+    def fallback_rule_analysis(self, task_description: str) -> Dict[str, Any]:
+        """基于规则的回退分析"""
+        print("🔄 使用规则分析模式")
 
+        # 搜索任务：登记了结果页地址的网站直接打开结果页，结果页未就绪时执行fallback_actions（首页搜索）
+        parsed = parse_command(task_description)
+        spec = get_site(parsed.site)
+        if parsed.action == "search" and parsed.query and spec is not None:
+            plan = search_plan(parsed.site, parsed.query)
+            input_step = plan["fallback_actions"][1] if plan["fallback_actions"] else plan["actions"][1]
             return {
                 "success": True,
-                "analysis": "规则分析：百度搜索任务",
+                "analysis": f"规则分析：{spec.name}搜索任务",
                 "elements_found": [
                     {
                         "type": "搜索框",
-                        "selector": "#kw",
-                        "confidence": 0.9,
-                        "description": "百度搜索框"
-                    }
-                ],
-                "recommended_actions": [
-                    {
-                        "action": "navigate",
-                        "target": "https://www.baidu.com",
-                        "description": "导航到百度首页",
-                        "order": 1
-                    },
-                    {
-                        "action": "input",
-                        "target": "#kw",
-                        "value": query,
-                        "description": f"在搜索框输入并搜索: {query}",
-                        "order": 2
-                    },
-                    {
-                        "action": "wait",
-                        "target": "",
-                        "value": "3",
-                        "description": "等待搜索完成",
-                        "order": 3
+                        "selector": input_step["target"],
+                        "confidence": 0.8,
+                        "description": f"{spec.name}搜索框"
                     }
                 ],
-                "confidence": 0.9
+                "recommended_actions": plan["actions"],
+                "fallback_actions": plan["fallback_actions"],
+                "confidence": 0.8
             }
 
         return {
@@ -437,18 +1086,160 @@ def main():
     parser.add_argument('--command', type=str, help='要执行的自然语言命令')
     parser.add_argument('--ai-api', type=str, help='AI API地址')
     parser.add_argument('--ipc-port', type=int, default=3001, help='IPC通信端口')
+    parser.add_argument('--ipc-ports', type=str, metavar='PORTS',
+                        help='多个Electron实例的IPC端口（如 3001,3002 或 3001-3004），按健康状态和负载分发命令')
+    parser.add_argument('--server', action='store_true', help='以常驻服务模式运行，通过stdin/stdout处理JSON Lines请求')
+    parser.add_argument('--socket', type=str, help='常驻服务模式下监听的Unix Socket路径')
+    parser.add_argument('--pool-size', type=int, help='HTTP连接池每个主机保留的最大连接数')
+    parser.add_argument('--timeout', action='append', metavar='ENDPOINT=SECONDS',
+                        help='按端点类别设置超时，如 ipc=10、page_data=10、ai=60，可重复指定')
+    parser.add_argument('--circuit-threshold', type=int, default=3,
+                        help='IPC服务器或AI接口连续失败多少次后熔断（快速失败），0表示不熔断')
+    parser.add_argument('--circuit-reset', type=float, default=5.0, help='熔断后多久重新检查后端是否恢复（秒）')
+    parser.add_argument('--screenshot-max-width', type=int, default=1280, help='截图缩放后的最大宽度（像素）')
+    parser.add_argument('--screenshot-budget', type=int, default=200, help='压缩后截图的大小上限（KB）')
+    parser.add_argument('--screenshot-crop', type=str, metavar='X,Y,W,H', help='只保留截图中的关注区域')
+    parser.add_argument('--analysis-memo-size', type=int, default=256, help='按页面指纹缓存的分析结果条数，0表示不缓存')
+    parser.add_argument('--analysis-memo-ttl', type=float, default=3600, help='缓存分析结果的有效期（秒）')
+    parser.add_argument('--selector-store', type=str, help='选择器经验库的SQLite文件路径')
+    parser.add_argument('--no-selector-store', action='store_true', help='不记录和使用选择器成功率')
+    parser.add_argument('--stream', action='store_true', help='流式读取AI回复，计划中的操作生成一个执行一个')
+    parser.add_argument('--prefetch', action='store_true', help='导航/提交后在后台预取页面状态')
+    parser.add_argument('--prefetch-ttl', type=float, default=10.0, help='预取快照的有效期（秒）')
+    parser.add_argument('--no-plan-optimizer', action='store_true', help='按AI给出的原样执行计划，不去掉多余的步骤')
+    parser.add_argument('--plan-templates', type=str, help='计划模板库的SQLite文件路径')
+    parser.add_argument('--no-plan-templates', action='store_true', help='不学习和套用计划模板，每条新命令都请求AI')
+    parser.add_argument('--command-timeout', type=float,
+                        help='每条命令的时间预算（秒），用完后不再发出请求和重试；请求中的timeout字段优先')
+    parser.add_argument('--profile', action='store_true', help='记录各阶段耗时并附加到结果JSON的profile字段')
+    parser.add_argument('--profile-export', type=str, metavar='FILE',
+                        help='把各阶段耗时累加到Prometheus文本格式的直方图文件（隐含--profile）')
+    parser.add_argument('--batch', type=str, metavar='FILE',
+                        help='从JSON Lines文件（-表示stdin）读取并批量执行命令，结果按完成顺序逐行输出')
+    parser.add_argument('--concurrency', type=int, help='批量模式下同时执行的命令数，默认为Electron实例数')
+    parser.add_argument('--batch-output', type=str, metavar='FILE',
+                        help='批量模式的结果文件（追加写入），重新运行时跳过已有结果的命令')
+    parser.add_argument('--retry-failed', action='store_true', help='续跑时重新执行之前失败的命令')
     
     args = parser.parse_args()
+
+    ports = parse_ports(args.ipc_ports)
+    # 批量模式默认每个Electron实例同时执行一条命令
+    concurrency = args.concurrency or max(len(ports), 1)
+
+    if args.pool_size or args.timeout or concurrency > 8 or (args.circuit_threshold, args.circuit_reset) != (3, 5.0):
+        configure_shared_transport(
+            pool_maxsize=max(args.pool_size or 8, concurrency),
+            timeouts=parse_timeouts(args.timeout),
+            circuit_threshold=args.circuit_threshold,
+            circuit_reset=args.circuit_reset
+        )
+    pool = InstancePool(ports) if ports else None
+
+    # 分析缓存和选择器经验库在会话之间共享（均为线程安全）
+    analysis_memo = AnalysisMemo(
+        max_entries=args.analysis_memo_size,
+        ttl_seconds=args.analysis_memo_ttl
+    ) if args.analysis_memo_size > 0 else None
+    selector_store = None if args.no_selector_store else SelectorStore(db_path=args.selector_store)
+    plan_templates = None if args.no_plan_templates else PlanTemplateStore(db_path=args.plan_templates)
+
+    def create_automation(ipc_port: int) -> EnhancedWebViewAutomation:
+        """创建自动化控制器，截图、页面和分析记录等会话状态属于各自的实例"""
+        automation = EnhancedWebViewAutomation(
+            ipc_port=ipc_port,
+            screenshot_processor=ScreenshotProcessor(
+                max_width=args.screenshot_max_width,
+                max_bytes=args.screenshot_budget * 1024,
+                crop=parse_crop(args.screenshot_crop)
+            ),
+            analysis_memo=analysis_memo,
+            selector_store=selector_store,
+            stream_ai=args.stream,
+            prefetch=args.prefetch,
+            prefetch_ttl=args.prefetch_ttl,
+            optimize_plans=not args.no_plan_optimizer,
+            plan_templates=plan_templates,
+            command_timeout=args.command_timeout
+        )
+        if args.ai_api:
+            automation.set_ai_api(args.ai_api)
+        return automation
+
+    def dispatch(run_on, session=None):
+        """在单个IPC端口或端口池选出的实例上执行"""
+        return run_on(args.ipc_port) if pool is None else pool.run(run_on, session=session)
+
+    profile = args.profile or bool(args.profile_export)
     
-    # 初始化自动化控制器
-    automation = EnhancedWebViewAutomation(ipc_port=args.ipc_port)
-    
-    if args.ai_api:
-        automation.set_ai_api(args.ai_api)
-    
-    if args.command:
-        # 执行AI指导的任务
-        result = automation.execute_ai_guided_task(args.command)
+    if args.batch:
+        from batch_runner import run_batch
+
+        def run_one(request):
+            # 每条命令使用独立的会话，并发执行的命令之间互不影响
+            def run_on(port):
+                session = create_automation(port)
+                if request.get("ai_api"):
+                    session.set_ai_api(request["ai_api"])
+                try:
+                    return profile_call(
+                        lambda: session.execute_ai_guided_task(request["command"], timeout=request.get("timeout"),
+                                                               use_ai=request.get("use_ai", True)),
+                        enabled=request.get("profile", profile),
+                        export_path=args.profile_export
+                    )
+                finally:
+                    session.close()
+
+            return dispatch(run_on, request.get("session"))
+
+        run_batch(args.batch, run_one, concurrency=concurrency,
+                  output_path=args.batch_output, retry_failed=args.retry_failed)
+        if pool is not None:
+            print(json.dumps({"type": "instances", "instances": pool.get_stats()}, ensure_ascii=False),
+                  file=sys.stderr)
+    elif args.server or args.socket:
+        from automation_server import run_server
+
+        # 每个Electron实例一个常驻的自动化控制器
+        automations: Dict[int, EnhancedWebViewAutomation] = {}
+
+        def runner(request):
+            def run_on(port):
+                if port not in automations:
+                    automations[port] = create_automation(port)
+                automation = automations[port]
+                if request.get("ai_api"):
+                    automation.set_ai_api(request["ai_api"])
+                return profile_call(
+                    lambda: automation.execute_ai_guided_task(request["command"], timeout=request.get("timeout"),
+                                                                  use_ai=request.get("use_ai", True)),
+                    enabled=request.get("profile", profile),
+                    export_path=args.profile_export
+                )
+
+            result = dispatch(run_on, request.get("session"))
+            if pool is not None and request.get("end_session"):
+                pool.end_session(request.get("session"))
+            return result
+
+        def stats():
+            snapshot = {"circuits": get_shared_transport().get_stats()["circuits"]}
+            if plan_templates is not None:
+                snapshot["plan_templates"] = plan_templates.get_stats()
+            if pool is not None:
+                snapshot["instances"] = pool.get_stats()
+            return snapshot
+
+        run_server(runner, name="enhanced_webview_automation", socket_path=args.socket, stats=stats)
+    elif args.command:
+        # 执行AI指导的任务；记录耗时时进度输出转到stderr，stdout只输出结果JSON
+        with redirect_stdout(sys.stderr if profile else sys.stdout):
+            result = dispatch(lambda port: profile_call(
+                lambda: create_automation(port).execute_ai_guided_task(args.command),
+                enabled=profile,
+                export_path=args.profile_export
+            ))
         print(json.dumps(result, ensure_ascii=False, indent=2))
     else:
         print("请使用 --command 参数指定要执行的命令")
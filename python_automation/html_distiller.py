@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+HTML提炼 - 从页面HTML中提取可交互元素，生成紧凑的AI提示内容
+
+使用lxml的增量解析器分块读取HTML，跳过script/style和隐藏节点，
+处理完的元素立即释放，不在内存中保留完整的DOM树。输出按重要性排序并限制大小的元素列表，
+每个元素附带候选CSS选择器。lxml不可用时退回BeautifulSoup。
+"""
+
+import heapq
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# lxml加载需要约20ms，第一次提炼HTML时才导入；False表示已尝试但不可用
+_etree: Any = None
+
+DEFAULT_MAX_ELEMENTS = 40
+DEFAULT_MAX_CHARS = 2000
+CHUNK_SIZE = 64 * 1024
+
+INTERACTIVE_TAGS = {"input", "textarea", "select", "button", "a"}
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object"}
+SKIP_INPUT_TYPES = {"hidden"}
+TEXT_LIMIT = 40
+
+# 搜索相关的属性值，命中时优先展示
+_SEARCH_HINT = re.compile(r"search|query|keyword|^q$|^kw$|^wd$|^key$|搜索", re.IGNORECASE)
+_CSS_IDENT = re.compile(r"^-?[_a-zA-Z][_a-zA-Z0-9-]*$")
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _lxml_etree():
+    """按需导入lxml.etree，不可用时返回None"""
+    global _etree
+    if _etree is None:
+        try:
+            from lxml import etree
+        except ImportError:  # pragma: no cover - 取决于运行环境
+            etree = False
+        _etree = etree
+    return _etree or None
+
+
+def _css_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _is_hidden(tag: str, attrs: Dict[str, str]) -> bool:
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    if tag == "input" and attrs.get("type", "").lower() in SKIP_INPUT_TYPES:
+        return True
+    return bool(_HIDDEN_STYLE.search(attrs.get("style", "")))
+
+
+def candidate_selectors(tag: str, attrs: Dict[str, str], limit: int = 3) -> List[str]:
+    """按稳定性从高到低生成候选CSS选择器"""
+    candidates = []
+    element_id = attrs.get("id")
+    if element_id:
+        candidates.append(f"#{element_id}" if _CSS_IDENT.match(element_id) else f"[id={_css_string(element_id)}]")
+    for attr in ("name", "aria-label", "placeholder"):
+        if attrs.get(attr):
+            candidates.append(f"{tag}[{attr}={_css_string(attrs[attr])}]")
+    classes = [c for c in attrs.get("class", "").split() if _CSS_IDENT.match(c)][:2]
+    if classes:
+        candidates.append(tag + "".join(f".{c}" for c in classes))
+    if tag == "a" and attrs.get("href") and len(attrs["href"]) <= 80 and not attrs["href"].startswith("javascript"):
+        candidates.append(f"a[href={_css_string(attrs['href'])}]")
+    if tag in ("input", "button") and attrs.get("type"):
+        candidates.append(f"{tag}[type={_css_string(attrs['type'])}]")
+    return candidates[:limit]
+
+
+def _priority(tag: str, attrs: Dict[str, str]) -> int:
+    """元素展示优先级，数值越小越靠前"""
+    input_type = attrs.get("type", "text").lower()
+    if tag == "input" and input_type in ("submit", "button", "image"):
+        rank = 2
+    elif tag == "input":
+        rank = 0
+    else:
+        rank = {"textarea": 1, "button": 2, "select": 3, "a": 4}.get(tag, 5)
+    hints = " ".join(attrs.get(a, "") for a in ("id", "name", "class", "type", "placeholder", "aria-label", "role"))
+    if any(_SEARCH_HINT.search(word) for word in hints.split()):
+        rank -= 10
+    return rank
+
+
+def _make_element(tag: str, attrs: Dict[str, str], text: str) -> Optional[Dict[str, Any]]:
+    selectors = candidate_selectors(tag, attrs)
+    text = _WHITESPACE.sub(" ", text).strip()[:TEXT_LIMIT]
+    if not selectors and not text:
+        return None
+    element = {"tag": tag, "selectors": selectors}
+    if tag == "input":
+        element["type"] = attrs.get("type", "text").lower()
+    if text:
+        element["text"] = text
+    if attrs.get("placeholder"):
+        element["placeholder"] = attrs["placeholder"][:TEXT_LIMIT]
+    return element
+
+
+class _BestElements:
+    """只保留优先级最高的limit个元素（优先级相同时保留靠前的），内存占用与页面大小无关"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.total = 0
+        self._heap: List[tuple] = []
+
+    def accepts(self, priority: int) -> bool:
+        """优先级为priority的新元素能否进入结果（堆顶是当前保留的最差元素）"""
+        return len(self._heap) < self.limit or -priority > self._heap[0][0]
+
+    def add(self, priority: int, element: Dict[str, Any]):
+        entry = (-priority, -self.total, element)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+
+    def sorted(self) -> List[Dict[str, Any]]:
+        return [element for _, _, element in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+
+def _iter_events(html: str, chunk_size: int) -> Iterable[tuple]:
+    """分块喂给增量解析器，逐个产出start/end事件"""
+    etree = _lxml_etree()
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        yield from parser.read_events()
+    try:
+        parser.close()
+    except etree.LxmlError:
+        # 空文档
+        return
+    # 未闭合标签的end事件在close时才产生
+    yield from parser.read_events()
+
+
+def _distill_lxml(html: str, limit: int, chunk_size: int):
+    """增量解析，返回 (title, _BestElements)"""
+    title = ""
+    best = _BestElements(limit)
+    # 每个打开的元素是否处于隐藏/跳过状态
+    hidden_stack: List[bool] = []
+    # 当前打开的可交互元素数量，内部节点的文本需要保留到可交互元素结束
+    interactive_depth = 0
+
+    for event, element in _iter_events(html, chunk_size):
+        tag = element.tag.lower() if isinstance(element.tag, str) else ""
+        if event == "start":
+            attrs = {k.lower(): v for k, v in element.attrib.items()} if tag else {}
+            hidden = (bool(hidden_stack) and hidden_stack[-1]) or tag in SKIP_TAGS or _is_hidden(tag, attrs)
+            hidden_stack.append(hidden)
+            if tag in INTERACTIVE_TAGS and not hidden:
+                interactive_depth += 1
+            continue
+
+        hidden = hidden_stack.pop() if hidden_stack else False
+        if tag == "title" and not title:
+            title = _WHITESPACE.sub(" ", element.text or "").strip()
+        if tag in INTERACTIVE_TAGS and not hidden:
+            interactive_depth -= 1
+            attrs = {k.lower(): v for k, v in element.attrib.items()}
+            priority = _priority(tag, attrs)
+            if best.accepts(priority):
+                text = "".join(element.itertext()) if tag != "select" else ""
+                item = _make_element(tag, attrs, text or attrs.get("value", "") or attrs.get("title", ""))
+                if item:
+                    best.add(priority, item)
+            best.total += 1
+
+        if interactive_depth == 0:
+            # 释放已处理的节点和之前的兄弟节点，控制内存占用
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+    return title, best
+
+
+def _distill_soup(html: str, limit: int):
+    """lxml不可用时使用BeautifulSoup（会构建完整DOM树）"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for node in soup.find_all(list(SKIP_TAGS)):
+        node.decompose()
+
+    title = _WHITESPACE.sub(" ", soup.title.get_text()).strip() if soup.title else ""
+    best = _BestElements(limit)
+    for node in soup.find_all(list(INTERACTIVE_TAGS)):
+        attrs = {k.lower(): " ".join(v) if isinstance(v, list) else v for k, v in node.attrs.items()}
+        if _is_hidden(node.name, attrs) or any(
+            _is_hidden(parent.name, {k: " ".join(v) if isinstance(v, list) else v for k, v in parent.attrs.items()})
+            for parent in node.parents if parent.name
+        ):
+            continue
+        priority = _priority(node.name, attrs)
+        if best.accepts(priority):
+            text = node.get_text() if node.name != "select" else ""
+            item = _make_element(node.name, attrs, text or attrs.get("value", "") or attrs.get("title", ""))
+            if item:
+                best.add(priority, item)
+        best.total += 1
+    return title, best
+
+
+def distill_html(html: str, max_elements: int = DEFAULT_MAX_ELEMENTS,
+                 chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    提炼页面HTML
+
+    Args:
+        html: 页面HTML
+        max_elements: 最多输出的元素数量
+        chunk_size: 增量解析的分块大小
+
+    Returns:
+        {"title": 页面标题, "elements": [元素...], "total_found": 找到的元素总数, "source_chars": HTML长度}
+    """
+    # 按优先级保留，页面前部的大量链接不会挤掉后面的搜索框
+    if _lxml_etree() is not None:
+        title, best = _distill_lxml(html, max_elements, chunk_size)
+    else:
+        title, best = _distill_soup(html, max_elements)
+
+    return {
+        "title": title,
+        "elements": best.sorted(),
+        "total_found": best.total,
+        "source_chars": len(html)
+    }
+
+
+def format_for_prompt(distilled: Dict[str, Any], max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """把提炼结果格式化为提示文本，总长度不超过max_chars"""
+    lines = []
+    if distilled.get("title"):
+        lines.append(f"标题: {distilled['title']}")
+
+    size = sum(len(line) + 1 for line in lines)
+    for element in distilled.get("elements", []):
+        parts = [element["tag"] + (f"[{element['type']}]" if element.get("type") else "")]
+        if element.get("text"):
+            parts.append(f"文本:{element['text']}")
+        if element.get("placeholder"):
+            parts.append(f"提示:{element['placeholder']}")
+        if element.get("selectors"):
+            parts.append("选择器: " + " | ".join(element["selectors"]))
+        line = "- " + " ".join(parts)
+        if size + len(line) + 1 > max_chars:
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
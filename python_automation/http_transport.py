@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP传输层 - 基于requests.Session的长连接池
+
+IPC服务器（localhost:3001）和AI接口的所有请求都通过同一个传输层发送，
+连接在请求之间保持复用，避免每次调用都重新建立TCP连接。
+每个后端（host:port）有一个熔断器，后端不可用时请求直接失败（见 circuit_breaker）。
+设置了命令截止时间（见 retry_policy）时，每个请求的超时截短到剩余时间，时间用完后请求不再发出。
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from circuit_breaker import CircuitBreaker
+from profiler import span
+from retry_policy import DeadlineExceededError, current_deadline
+
+# 这些端点类别的后端是Electron的IPC服务器，可以用 /api/health 检查是否恢复
+IPC_ENDPOINTS = ("ipc", "page_data", "batch")
+HEALTH_TTL = 2.0
+
+
+class TransportStats:
+    """传输层连接统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.errors = 0
+        self.circuit_rejections = 0
+
+    def increment(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(0, self.requests - self.connections_opened),
+                "errors": self.errors,
+                "circuit_rejections": self.circuit_rejections
+            }
+
+
+def _counting_pool_class(base, stats: TransportStats):
+    """创建在新建连接时计数的连接池类"""
+
+    class CountingConnectionPool(base):
+        def _new_conn(self):
+            stats.increment("connections_opened")
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    """统计新建连接数的HTTPAdapter"""
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self._stats),
+            "https": _counting_pool_class(HTTPSConnectionPool, self._stats)
+        }
+
+
+class HttpTransport:
+    """带连接池的HTTP传输层"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 8,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 circuit_threshold: int = 3, circuit_reset: float = 5.0):
+        """
+        初始化传输层
+
+        Args:
+            pool_connections: 缓存的连接池数量（每个host一个池）
+            pool_maxsize: 每个连接池保留的最大连接数
+            timeouts: 按端点类别配置的超时（秒），如 {"ipc": 10, "ai": 60}
+            circuit_threshold: 连续失败多少次后熔断，0表示不使用熔断器
+            circuit_reset: 熔断后多久允许试探请求（秒）
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeouts = dict(timeouts or {})
+        self.circuit_threshold = circuit_threshold
+        self.circuit_reset = circuit_reset
+        self.stats = TransportStats()
+        self.session = self._create_session()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._health: Dict[str, Tuple[bool, float]] = {}
+        self._breaker_lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _CountingAdapter(
+            self.stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def timeout_for(self, endpoint: str, default: float) -> float:
+        """获取端点类别的超时，未配置时使用调用方的默认值"""
+        return self.timeouts.get(endpoint, default)
+
+    def check_health(self, netloc: str, max_age: float = HEALTH_TTL) -> bool:
+        """
+        检查IPC服务器的 /api/health，max_age秒内的结果直接复用
+
+        Args:
+            netloc: IPC服务器地址（host:port）
+            max_age: 缓存结果的有效期（秒）
+        """
+        cached = self._health.get(netloc)
+        if cached and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+        try:
+            response = self.session.get(f"http://{netloc}/api/health", timeout=2.0)
+            healthy = response.status_code == 200 and bool(response.json().get("success"))
+        except (requests.exceptions.RequestException, ValueError):
+            healthy = False
+        self._health[netloc] = (healthy, time.monotonic())
+        return healthy
+
+    def breaker_for(self, url: str, endpoint: str) -> Optional[CircuitBreaker]:
+        """获取后端的熔断器，健康检查请求和未开启熔断时返回None"""
+        if self.circuit_threshold <= 0 or endpoint == "health":
+            return None
+        netloc = urlsplit(url).netloc
+        with self._breaker_lock:
+            breaker = self._breakers.get(netloc)
+            if breaker is None:
+                health_check = (lambda: self.check_health(netloc)) if endpoint in IPC_ENDPOINTS else None
+                breaker = CircuitBreaker(netloc, self.circuit_threshold, self.circuit_reset, health_check)
+                self._breakers[netloc] = breaker
+            return breaker
+
+    def request(self, method: str, url: str, endpoint: str = "default",
+                default_timeout: float = 30, **kwargs) -> requests.Response:
+        """
+        发送HTTP请求
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            endpoint: 端点类别（ipc/page_data/ai），用于选择超时
+            default_timeout: 端点类别未配置超时时使用的值
+            **kwargs: 透传给requests的参数
+
+        Returns:
+            requests响应对象，网络异常会原样抛出；后端熔断中时抛出CircuitOpenError，
+            截止时间已到或命令已取消时抛出DeadlineError
+        """
+        kwargs.setdefault("timeout", self.timeout_for(endpoint, default_timeout))
+        deadline = current_deadline()
+        capped = False
+        if deadline is not None:
+            deadline.check()
+            timeout = deadline.cap(kwargs["timeout"])
+            capped = timeout < kwargs["timeout"]
+            kwargs["timeout"] = timeout
+        breaker = self.breaker_for(url, endpoint)
+        if breaker is not None:
+            try:
+                breaker.before_call()
+            except requests.exceptions.RequestException:
+                self.stats.increment("circuit_rejections")
+                raise
+        self.stats.increment("requests")
+        # 耗时按端点类别归入ipc/page_data/ai/batch阶段（流式响应只统计到收到响应头为止）
+        with span(endpoint, path=urlsplit(url).path) as record:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception as e:
+                if capped and isinstance(e, requests.exceptions.Timeout):
+                    # 超时是因为命令的时间预算用完，不说明后端不可用
+                    if record is not None:
+                        record["error"] = "DeadlineExceededError"
+                    if breaker is not None:
+                        breaker.release()
+                    raise DeadlineExceededError("命令的时间预算已用完") from e
+                if isinstance(e, requests.exceptions.RequestException):
+                    self.stats.increment("errors")
+                if breaker is not None:
+                    breaker.record(error=e)
+                if record is not None:
+                    record["error"] = type(e).__name__
+                raise
+            if breaker is not None:
+                breaker.record(status_code=response.status_code)
+            if record is not None:
+                record["status"] = response.status_code
+            return response
+
+    def get(self, url: str, endpoint: str = "default", default_timeout: float = 30,
+            **kwargs) -> requests.Response:
+        return self.request("GET", url, endpoint=endpoint, default_timeout=default_timeout, **kwargs)
+
+    def post(self, url: str, endpoint: str = "default", default_timeout: float = 30,
+             **kwargs) -> requests.Response:
+        return self.request("POST", url, endpoint=endpoint, default_timeout=default_timeout, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接统计"""
+        stats = self.stats.to_dict()
+        stats["pool_maxsize"] = self.pool_maxsize
+        with self._breaker_lock:
+            stats["circuits"] = {name: breaker.get_stats() for name, breaker in self._breakers.items()}
+        return stats
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_shared_transport: Optional[HttpTransport] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_transport() -> HttpTransport:
+    """获取进程内共享的传输层实例"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HttpTransport()
+        return _shared_transport
+
+
+def configure_shared_transport(pool_connections: int = 4, pool_maxsize: int = 8,
+                               timeouts: Optional[Dict[str, float]] = None,
+                               circuit_threshold: int = 3, circuit_reset: float = 5.0) -> HttpTransport:
+    """按指定参数重建共享传输层"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is not None:
+            _shared_transport.close()
+        _shared_transport = HttpTransport(pool_connections, pool_maxsize, timeouts, circuit_threshold, circuit_reset)
+        return _shared_transport
+
+
+def parse_timeouts(values) -> Dict[str, float]:
+    """解析命令行的 ENDPOINT=SECONDS 超时配置"""
+    timeouts = {}
+    for value in values or []:
+        endpoint, _, seconds = value.partition("=")
+        if not endpoint or not seconds:
+            raise ValueError(f"超时配置格式错误: {value}，应为 ENDPOINT=SECONDS")
+        timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+多实例IPC端口池 - 一个Python客户端把命令分发到同一主机上的多个Electron实例
+
+每个实例由IPC端口标识，通过 /api/health 探测是否可用：
+    - 路由：在健康的实例中选择未完成命令最少的一个（相同时选择累计处理较少的）
+    - 粘性会话：带会话标识的命令（如多步骤的AI指导任务）固定在第一次分配的实例上
+    - 摘除：命令失败后复查健康状态，探测失败的实例被摘除一段时间，到期后重新探测再恢复
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from http_transport import HttpTransport, get_shared_transport
+
+DEFAULT_DRAIN_SECONDS = 30.0
+HEALTH_TIMEOUT = 2.0
+
+
+def parse_ports(value: Optional[str]) -> List[int]:
+    """解析命令行的端口列表，如 "3001,3002,3003" 或 "3001-3004" """
+    ports: List[int] = []
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, _, last = part.partition("-")
+            ports.extend(range(int(first), int(last) + 1))
+        else:
+            ports.append(int(part))
+    return list(dict.fromkeys(ports))
+
+
+class _Instance:
+    """一个Electron实例的健康状态和计数"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.healthy = True
+        self.drained_until = 0.0
+        self.outstanding = 0
+        self.completed = 0
+        self.errors = 0
+        self.drains = 0
+        self.total_ms = 0.0
+        self.last_health: Optional[Dict[str, Any]] = None
+        self.last_checked = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.drained_until
+
+
+class InstancePool:
+    """按健康状态和负载分发命令的IPC端口池"""
+
+    def __init__(self, ports: List[int], transport: Optional[HttpTransport] = None,
+                 drain_seconds: float = DEFAULT_DRAIN_SECONDS, probe_on_start: bool = True):
+        """
+        初始化端口池
+
+        Args:
+            ports: 各Electron实例的IPC端口
+            transport: HTTP传输层，默认使用共享连接池
+            drain_seconds: 实例被摘除后多久重新探测
+            probe_on_start: 是否立即探测所有实例的健康状态
+        """
+        if not ports:
+            raise ValueError("端口池至少需要一个IPC端口")
+        self.transport = transport or get_shared_transport()
+        self.drain_seconds = drain_seconds
+        self.started_at = time.monotonic()
+        self._instances = {port: _Instance(port) for port in ports}
+        self._sessions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if probe_on_start:
+            self.probe_all()
+
+    @property
+    def ports(self) -> List[int]:
+        return list(self._instances)
+
+    def probe(self, port: int) -> bool:
+        """请求实例的 /api/health，webview未就绪也视为不可用"""
+        instance = self._instances[port]
+        health: Optional[Dict[str, Any]] = None
+        try:
+            response = self.transport.get(
+                f"http://localhost:{port}/api/health",
+                endpoint="health",
+                default_timeout=HEALTH_TIMEOUT
+            )
+            if response.status_code == 200:
+                health = response.json()
+        except Exception:
+            health = None
+        healthy = bool(health and health.get("success") and health.get("webViewReady", True))
+
+        with self._lock:
+            instance.last_health = health
+            instance.last_checked = time.monotonic()
+            if healthy:
+                instance.healthy = True
+                instance.drained_until = 0.0
+            else:
+                self._drain(instance)
+        return healthy
+
+    def probe_all(self) -> Dict[int, bool]:
+        return {port: self.probe(port) for port in self._instances}
+
+    def _drain(self, instance: _Instance):
+        """摘除实例（调用方持有锁），固定在该实例上的会话重新分配"""
+        if instance.healthy:
+            instance.drains += 1
+        instance.healthy = False
+        instance.drained_until = time.monotonic() + self.drain_seconds
+        for session, port in list(self._sessions.items()):
+            if port == instance.port:
+                del self._sessions[session]
+
+    def _recover_expired(self):
+        """重新探测摘除期已满的实例"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [i.port for i in self._instances.values() if not i.healthy and now >= i.drained_until]
+        for port in expired:
+            self.probe(port)
+
+    def _pick(self, session: Optional[str]) -> Optional[_Instance]:
+        now = time.monotonic()
+        if session is not None and session in self._sessions:
+            pinned = self._instances[self._sessions[session]]
+            if pinned.available(now):
+                return pinned
+        candidates = [i for i in self._instances.values() if i.available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: (i.outstanding, i.completed + i.errors))
+
+    def acquire(self, session: Optional[str] = None) -> Optional[int]:
+        """
+        为一条命令选择实例
+
+        Args:
+            session: 会话标识，同一会话的命令固定分配到同一个实例
+
+        Returns:
+            IPC端口，所有实例都不可用时返回None
+        """
+        self._recover_expired()
+        with self._lock:
+            instance = self._pick(session)
+            if instance is None:
+                return None
+            instance.outstanding += 1
+            if session is not None:
+                self._sessions[session] = instance.port
+            return instance.port
+
+    def release(self, port: int, success: bool, elapsed_ms: Optional[float] = None):
+        """命令完成后更新计数；失败时复查实例健康状态，不可用的实例被摘除"""
+        with self._lock:
+            instance = self._instances[port]
+            instance.outstanding = max(0, instance.outstanding - 1)
+            if success:
+                instance.completed += 1
+            else:
+                instance.errors += 1
+            if elapsed_ms is not None:
+                instance.total_ms += elapsed_ms
+        if not success:
+            self.probe(port)
+
+    def run(self, func: Callable[[int], Dict[str, Any]], session: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在选出的实例上执行 func(port)，按返回结果的success更新实例状态
+
+        Returns:
+            func的结果（附带ipc_port），没有可用实例时返回错误结果
+        """
+        port = self.acquire(session)
+        if port is None:
+            return {"success": False, "error": "没有可用的Electron实例", "ipc_ports": self.ports}
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"success": False}
+        try:
+            result = func(port)
+            return {**result, "ipc_port": port}
+        finally:
+            self.release(port, bool(result.get("success")), round((time.perf_counter() - start) * 1000, 2))
+
+    def end_session(self, session: str):
+        """会话结束后解除固定"""
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """各实例的健康状态、负载、吞吐量和错误率"""
+        now = time.monotonic()
+        uptime = max(now - self.started_at, 1e-9)
+        with self._lock:
+            sessions: Dict[int, int] = {}
+            for port in self._sessions.values():
+                sessions[port] = sessions.get(port, 0) + 1
+            stats = []
+            for instance in self._instances.values():
+                finished = instance.completed + instance.errors
+                stats.append({
+                    "port": instance.port,
+                    "healthy": instance.healthy,
+                    "draining": not instance.available(now),
+                    "outstanding": instance.outstanding,
+                    "completed": instance.completed,
+                    "errors": instance.errors,
+                    "error_rate": round(instance.errors / finished, 4) if finished else 0.0,
+                    "throughput_per_s": round(finished / uptime, 3),
+                    "avg_ms": round(instance.total_ms / finished, 2) if finished else None,
+                    "drains": instance.drains,
+                    "sessions": sessions.get(instance.port, 0)
+                })
+        return stats
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+命令意图缓存 - 缓存AI解析出的操作指令，重复命令无需再次请求AI
+
+内存LRU在前，SQLite持久化存储在后，进程退出后缓存依然有效（适用于每条命令一个进程的CLI模式）。
+查找只读数据库：命中统计和每个条目的命中次数先记在内存中，定期、关闭时和进程退出时一次写入。
+"""
+
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "WEBVIEW_AUTOMATION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+)
+
+_TRAILING_PUNCTUATION = "，。！？、；：,.!?;: "
+# 内存中的统计计数最多积累这么久（秒）再写入数据库
+STATS_FLUSH_INTERVAL = 30.0
+
+
+def normalize_command(command: str) -> str:
+    """规范化命令文本：全角转半角、统一大小写、合并空白、去掉结尾标点"""
+    text = unicodedata.normalize("NFKC", command).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def _coerce_confidence(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class IntentCache:
+    """带TTL的两级意图缓存"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, min_confidence: float = 0.8):
+        """
+        初始化意图缓存
+
+        Args:
+            db_path: SQLite文件路径，None表示默认缓存目录，":memory:"表示不持久化
+            max_entries: 内存LRU的最大条目数
+            ttl_seconds: 缓存条目的有效期（秒）
+            min_confidence: 只有置信度不低于该值的指令才会被缓存
+        """
+        if db_path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "intent_cache.db")
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_confidence = min_confidence
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "rejected": 0, "expired": 0, "evictions": 0}
+        # 尚未写入数据库的统计计数和条目命中次数
+        self._pending: Counter = Counter()
+        self._pending_hits: Counter = Counter()
+        self._flushed_at = time.monotonic()
+        self._closed = False
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS intent_cache (
+                key TEXT PRIMARY KEY,
+                instruction TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                created_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS intent_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        self.purge_expired()
+        atexit.register(self.flush_stats)
+
+    def get(self, command: str) -> Optional[Dict[str, Any]]:
+        """查找命令对应的缓存指令，未命中或已过期返回None"""
+        key = normalize_command(command)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT instruction, created_at FROM intent_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+
+            if entry is not None and now - entry[1] > self.ttl_seconds:
+                self._delete(key)
+                self._db.commit()
+                self._count("expired")
+                entry = None
+
+            if entry is None:
+                self._count("misses")
+                self._flush_if_due()
+                return None
+
+            self._remember(key, entry)
+            self._pending_hits[key] += 1
+            self._count("hits")
+            self._flush_if_due()
+            return dict(entry[0])
+
+    def put(self, command: str, instruction: Dict[str, Any]) -> bool:
+        """缓存指令，置信度低于阈值时不缓存并返回False"""
+        confidence = _coerce_confidence(instruction.get("confidence"))
+        with self._lock:
+            if confidence < self.min_confidence:
+                self._count("rejected")
+                self._flush_if_due()
+                return False
+
+            key = normalize_command(command)
+            created_at = time.time()
+            # 替换后的条目重新计数
+            self._pending_hits.pop(key, None)
+            self._db.execute(
+                "INSERT OR REPLACE INTO intent_cache (key, instruction, confidence, created_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(instruction, ensure_ascii=False), confidence, created_at)
+            )
+            self._remember(key, (dict(instruction), created_at))
+            self._count("stores")
+            self._flush_locked()
+            return True
+
+    def invalidate(self, command: str):
+        """删除命令对应的缓存（例如缓存的指令执行失败时）"""
+        with self._lock:
+            self._delete(normalize_command(command))
+            self._db.commit()
+
+    def purge_expired(self) -> int:
+        """删除所有过期条目，返回删除数量"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM intent_cache WHERE created_at < ?", (cutoff,))
+            for key in [k for k, (_, created_at) in self._memory.items() if created_at < cutoff]:
+                del self._memory[key]
+            self._db.commit()
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取本进程和累计的命中统计"""
+        with self._lock:
+            persisted = Counter(dict(self._db.execute("SELECT name, value FROM intent_cache_stats").fetchall()))
+            persisted = dict(persisted + self._pending)
+            entries = self._db.execute("SELECT COUNT(*) FROM intent_cache").fetchone()[0]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            total_lookups = persisted.get("hits", 0) + persisted.get("misses", 0)
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "stored_entries": entries,
+                "total": persisted,
+                "total_hit_rate": round(persisted.get("hits", 0) / total_lookups, 4) if total_lookups else 0.0
+            }
+
+    def flush_stats(self):
+        """把内存中的统计计数写入数据库"""
+        with self._lock:
+            if not self._closed:
+                self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._db.close()
+        atexit.unregister(self.flush_stats)
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _delete(self, key: str):
+        self._memory.pop(key, None)
+        self._pending_hits.pop(key, None)
+        self._db.execute("DELETE FROM intent_cache WHERE key = ?", (key,))
+
+    def _count(self, name: str):
+        self._stats[name] += 1
+        self._pending[name] += 1
+
+    def _flush_if_due(self):
+        if time.monotonic() - self._flushed_at >= STATS_FLUSH_INTERVAL:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """在一个事务中写入积累的计数（调用方持有锁）"""
+        self._db.executemany(
+            "INSERT INTO intent_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(self._pending.items())
+        )
+        self._db.executemany(
+            "UPDATE intent_cache SET hits = hits + ? WHERE key = ?",
+            [(count, key) for key, count in self._pending_hits.items()]
+        )
+        self._db.commit()
+        self._pending.clear()
+        self._pending_hits.clear()
+        self._flushed_at = time.monotonic()
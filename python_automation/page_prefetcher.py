@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+页面状态预取 - 导航/提交之后在后台提前获取页面信息、HTML和截图
+
+预取结果放在一个短期有效的快照槽中：下一次页面分析或页面信息查询直接使用快照，
+不再串行请求IPC服务器。新的操作会让旧快照作废，没被使用的预取会被取消并计数。
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+from retry_policy import clear_deadline
+
+DEFAULT_TTL = 10.0
+DEFAULT_TAKE_TIMEOUT = 15.0
+
+
+class _Slot:
+    """一次预取：各部分的Future、创建时间和取消标记"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        self.created_at = time.monotonic()
+        self.cancelled = threading.Event()
+        self.futures: Dict[str, Future] = {}
+        self.settle: Optional[Future] = None
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class PagePrefetcher:
+    """推测性页面状态预取器"""
+
+    def __init__(self, fetchers: Dict[str, Callable[[], Any]], ttl: float = DEFAULT_TTL,
+                 settle: Optional[Callable[[], Any]] = None, max_workers: int = 4):
+        """
+        初始化预取器
+
+        Args:
+            fetchers: 快照各部分的获取函数，如 {"page_info": ..., "html": ..., "screenshot": ...}
+            ttl: 快照的有效期（秒，从开始预取算起）
+            settle: 预取前等待页面稳定的函数（提交搜索等不会等待页面加载的操作之后使用）
+            max_workers: 后台线程数，应大于fetchers的数量
+        """
+        self.fetchers = fetchers
+        self.ttl = ttl
+        self.settle = settle
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._slot: Optional[_Slot] = None
+        self._stats = {"scheduled": 0, "used": 0, "partial_used": 0, "cancelled": 0, "expired": 0, "misses": 0}
+
+    def schedule(self, reason: str = "", settle: bool = False):
+        """开始一次预取，未被使用的上一次预取会被取消"""
+        slot = _Slot(reason)
+        # 后台任务沿用调用方的上下文（如当前命令的耗时记录器），但不受当前命令的截止时间约束
+        context = contextvars.copy_context()
+        context.run(clear_deadline)
+        if settle and self.settle is not None:
+            slot.settle = self._executor.submit(context.copy().run, self.settle)
+        for name, fetch in self.fetchers.items():
+            slot.futures[name] = self._executor.submit(context.copy().run, self._fetch_part, slot, fetch)
+        with self._lock:
+            previous, self._slot = self._slot, slot
+            self._stats["scheduled"] += 1
+        if previous is not None:
+            self._cancel(previous, "cancelled")
+
+    def _fetch_part(self, slot: _Slot, fetch: Callable[[], Any]) -> Any:
+        if slot.settle is not None:
+            try:
+                slot.settle.result()
+            except Exception:
+                pass
+        if slot.cancelled.is_set():
+            # 已经作废的预取不再请求服务器
+            return None
+        return fetch()
+
+    def _cancel(self, slot: _Slot, counter: str):
+        slot.cancelled.set()
+        if slot.settle is not None:
+            slot.settle.cancel()
+        for future in slot.futures.values():
+            future.cancel()
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _fresh_slot(self) -> Optional[_Slot]:
+        """返回未过期的快照槽，过期的快照作废"""
+        with self._lock:
+            slot = self._slot
+            if slot is not None and slot.age() > self.ttl:
+                self._slot = None
+            else:
+                return slot
+        self._cancel(slot, "expired")
+        return None
+
+    @staticmethod
+    def _result(future: Future, timeout: Optional[float]) -> Any:
+        try:
+            return future.result(timeout=timeout)
+        except (CancelledError, FutureTimeoutError):
+            return None
+        except Exception:
+            return None
+
+    def take(self, timeout: float = DEFAULT_TAKE_TIMEOUT) -> Optional[Dict[str, Any]]:
+        """
+        取走完整快照（仍在获取中的部分会等待完成）
+
+        Returns:
+            {部分名称: 数据, "prefetch_age_ms": 快照年龄}，没有可用快照时返回None
+        """
+        slot = self._fresh_slot()
+        with self._lock:
+            if slot is None or self._slot is not slot:
+                self._stats["misses"] += 1
+                return None
+            self._slot = None
+            self._stats["used"] += 1
+        snapshot = {name: self._result(future, timeout) for name, future in slot.futures.items()}
+        snapshot["prefetch_age_ms"] = round(slot.age() * 1000, 2)
+        return snapshot
+
+    def take_part(self, name: str, timeout: float = DEFAULT_TAKE_TIMEOUT) -> Optional[Any]:
+        """读取快照中的一部分（如page_info），快照保留给后续的页面分析"""
+        slot = self._fresh_slot()
+        if slot is None or name not in slot.futures:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        value = self._result(slot.futures[name], timeout)
+        with self._lock:
+            self._stats["partial_used" if value is not None else "misses"] += 1
+        return value
+
+    def invalidate(self):
+        """页面即将变化（执行新操作）时作废当前快照"""
+        with self._lock:
+            slot, self._slot = self._slot, None
+        if slot is not None:
+            self._cancel(slot, "cancelled")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._slot is not None
+        return stats
+
+    def close(self):
+        self.invalidate()
+        self._executor.shutdown(wait=False)
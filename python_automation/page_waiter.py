@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+页面就绪等待 - 用条件轮询代替固定的sleep
+
+通过 execute-script 接口在页面内执行探测脚本，读取当前URL、加载状态、选择器是否存在
+以及距离最近一次DOM变化的时间，条件满足立即返回，否则以逐渐增大的间隔继续轮询直到超时。
+
+支持的条件（与 main/webview-controller.js 的 waitForCondition 保持一致）：
+    {"type": "selector", "selector": "#content_left"}    选择器出现
+    {"type": "url_changed", "from": "https://..."}        URL变化（from为空时取等待开始时的URL）
+    {"type": "url_contains", "value": "s.taobao.com"}     URL包含指定文本
+    {"type": "url_lacks", "value": "s.taobao.com"}        URL不包含指定文本
+    {"type": "loaded"}                                    document.readyState 不是 loading
+    {"type": "ready"}                                     document.readyState 为 complete
+    {"type": "dom_quiet", "quiet_ms": 500}                DOM在指定时间内没有变化
+    {"type": "all"|"any", "conditions": [...]}           组合条件
+
+最外层条件可以带 "fail_if": {...}：该条件满足时（如被重定向到登录页）不再等待，立即返回失败。
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from circuit_breaker import CIRCUIT_OPEN
+from profiler import span
+from retry_policy import CANCELLED, DEADLINE_EXCEEDED, current_deadline
+from retry_policy import sleep as deadline_sleep
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_QUIET_MS = 500
+# 旧式“等待N秒”没有具体条件时，视为最多等待N秒直到页面安静下来。
+# 输入操作会在约1.5秒后自动提交搜索，安静窗口需要覆盖这段时间
+LEGACY_WAIT_QUIET_MS = 1500
+
+_PROBE_SCRIPT = """(function() {
+    var selectors = [%s];
+    if (!window.__webviewWaiter) {
+        window.__webviewWaiter = { lastMutation: Date.now() };
+        try {
+            new MutationObserver(function() {
+                window.__webviewWaiter.lastMutation = Date.now();
+            }).observe(document.documentElement, { subtree: true, childList: true, attributes: true, characterData: true });
+        } catch (e) {}
+    }
+    return {
+        url: window.location.href,
+        readyState: document.readyState,
+        found: selectors.map(function(selector) {
+            try { return !!document.querySelector(selector); } catch (e) { return false; }
+        }),
+        quietMs: Date.now() - window.__webviewWaiter.lastMutation
+    };
+})();"""
+
+
+def _js_string(text: str) -> str:
+    """
+    生成不含引号和反斜杠的JS字符串表达式
+
+    脚本会被嵌入webview控制器的模板字符串中执行，引号转义和 ${ 都可能被改写，
+    因此选择器用字符编码传递。
+    """
+    return "String.fromCodePoint(" + ",".join(str(ord(c)) for c in text) + ")"
+
+
+def collect_selectors(condition: Dict[str, Any]) -> List[str]:
+    """收集条件树中的所有选择器"""
+    if condition.get("type") in ("all", "any"):
+        selectors = []
+        for sub in condition.get("conditions", []):
+            for selector in collect_selectors(sub):
+                if selector not in selectors:
+                    selectors.append(selector)
+        return selectors
+    if condition.get("type") == "selector" and condition.get("selector"):
+        return [condition["selector"]]
+    return []
+
+
+def build_probe_script(selectors: List[str]) -> str:
+    """构建页面状态探测脚本"""
+    return _PROBE_SCRIPT % ", ".join(_js_string(s) for s in selectors)
+
+
+def condition_met(condition: Dict[str, Any], state: Dict[str, Any], selectors: List[str]) -> bool:
+    """判断页面状态是否满足条件"""
+    condition_type = condition.get("type")
+    url = state.get("url") or ""
+    ready_state = state.get("readyState")
+
+    if condition_type == "all":
+        return all(condition_met(c, state, selectors) for c in condition.get("conditions", []))
+    if condition_type == "any":
+        return any(condition_met(c, state, selectors) for c in condition.get("conditions", []))
+    if condition_type == "selector":
+        found = state.get("found") or []
+        index = selectors.index(condition.get("selector")) if condition.get("selector") in selectors else -1
+        return 0 <= index < len(found) and bool(found[index])
+    if condition_type == "url_changed":
+        return bool(url) and url != condition.get("from")
+    if condition_type == "url_contains":
+        return condition.get("value", "") in url
+    if condition_type == "url_lacks":
+        return bool(url) and condition.get("value", "") not in url
+    if condition_type == "loaded":
+        return ready_state in ("interactive", "complete")
+    if condition_type == "ready":
+        return ready_state == "complete"
+    if condition_type == "dom_quiet":
+        quiet_ms = condition.get("quiet_ms", DEFAULT_QUIET_MS)
+        return ready_state != "loading" and (state.get("quietMs") or 0) >= quiet_ms
+    return False
+
+
+def _fill_url_changed(condition: Dict[str, Any], current_url: Optional[str]) -> Dict[str, Any]:
+    """为没有指定from的url_changed条件填入等待开始时的URL"""
+    if condition.get("type") in ("all", "any"):
+        return {**condition, "conditions": [_fill_url_changed(c, current_url) for c in condition.get("conditions", [])]}
+    if condition.get("type") == "url_changed" and not condition.get("from"):
+        return {**condition, "from": current_url}
+    return condition
+
+
+def wait_condition_from_action(action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从wait操作中得到等待条件和超时
+
+    新格式: {"action": "wait", "condition": {...}, "timeout": 8}
+    旧格式: {"action": "wait", "value": "3"}，视为最多等待3秒直到页面安静
+    """
+    condition = action.get("condition")
+    if condition:
+        timeout = action.get("timeout", DEFAULT_TIMEOUT)
+    else:
+        try:
+            timeout = float(action.get("value") or 2.0)
+        except (TypeError, ValueError):
+            timeout = 2.0
+        condition = {"type": "dom_quiet", "quiet_ms": LEGACY_WAIT_QUIET_MS}
+    return {"condition": condition, "timeout": float(timeout)}
+
+
+class PageWaiter:
+    """基于条件轮询的页面等待器"""
+
+    def __init__(self, send_ipc_command: Callable[..., Dict[str, Any]],
+                 initial_interval: float = 0.1, max_interval: float = 1.0, backoff: float = 1.5):
+        """
+        初始化等待器
+
+        Args:
+            send_ipc_command: 发送IPC命令的函数（自动化控制器的send_ipc_command）
+            initial_interval: 首次轮询间隔（秒）
+            max_interval: 最大轮询间隔（秒）
+            backoff: 每次轮询后间隔的增长倍数
+        """
+        self.send_ipc_command = send_ipc_command
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.last_error_code: Optional[str] = None
+
+    def probe(self, selectors: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """探测页面状态，页面正在切换或脚本执行失败时返回None"""
+        result = self.send_ipc_command("execute-script", script=build_probe_script(selectors or []))
+        self.last_error_code = result.get("error_code")
+        state = result.get("result") if result.get("success") else None
+        return state if isinstance(state, dict) else None
+
+    def current_url(self) -> Optional[str]:
+        state = self.probe()
+        return state.get("url") if state else None
+
+    def wait_for(self, condition: Dict[str, Any], timeout: float = DEFAULT_TIMEOUT,
+                 sleep: Callable[[float], Any] = deadline_sleep) -> Dict[str, Any]:
+        """
+        等待条件满足
+
+        Args:
+            condition: 等待条件
+            timeout: 最长等待时间（秒），不超过当前命令的剩余时间
+            sleep: 轮询间隔使用的sleep函数（默认在命令取消时立即返回）
+
+        Returns:
+            等待结果，包含是否满足、耗时、轮询次数和最后一次页面状态
+        """
+        with span("wait", condition=condition.get("type")) as record:
+            result = self._poll(condition, timeout, sleep)
+            if record is not None:
+                record.update(satisfied=result["success"], polls=result["polls"])
+            return result
+
+    def _poll(self, condition: Dict[str, Any], timeout: float,
+              sleep: Callable[[float], Any]) -> Dict[str, Any]:
+        command_deadline = current_deadline()
+        if command_deadline is not None:
+            timeout = command_deadline.cap(timeout)
+        start = time.perf_counter()
+        deadline = start + timeout
+        fail_if = condition.get("fail_if")
+        selectors = collect_selectors(condition)
+        if fail_if:
+            selectors += [s for s in collect_selectors(fail_if) if s not in selectors]
+        interval = self.initial_interval
+        polls = 0
+        state = None
+
+        while True:
+            polls += 1
+            state = self.probe(selectors)
+            if polls == 1:
+                condition = _fill_url_changed(condition, state.get("url") if state else None)
+                fail_if = fail_if and _fill_url_changed(fail_if, state.get("url") if state else None)
+
+            if state is not None and condition_met(condition, state, selectors):
+                return {
+                    "success": True,
+                    "message": "等待条件已满足",
+                    "condition": condition,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "polls": polls,
+                    "state": state
+                }
+            if state is not None and fail_if and condition_met(fail_if, state, selectors):
+                return {
+                    "success": False,
+                    "error": f"页面已不是等待的页面（{state.get('url')}），停止等待",
+                    "condition": condition,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "polls": polls,
+                    "state": state
+                }
+
+            remaining = deadline - time.perf_counter()
+            if self.last_error_code in (CIRCUIT_OPEN, DEADLINE_EXCEEDED, CANCELLED):
+                # Electron应用不可用、时间预算用完或命令被取消，继续轮询只会等到超时
+                return {
+                    "success": False,
+                    "error": "IPC服务器不可用，停止等待" if self.last_error_code == CIRCUIT_OPEN else "命令已停止，停止等待",
+                    "error_code": self.last_error_code,
+                    "condition": condition,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "polls": polls,
+                    "state": state
+                }
+            if remaining <= 0:
+                return {
+                    "success": False,
+                    "error": f"等待条件超时（{timeout}秒）",
+                    "condition": condition,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "polls": polls,
+                    "state": state
+                }
+
+            delay = interval
+            if condition.get("type") == "dom_quiet" and state is not None:
+                # DOM安静条件只需再等剩余的安静时间
+                missing_ms = condition.get("quiet_ms", DEFAULT_QUIET_MS) - (state.get("quietMs") or 0)
+                if missing_ms > 0:
+                    delay = max(self.initial_interval, missing_ms / 1000)
+            sleep(min(delay, remaining))
+            interval = min(interval * self.backoff, self.max_interval)
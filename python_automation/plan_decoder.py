@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+AI回复解码 - 从模型回复中找出JSON对象，并按操作计划/命令意图的格式校验
+
+模型经常在JSON前后加说明文字或 ```json 代码块，偶尔留下多余的逗号，或者把置信度、
+顺序写成字符串。这里一次扫描找出所有括号配对的 {...} 片段（字符串中的括号不计），
+按出现顺序逐个尝试，返回第一个能解析并通过校验的对象：
+
+    - 代码块标记和说明文字在括号之外，自然被跳过
+    - 对象或数组末尾多余的逗号会被去掉后重试
+    - 字段按格式转换类型（"0.9" -> 0.9、"90%" -> 0.9、"2" -> 2），每次转换都记录在repairs中
+    - 无法使用时errors给出具体原因：JSON语法错误的行列位置，或出错字段的路径
+
+能解析的片段内部的片段不再重新解析，而是在解析结果中按出现顺序查找嵌套对象，每个字符只解析一次；
+嵌套过深（超过解释器的递归限制）的片段按无法解析处理。
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# 操作计划（EnhancedWebViewAutomation）支持的操作类型
+ACTION_TYPES = ("navigate", "click", "input", "wait", "submit")
+# 命令意图（WebViewAutomation）支持的操作类型
+INTENT_ACTIONS = ("navigate", "search", "click", "input")
+# 这些操作必须有target
+TARGET_REQUIRED = ("navigate", "click", "input", "submit")
+
+
+class DecodeResult(NamedTuple):
+    """解码结果"""
+    value: Optional[Dict[str, Any]]  # 解析并校验通过的对象，失败时为None
+    errors: List[str]                # 失败原因
+    repairs: List[str]               # 自动修复和类型转换的记录
+
+    @property
+    def ok(self) -> bool:
+        return self.value is not None
+
+
+def find_object_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    一次扫描找出所有括号配对的 {...} 片段，按起始位置排序（外层对象排在内层之前）
+
+    只在括号内跟踪字符串，说明文字中的引号不会影响后面的JSON。
+    """
+    spans: List[Tuple[int, int]] = []
+    stack: List[int] = []
+    in_string = False
+    escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = bool(stack)
+        elif char == "{":
+            stack.append(index)
+        elif char == "}" and stack:
+            spans.append((stack.pop(), index + 1))
+    spans.sort()
+    return spans
+
+
+def strip_trailing_commas(text: str) -> str:
+    """去掉 } 和 ] 之前多余的逗号（字符串中的内容不变）"""
+    out: List[str] = []
+    in_string = False
+    escape = False
+    last_comma: Optional[int] = None
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            last_comma = None
+        elif char == ",":
+            last_comma = len(out)
+        elif char in "}]":
+            if last_comma is not None:
+                out[last_comma] = ""
+            last_comma = None
+        elif not char.isspace():
+            last_comma = None
+        out.append(char)
+    return "".join(out)
+
+
+def _position(text: str, pos: int) -> str:
+    line = text.count("\n", 0, pos) + 1
+    column = pos - (text.rfind("\n", 0, pos) + 1) + 1
+    return f"第{line}行第{column}列"
+
+
+def _loads(text: str, start: int, end: int) -> Tuple[Any, List[str], Optional[str]]:
+    """解析一个片段，返回 (对象, 修复记录, 错误)"""
+    fragment = text[start:end]
+    try:
+        return json.loads(fragment), [], None
+    except json.JSONDecodeError as e:
+        error = f"JSON语法错误（{_position(text, start + e.pos)}）: {e.msg}"
+    except RecursionError:
+        return None, [], f"JSON嵌套层数过多（{_position(text, start)}）"
+    fixed = strip_trailing_commas(fragment)
+    if fixed != fragment:
+        try:
+            return json.loads(fixed), ["去掉了多余的逗号"], None
+        except (json.JSONDecodeError, RecursionError):
+            pass
+    return None, [], error
+
+
+_DONE = object()
+
+
+def _nested_objects(value: Any) -> Iterator[Dict[str, Any]]:
+    """按在原文中出现的顺序列出解析结果内部的对象（不含自身，不递归调用，嵌套再深也不会超出递归限制）"""
+    stack = [iter(value.values() if isinstance(value, dict) else value)]
+    while stack:
+        item = next(stack[-1], _DONE)
+        if item is _DONE:
+            stack.pop()
+            continue
+        if isinstance(item, dict):
+            yield item
+            stack.append(iter(item.values()))
+        elif isinstance(item, list):
+            stack.append(iter(item))
+
+
+def decode_object(text: Optional[str],
+                  validate: Optional[Callable[[Dict[str, Any]], DecodeResult]] = None) -> DecodeResult:
+    """
+    从回复文本中取出第一个能解析（并通过validate校验）的JSON对象
+
+    Args:
+        text: 模型回复
+        validate: 校验函数，返回转换后的对象或错误
+
+    Returns:
+        解码结果；都不能使用时errors为最长的候选对象（最可能是模型想给出的结果）的错误
+    """
+    if not text or not text.strip():
+        return DecodeResult(None, ["AI回复为空"], [])
+
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        # 常见情况：整个回复就是JSON，不需要逐字符扫描
+        try:
+            value = json.loads(stripped)
+        except (json.JSONDecodeError, RecursionError):
+            value = None
+        if isinstance(value, dict):
+            return validate(value) if validate else DecodeResult(value, [], [])
+
+    failure: Optional[DecodeResult] = None
+    failure_length = -1
+    parsed_end = -1
+    for start, end in find_object_spans(text):
+        if end <= parsed_end:
+            # 在已经解析过的片段内部，嵌套对象已经检查过
+            continue
+        value, repairs, error = _loads(text, start, end)
+        if error:
+            result = DecodeResult(None, [error], [])
+        else:
+            parsed_end = end
+            result = validate(value) if validate else DecodeResult(value, [], [])
+            result = result._replace(repairs=repairs + result.repairs)
+        if result.ok:
+            return result
+        if end - start > failure_length:
+            failure, failure_length = result, end - start
+        if not error:
+            for nested in _nested_objects(value):
+                nested_result = validate(nested) if validate else DecodeResult(nested, [], [])
+                if nested_result.ok:
+                    return nested_result._replace(repairs=repairs + nested_result.repairs)
+    return failure or DecodeResult(None, ["回复中没有JSON对象"], [])
+
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        raise ValueError("应为字符串")
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError("应为数字")
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        raise ValueError(f"无法转换为数字: {value!r}")
+
+
+def _to_int(value: Any) -> int:
+    number = _to_float(value)
+    if number != int(number):
+        raise ValueError(f"应为整数: {value!r}")
+    return int(number)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "1", "是"):
+        return True
+    if text in ("false", "no", "0", "否", ""):
+        return False
+    raise ValueError(f"无法转换为布尔值: {value!r}")
+
+
+def _to_confidence(value: Any) -> float:
+    """置信度统一为0到1之间的小数，"90%" 和 90 都按百分比处理"""
+    if isinstance(value, str) and value.strip().endswith("%"):
+        number = _to_float(value.strip()[:-1]) / 100
+    else:
+        number = _to_float(value)
+        if 1 < number <= 100:
+            number /= 100
+    if not 0 <= number <= 1:
+        raise ValueError(f"置信度超出范围: {value!r}")
+    return round(number, 4)
+
+
+def _to_str_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if not isinstance(value, list):
+        raise ValueError("应为字符串数组")
+    return [_to_str(item) for item in value if item is not None and item != ""]
+
+
+def _to_dict(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError("应为对象")
+    return value
+
+
+def _choice(choices: Tuple[str, ...]) -> Callable[[Any], str]:
+    def convert(value: Any) -> str:
+        text = _to_str(value).strip().lower()
+        if text not in choices:
+            raise ValueError(f"不支持的操作类型: {value!r}（支持 {'/'.join(choices)}）")
+        return text
+    return convert
+
+
+ELEMENT_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "type": _to_str, "selector": _to_str, "xpath": _to_str, "text": _to_str,
+    "confidence": _to_confidence, "position": _to_dict, "description": _to_str
+}
+ACTION_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "action": _choice(ACTION_TYPES), "target": _to_str, "alternatives": _to_str_list, "role": _to_str,
+    "value": _to_str, "condition": _to_dict, "timeout": _to_float, "description": _to_str,
+    "order": _to_int, "wait": _to_bool, "submit": _to_bool, "domain": _to_str
+}
+PLAN_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "analysis": _to_str, "success": _to_bool, "confidence": _to_confidence
+}
+INTENT_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "action": _choice(INTENT_ACTIONS), "target": _to_str, "site": _to_str, "query": _to_str,
+    "text": _to_str, "confidence": _to_confidence
+}
+
+
+def _convert_fields(obj: Dict[str, Any], fields: Dict[str, Callable[[Any], Any]], path: str,
+                    errors: List[str], repairs: List[str], drop_invalid: bool = False) -> Dict[str, Any]:
+    """按字段表转换类型，未列出的字段和null原样保留；drop_invalid时丢弃无法转换的字段而不报错"""
+    converted = dict(obj)
+    for name, convert in fields.items():
+        value = obj.get(name)
+        if value is None:
+            continue
+        try:
+            new_value = convert(value)
+        except ValueError as e:
+            if drop_invalid:
+                converted.pop(name)
+                repairs.append(f"{path}{name}: {e}，已丢弃该字段")
+            else:
+                errors.append(f"{path}{name}: {e}")
+            continue
+        if new_value != value or type(new_value) is not type(value):
+            repairs.append(f"{path}{name}: {value!r} -> {new_value!r}")
+        converted[name] = new_value
+    return converted
+
+
+def validate_action(action: Any, path: str = "") -> DecodeResult:
+    """校验计划中的单个操作（流式执行时每个操作到达就校验）"""
+    if not isinstance(action, dict):
+        return DecodeResult(None, [f"{path or '操作'}应为对象"], [])
+    errors: List[str] = []
+    repairs: List[str] = []
+    prefix = f"{path}." if path else ""
+    converted = _convert_fields(action, ACTION_FIELDS, prefix, errors, repairs)
+    action_type = converted.get("action")
+    if action_type is None:
+        errors.append(f"{prefix}action: 缺少操作类型")
+    elif action_type in TARGET_REQUIRED and not str(converted.get("target") or "").strip():
+        errors.append(f"{prefix}target: {action_type}操作缺少目标")
+    return DecodeResult(None if errors else converted, errors, repairs)
+
+
+def validate_plan(plan: Dict[str, Any]) -> DecodeResult:
+    """
+    校验页面分析结果（analyze_page_with_ai的返回格式）
+
+    操作有错误时整个计划不可用（跳过其中一步可能让后续操作作用在错误的页面上）；
+    elements_found只用于展示，无法使用的元素直接丢弃。
+    """
+    if not any(key in plan for key in ("recommended_actions", "elements_found", "analysis", "success")):
+        return DecodeResult(None, ["不是页面分析结果（缺少recommended_actions）"], [])
+    errors: List[str] = []
+    repairs: List[str] = []
+    converted = _convert_fields(plan, PLAN_FIELDS, "", errors, repairs)
+
+    actions = plan.get("recommended_actions")
+    if actions is None:
+        actions = []
+        repairs.append("recommended_actions: 缺少，按空列表处理")
+    if not isinstance(actions, list):
+        errors.append("recommended_actions: 应为数组")
+        actions = []
+    converted_actions = []
+    for index, action in enumerate(actions):
+        result = validate_action(action, f"recommended_actions[{index}]")
+        errors.extend(result.errors)
+        repairs.extend(result.repairs)
+        converted_actions.append(result.value)
+    converted["recommended_actions"] = converted_actions
+
+    elements = plan.get("elements_found")
+    if elements is not None and not isinstance(elements, list):
+        repairs.append("elements_found: 不是数组，已忽略")
+        elements = []
+    converted_elements = []
+    for index, element in enumerate(elements or []):
+        if not isinstance(element, dict):
+            repairs.append(f"elements_found[{index}]: 不是对象，已丢弃")
+            continue
+        converted_elements.append(
+            _convert_fields(element, ELEMENT_FIELDS, f"elements_found[{index}].", errors, repairs, drop_invalid=True)
+        )
+    if elements is not None:
+        converted["elements_found"] = converted_elements
+
+    return DecodeResult(None if errors else converted, errors, repairs)
+
+
+def validate_intent(intent: Dict[str, Any]) -> DecodeResult:
+    """校验命令意图（WebViewAutomation的AI指令格式）"""
+    errors: List[str] = []
+    repairs: List[str] = []
+    converted = _convert_fields(intent, INTENT_FIELDS, "", errors, repairs)
+    action = converted.get("action")
+    if action is None:
+        errors.append("action: 缺少操作类型")
+    elif action == "search" and not (converted.get("query") or converted.get("target")):
+        errors.append("query: 搜索操作缺少关键词")
+    elif action != "search" and not converted.get("target"):
+        errors.append(f"target: {action}操作缺少目标")
+    return DecodeResult(None if errors else converted, errors, repairs)
+
+
+def decode_plan(text: Optional[str]) -> DecodeResult:
+    """解码页面分析结果"""
+    return decode_object(text, validate_plan)
+
+
+def decode_intent(text: Optional[str]) -> DecodeResult:
+    """解码命令意图"""
+    return decode_object(text, validate_intent)
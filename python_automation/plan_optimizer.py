@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+计划优化 - 在执行之前去掉操作计划中多余的IPC请求和页面加载
+
+AI分析和规则分析给出的计划总是先导航到网站首页，输入和提交也是分开的两步，有时还会重复
+同一个操作。执行前按以下规则改写计划，每一处改动都记录在报告中：
+
+    - 导航目标就是当前页面（或上一步刚导航到的页面）时去掉该导航
+    - 输入后紧跟针对同一输入框的提交时合并为一个带 submit 的输入操作（输入后立即提交）
+    - 相邻的等待合并为一个同时满足所有条件的等待
+    - 连续重复的导航/输入/提交/等待只保留一个（点击可能是有意重复的，如翻页，不做处理）
+    - 去掉不做任何事的操作（如等待0秒）
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from page_waiter import wait_condition_from_action
+
+# 执行后当前页面无法确定的操作（输入默认会自动提交搜索）
+PAGE_CHANGING = ("click", "input", "submit")
+# 连续重复时可以只执行一次的操作
+IDEMPOTENT = ("navigate", "input", "submit", "wait")
+
+
+class OptimizedPlan(NamedTuple):
+    """优化结果"""
+    actions: List[Dict[str, Any]]  # 改写后的计划
+    changes: List[Dict[str, Any]]  # 每处改动：{"index": 原计划中的位置, "action": 操作类型, "reason": 说明}
+
+
+def same_page(first: Optional[str], second: Optional[str]) -> bool:
+    """两个URL是否指向同一页面（忽略协议、www前缀、末尾斜杠和片段）"""
+    if not first or not second:
+        return False
+    a, b = urlsplit(first.strip()), urlsplit(second.strip())
+    if not a.netloc or not b.netloc:
+        return False
+
+    def host(parts) -> str:
+        netloc = parts.netloc.lower()
+        return netloc[4:] if netloc.startswith("www.") else netloc
+
+    return host(a) == host(b) and a.path.rstrip("/") == b.path.rstrip("/") and a.query == b.query
+
+
+def _step_key(action: Dict[str, Any]) -> tuple:
+    """判断两个操作是否相同时比较的字段"""
+    return (action.get("action"), action.get("target"), action.get("value"), repr(action.get("condition")),
+            action.get("submit"))
+
+
+def _is_noop(action: Dict[str, Any]) -> bool:
+    if action.get("action") != "wait" or action.get("condition"):
+        return False
+    try:
+        return float(action.get("value")) <= 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _merge_waits(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """合并相邻的两个等待，条件都满足才结束，超时取较大的一个"""
+    a, b = wait_condition_from_action(first), wait_condition_from_action(second)
+    conditions = []
+    for condition in (a["condition"], b["condition"]):
+        parts = condition.get("conditions", []) if condition.get("type") == "all" else [condition]
+        conditions.extend(c for c in parts if c not in conditions)
+    merged = {**first, "condition": conditions[0] if len(conditions) == 1 else {"type": "all", "conditions": conditions},
+              "timeout": max(a["timeout"], b["timeout"])}
+    merged.pop("value", None)
+    descriptions = [d for d in (first.get("description"), second.get("description")) if d]
+    if descriptions:
+        merged["description"] = "；".join(dict.fromkeys(descriptions))
+    return merged
+
+
+def optimize_plan(actions: List[Dict[str, Any]], current_url: Optional[str] = None) -> OptimizedPlan:
+    """
+    改写已按order排序的操作计划
+
+    Args:
+        actions: 操作计划
+        current_url: 执行前webview所在的页面，未知时为None（不会去掉第一个导航）
+
+    Returns:
+        改写后的计划和改动记录
+    """
+    result: List[Dict[str, Any]] = []
+    # 与result一一对应的原计划位置
+    origins: List[int] = []
+    changes: List[Dict[str, Any]] = []
+    url = current_url
+
+    def drop(index: int, action: Dict[str, Any], reason: str):
+        changes.append({"index": index, "action": action.get("action"), "reason": reason})
+
+    for index, action in enumerate(actions):
+        action_type = action.get("action")
+        previous = result[-1] if result else None
+
+        if _is_noop(action):
+            drop(index, action, "等待时间为0")
+            continue
+
+        if action_type == "navigate":
+            if same_page(url, action.get("target")):
+                drop(index, action, f"已在目标页面 {url}")
+                continue
+            url = action.get("target")
+        elif action_type in PAGE_CHANGING:
+            url = None
+
+        if previous is not None and action_type in IDEMPOTENT and _step_key(previous) == _step_key(action):
+            drop(index, action, f"与第{origins[-1] + 1}步重复")
+            continue
+
+        if (action_type == "submit" and previous is not None and previous.get("action") == "input"
+                and previous.get("submit") is None
+                and (not action.get("target") or action.get("target") == previous.get("target")
+                     or action.get("target") in (previous.get("alternatives") or []))):
+            result[-1] = {**previous, "submit": True}
+            drop(index, action, f"合并到第{origins[-1] + 1}步的输入操作（输入后立即提交）")
+            continue
+
+        if action_type == "wait" and previous is not None and previous.get("action") == "wait":
+            result[-1] = _merge_waits(previous, action)
+            drop(index, action, f"与第{origins[-1] + 1}步的等待合并")
+            continue
+
+        result.append(action)
+        origins.append(index)
+
+    return OptimizedPlan(result, changes)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+计划模板库 - 把执行成功的AI计划抽象成带参数的模板，同类命令直接套用，不再请求AI
+
+"淘宝搜索手机"和"淘宝搜索耳机"的计划只有搜索词不同。AI计划执行成功后，把输入操作的内容和
+导航操作的地址中出现的搜索词（原文及URL编码形式）替换为参数占位符，选择器、描述等其他字段原样保留，
+按（网站、意图、命令句式）索引保存到SQLite（与意图缓存共用缓存目录）。之后句式相同的命令填入新的搜索词即可执行。
+每次套用的成败都会记录，成功率低于阈值的模板不再使用（降级），直到AI重新给出成功的计划。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import quote, quote_plus
+
+from command_rules import extract_search_info, parse_command
+from intent_cache import DEFAULT_CACHE_DIR, normalize_command
+
+# 搜索词在命令句式和模板中的占位符；编码形式用于URL中的搜索词
+QUERY_SLOT = "{query}"
+ENCODED_SLOTS = (("{query_url}", quote_plus), ("{query_quoted}", quote))
+SLOTS = (QUERY_SLOT,) + tuple(slot for slot, _ in ENCODED_SLOTS)
+# 成功率（平滑后）低于该值的模板不再使用：新模板是 2/3，套用失败一次降到 1/2
+DEFAULT_MIN_SCORE = 0.6
+
+
+class TemplateMatch(NamedTuple):
+    """命中的模板"""
+    template_id: str
+    actions: List[Dict[str, Any]]  # 已填入参数的操作计划
+    score: float                   # 模板的平滑成功率
+
+
+class CommandShape(NamedTuple):
+    """命令的模板索引"""
+    site: str
+    intent: str
+    pattern: str  # 搜索词替换为占位符后的规范化命令
+    query: str
+
+
+def command_shape(command: str) -> Optional[CommandShape]:
+    """提取命令的网站、意图和句式，只有能提取出搜索词的搜索命令才能使用模板"""
+    parsed = parse_command(command)
+    if parsed.action != "search" or not parsed.query:
+        return None
+    site, query = extract_search_info(command)
+    if not query or query not in command:
+        return None
+    return CommandShape(site, parsed.action, normalize_command(command.replace(query, QUERY_SLOT)), query)
+
+
+def _slot_values(query: str) -> List[tuple]:
+    """占位符与对应的取值，编码形式在前（与原文相同的编码形式省略）"""
+    values = [(slot, encode(query)) for slot, encode in ENCODED_SLOTS if encode(query) != query]
+    return values + [(QUERY_SLOT, query)]
+
+
+def _slot_field(step: Any) -> Optional[str]:
+    """步骤中可以放占位符的字段：输入操作的内容、导航操作的地址，其他字段（选择器、描述等）原样保留"""
+    if not isinstance(step, dict):
+        return None
+    return {"input": "value", "navigate": "target"}.get(step.get("action"))
+
+
+def _map_slot_fields(actions: List[Dict[str, Any]], convert) -> List[Dict[str, Any]]:
+    steps = []
+    for step in actions:
+        field = _slot_field(step)
+        if field and isinstance(step.get(field), str):
+            step = {**step, field: convert(step[field])}
+        steps.append(step)
+    return steps
+
+
+def _uses_query(step: Dict[str, Any]) -> bool:
+    """模板步骤是否实际使用了搜索词：输入的内容或导航的地址中有占位符"""
+    field = _slot_field(step)
+    text = step.get(field) if field else None
+    return isinstance(text, str) and any(slot in text for slot in SLOTS)
+
+
+def abstract_plan(actions: List[Dict[str, Any]], query: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    把计划中输入的搜索词和导航地址中的搜索词替换为占位符
+
+    只有这两处出现搜索词的计划才能做成模板：搜索词只出现在描述等字段中时
+    （例如输入的是AI改写过的词），套用时不会换成新的搜索词，返回None
+    """
+    slots = _slot_values(query)
+
+    def convert(text: str) -> str:
+        for slot, value in slots:
+            text = text.replace(value, slot)
+        return text
+
+    template = _map_slot_fields(actions, convert)
+    if not any(_uses_query(step) for step in template):
+        return None
+    return template
+
+
+def fill_plan(template: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """在模板的输入内容和导航地址中填入搜索词"""
+    slots = _slot_values(query)
+
+    def convert(text: str) -> str:
+        for slot, value in slots:
+            text = text.replace(slot, value)
+        return text
+
+    return _map_slot_fields(template, convert)
+
+
+class PlanTemplateStore:
+    """按网站和意图索引的持久化计划模板库"""
+
+    def __init__(self, db_path: Optional[str] = None, min_score: float = DEFAULT_MIN_SCORE):
+        """
+        初始化计划模板库
+
+        Args:
+            db_path: SQLite文件路径，None表示默认缓存目录，":memory:"表示不持久化
+            min_score: 模板可以使用的最低平滑成功率
+        """
+        if db_path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "plan_templates.db")
+
+        self.db_path = db_path
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "replay_failures": 0}
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS plan_templates (
+                template_id TEXT PRIMARY KEY,
+                site TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                pattern TEXT NOT NULL,
+                actions TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS plan_templates_lookup ON plan_templates (site, intent, pattern)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _score(successes: int, failures: int) -> float:
+        return (successes + 1) / (successes + failures + 2)
+
+    def match(self, command: str) -> Optional[TemplateMatch]:
+        """查找句式相同且未降级的模板，返回填入本次搜索词的计划"""
+        shape = command_shape(command)
+        row = None
+        if shape is not None:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT template_id, actions, successes, failures FROM plan_templates "
+                    "WHERE site = ? AND intent = ? AND pattern = ?",
+                    (shape.site, shape.intent, shape.pattern)
+                ).fetchall()
+            usable = [(r, json.loads(r[1])) for r in rows if self._score(r[2], r[3]) >= self.min_score]
+            if usable:
+                row, template = max(usable, key=lambda item: (self._score(item[0][2], item[0][3]), item[0][2]))
+
+        with self._lock:
+            self._stats["hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        return TemplateMatch(row[0], fill_plan(template, shape.query), round(self._score(row[2], row[3]), 4))
+
+    def learn(self, command: str, actions: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        从执行成功的计划中学习模板
+
+        Returns:
+            模板ID；命令不是搜索命令或计划与搜索词无关时返回None
+        """
+        shape = command_shape(command)
+        template = abstract_plan(actions, shape.query) if shape is not None else None
+        if template is None:
+            return None
+
+        body = json.dumps(template, ensure_ascii=False, sort_keys=True)
+        template_id = hashlib.sha1(f"{shape.site}|{shape.intent}|{shape.pattern}|{body}".encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO plan_templates (template_id, site, intent, pattern, actions, successes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT(template_id) DO UPDATE SET successes = successes + 1, updated_at = excluded.updated_at",
+                (template_id, shape.site, shape.intent, shape.pattern, body, time.time())
+            )
+            self._db.commit()
+            self._stats["stores"] += 1
+        return template_id
+
+    def record(self, template_id: str, success: bool):
+        """记录一次套用模板的结果，失败会降低模板的成功率"""
+        column = "successes" if success else "failures"
+        with self._lock:
+            self._db.execute(
+                f"UPDATE plan_templates SET {column} = {column} + 1, updated_at = ? WHERE template_id = ?",
+                (time.time(), template_id)
+            )
+            self._db.commit()
+            if not success:
+                self._stats["replay_failures"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute("SELECT successes, failures FROM plan_templates").fetchall()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "templates": len(rows),
+                "demoted": sum(1 for s, f in rows if self._score(s, f) < self.min_score)
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段耗时统计 - 记录IPC请求、AI请求、页面数据获取、等待、重试和规则解析的耗时
+
+开启 --profile 后，一条命令执行期间的所有计时区间（span）会附加到结果JSON的 profile 字段；
+指定 --profile-export 时，各阶段耗时还会累加到Prometheus文本格式的直方图文件中，
+多次运行的结果合并在同一个文件里，便于发现和跟踪延迟回归。
+
+当前记录器保存在ContextVar中，批量模式下并发执行的命令各自记录，互不混杂；
+需要把后台线程的区间记到同一个记录器时，用 contextvars.copy_context().run 提交任务。
+未开启统计时 span() 不做任何事情，对正常执行几乎没有开销。
+"""
+
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+METRIC_NAME = "webview_automation_phase_duration_seconds"
+# 直方图桶的上界（秒），覆盖从本地IPC请求到AI分析的耗时范围
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_SAMPLE_RE = re.compile(
+    r'^' + METRIC_NAME + r'_(bucket|sum|count)\{phase="([^"]*)"(?:,le="([^"]*)")?\}\s+(\S+)\s*$'
+)
+
+
+class Profiler:
+    """一次命令执行的计时区间记录器（线程安全，后台预取线程的区间也会记录）"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+        self.spans: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, phase: str, **labels) -> Iterator[Dict[str, Any]]:
+        """记录一个计时区间，嵌套的区间通过parent关联"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+        record = {
+            "id": span_id,
+            "parent": stack[-1] if stack else None,
+            "phase": phase,
+            **{key: value for key, value in labels.items() if value is not None}
+        }
+        thread_name = threading.current_thread().name
+        if thread_name != "MainThread":
+            record["thread"] = thread_name
+        start = time.perf_counter()
+        stack.append(span_id)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record["start_ms"] = round((start - self.started_at) * 1000, 2)
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总次数、总耗时和最大耗时"""
+        phases: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            entry = phases.setdefault(record["phase"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + record["duration_ms"], 2)
+            entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+        return phases
+
+    def to_dict(self) -> Dict[str, Any]:
+        """结果JSON中的profile字段，区间按开始时间排序"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record["start_ms"])
+        return {
+            "total_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+            "phases": self.summary(),
+            "spans": spans
+        }
+
+
+# 同一进程内并发的命令导出到同一个文件时，读取-累加-写入需要串行；
+# 不同进程之间（桥接器每条命令启动一个进程）另外用文件锁串行
+_export_lock = threading.Lock()
+_active: contextvars.ContextVar = contextvars.ContextVar("webview_profiler", default=None)
+
+
+@contextmanager
+def activate(profiler: Optional[Profiler]) -> Iterator[Optional[Profiler]]:
+    """在with块内把profiler设为当前的记录器，None表示不统计"""
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def span(phase: str, **labels) -> Iterator[Optional[Dict[str, Any]]]:
+    """在当前记录器中记录计时区间，没有开启统计时直接执行"""
+    profiler = _active.get()
+    if profiler is None:
+        yield None
+        return
+    with profiler.span(phase, **labels) as record:
+        yield record
+
+
+def _read_histograms(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取已有的直方图文件，只识别本模块写出的指标"""
+    histograms: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return histograms
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = _SAMPLE_RE.match(line.strip())
+            if not match:
+                continue
+            kind, phase, le, value = match.groups()
+            entry = histograms.setdefault(phase, _empty_histogram())
+            if kind == "bucket":
+                bound = float("inf") if le == "+Inf" else float(le)
+                if bound in entry["buckets"]:
+                    entry["buckets"][bound] = float(value)
+            else:
+                entry[kind] = float(value)
+    return histograms
+
+
+def _empty_histogram() -> Dict[str, Any]:
+    return {"buckets": {bound: 0.0 for bound in BUCKETS + (float("inf"),)}, "sum": 0.0, "count": 0.0}
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def export_prometheus(profiler: Profiler, path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    把各阶段耗时累加到Prometheus文本格式的直方图文件
+
+    已有文件中的计数会被保留并累加，写入时先写临时文件再替换，避免读到写了一半的文件。
+    读取-累加-写入期间持有 <path>.lock 的文件锁，多个进程同时导出时不会互相覆盖计数。
+
+    Returns:
+        累加后的各阶段直方图
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with _export_lock, _file_lock(f"{path}.lock"):
+        return _merge_histograms(profiler, path)
+
+
+@contextmanager
+def _file_lock(lock_path: str) -> Iterator[None]:
+    """跨进程的排他文件锁（POSIX用flock，Windows用msvcrt.locking锁住第一个字节）"""
+    with open(lock_path, "a+b") as f:
+        if sys.platform.startswith('win'):
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 最多重试10秒，超时后继续等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _merge_histograms(profiler: Profiler, path: str) -> Dict[str, Dict[str, Any]]:
+    histograms = _read_histograms(path)
+    with profiler._lock:
+        spans = list(profiler.spans)
+    for record in spans:
+        seconds = record["duration_ms"] / 1000
+        entry = histograms.setdefault(record["phase"], _empty_histogram())
+        for bound in entry["buckets"]:
+            if seconds <= bound:
+                entry["buckets"][bound] += 1
+        entry["sum"] += seconds
+        entry["count"] += 1
+
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent in each automation phase.",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for phase in sorted(histograms):
+        entry = histograms[phase]
+        for bound in sorted(entry["buckets"]):
+            le = "+Inf" if bound == float("inf") else _format_number(bound)
+            lines.append(f'{METRIC_NAME}_bucket{{phase="{phase}",le="{le}"}} {_format_number(entry["buckets"][bound])}')
+        lines.append(f'{METRIC_NAME}_sum{{phase="{phase}"}} {round(entry["sum"], 6)}')
+        lines.append(f'{METRIC_NAME}_count{{phase="{phase}"}} {_format_number(entry["count"])}')
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return histograms
+
+
+def profile_call(func: Callable[[], Dict[str, Any]], enabled: bool,
+                 export_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    执行一条命令，开启统计时把profile附加到结果中并按需导出直方图
+
+    Args:
+        func: 执行命令并返回结果字典的函数
+        enabled: 是否记录耗时
+        export_path: Prometheus直方图文件路径，为空时不导出
+    """
+    if not enabled:
+        return func()
+
+    profiler = Profiler()
+    with activate(profiler):
+        result = func()
+    if isinstance(result, dict):
+        result["profile"] = profiler.to_dict()
+    if export_path:
+        try:
+            export_prometheus(profiler, export_path)
+        except OSError as e:
+            print(f"导出耗时统计失败: {e}", file=sys.stderr)
+    return result
+
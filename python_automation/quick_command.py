@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+快速启动入口 - 每条命令启动一个Python进程时，缩短无AI规则命令的冷启动时间
+
+    python quick_command.py --command "打开淘宝搜索手机" --no-ai [--ipc-port 3001]
+
+不使用AI的搜索/导航命令只需要规则解析和一次本地POST，这里只导入socket和规则引擎，
+不加载requests、传输层、SQLite等模块（http.client也会连带导入ssl和email，约20ms），
+启动时也不创建子进程。搜索仍由服务器在首页输入完成：直接打开结果页（site_registry）需要
+轮询确认结果出现，等待器依赖传输层（requests），不在快速路径上加载。
+其他情况（启用AI、点击结果需要选择器经验库、多实例、批量/常驻模式等）原样交给
+webview_automation.main() 处理，命令行参数与其完全相同。
+"""
+
+import json
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+from command_rules import parse_command
+
+DEFAULT_IPC_PORT = 3001
+IPC_TIMEOUT = 30
+# 快速路径能处理的参数，出现其他参数时交给完整的控制器
+_VALUE_OPTIONS = ("--command", "--ipc-port", "--ai-api", "--selector-store")
+_FLAG_OPTIONS = ("--no-ai", "--no-selector-store")
+
+
+def parse_quick_args(argv: List[str]) -> Optional[Dict[str, Any]]:
+    """解析快速路径支持的参数，不属于快速路径的命令行返回None"""
+    options: Dict[str, Any] = {}
+    index = 0
+    while index < len(argv):
+        name, has_value, value = argv[index].partition("=")
+        if name in _FLAG_OPTIONS and not has_value:
+            options[name] = True
+        elif name in _VALUE_OPTIONS:
+            if not has_value:
+                index += 1
+                if index >= len(argv):
+                    return None
+                value = argv[index]
+            options[name] = value
+        else:
+            return None
+        index += 1
+
+    if not options.get("--command"):
+        return None
+    # 配置了AI接口且没有禁用AI时需要AI分析
+    if options.get("--ai-api") and not options.get("--no-ai"):
+        return None
+    try:
+        port = int(options.get("--ipc-port", DEFAULT_IPC_PORT))
+    except ValueError:
+        return None
+    return {"command": options["--command"], "ipc_port": port}
+
+
+def post_ipc(port: int, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    发送一次IPC请求，错误信息与WebViewAutomation.send_ipc_command一致
+
+    使用HTTP/1.0：服务器不使用分块编码，发送完响应即关闭连接，读到连接关闭就是完整响应。
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"POST /api/webview/{endpoint} HTTP/1.0\r\n"
+        f"Host: localhost:{port}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii")
+    try:
+        with socket.create_connection(("localhost", port), timeout=IPC_TIMEOUT) as connection:
+            connection.sendall(head + body)
+            chunks = []
+            while True:
+                chunk = connection.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        header, _, content = b"".join(chunks).partition(b"\r\n\r\n")
+        status = int(header.split(None, 2)[1])
+        text = content.decode("utf-8", errors="replace")
+        if status == 200:
+            return json.loads(text)
+        return {"success": False, "error": f"HTTP {status}: {text}"}
+    except ConnectionRefusedError:
+        return {"success": False, "error": "无法连接到Electron应用，请确保应用正在运行"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def run_quick_command(command: str, ipc_port: int = DEFAULT_IPC_PORT) -> Optional[Dict[str, Any]]:
+    """
+    按规则执行搜索/导航命令
+
+    Returns:
+        执行结果；点击等需要完整控制器的命令返回None
+    """
+    parsed = parse_command(command)
+    if parsed.error:
+        return {"success": False, "message": parsed.error}
+    if parsed.action == "search":
+        return post_ipc(ipc_port, "search", {"query": parsed.query, "site": parsed.site})
+    if parsed.action == "navigate":
+        return post_ipc(ipc_port, "navigate", {"url": parsed.url})
+    return None
+
+
+def main():
+    """主函数"""
+    options = parse_quick_args(sys.argv[1:])
+    result = run_quick_command(options["command"], options["ipc_port"]) if options else None
+    if result is None:
+        from webview_automation import main as full_main
+        full_main()
+        return
+
+    if sys.platform.startswith('win'):
+        sys.stdout.reconfigure(encoding='utf-8')
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+重试策略 - 按错误类别决定是否重试、重试几次、等待多久，并受整条命令的截止时间约束
+
+    - classify() 把一次失败的结果归入错误类别，RULES 为每个类别配置最多尝试次数和退避参数；
+      不可能通过重试恢复的错误（熔断、4xx、超时、截止时间已到）不重试
+    - 退避时间按指数增长并加入随机抖动，避免多个实例同时重试
+    - Deadline 保存在ContextVar中，由命令入口设置（deadline_scope），传输层的每个IPC/AI请求
+      都把超时截短到剩余时间，时间用完或被取消时请求直接失败（error_code为DEADLINE_EXCEEDED/CANCELLED）
+
+批量模式下并发执行的命令各有自己的截止时间；后台预取服务于之后的命令，提交时去掉截止时间
+（clear_deadline），不受当前命令的时间预算约束。
+"""
+
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional
+
+import requests
+
+from circuit_breaker import CIRCUIT_OPEN
+
+DEADLINE_EXCEEDED = "DEADLINE_EXCEEDED"
+CANCELLED = "CANCELLED"
+CONNECTION_ERROR = "CONNECTION_ERROR"
+TIMEOUT = "TIMEOUT"
+
+
+class DeadlineError(requests.exceptions.RequestException):
+    """命令的时间预算已用完或已被取消，请求没有发出"""
+
+    error_code = DEADLINE_EXCEEDED
+
+
+class DeadlineExceededError(DeadlineError):
+    error_code = DEADLINE_EXCEEDED
+
+
+class CancelledError(DeadlineError):
+    error_code = CANCELLED
+
+
+class Deadline:
+    """一条命令的截止时间，可以从其他线程取消（线程安全）"""
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None):
+        """
+        Args:
+            seconds: 时间预算（秒），None表示不限时（仍可取消）
+            parent: 外层截止时间，更早到期时以外层为准，外层取消时本截止时间也视为取消
+        """
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None and (
+                self.expires_at is None or parent.expires_at < self.expires_at):
+            self.expires_at = parent.expires_at
+        self.parent = parent
+        self._cancelled = threading.Event()
+        self.cancel_reason: Optional[str] = None
+
+    def remaining(self) -> Optional[float]:
+        """剩余时间（秒），不限时返回None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def cancel(self, reason: str = "命令已取消"):
+        self.cancel_reason = reason
+        self._cancelled.set()
+
+    def check(self):
+        """已取消或已到截止时间时抛出异常"""
+        if self.cancelled:
+            raise CancelledError(self.cancel_reason or (self.parent and self.parent.cancel_reason) or "命令已取消")
+        if self.expired:
+            raise DeadlineExceededError("命令的时间预算已用完")
+
+    def cap(self, timeout: float) -> float:
+        """把单次请求的超时截短到剩余时间"""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def sleep(self, seconds: float) -> bool:
+        """等待（不超过剩余时间，取消时立即返回），返回是否可以继续执行"""
+        self._cancelled.wait(max(0.0, self.cap(seconds)))
+        return not self.cancelled and not self.expired
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("webview_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float] = None,
+                   deadline: Optional[Deadline] = None) -> Iterator[Deadline]:
+    """
+    在with块内设置当前截止时间
+
+    没有传入deadline时新建一个，嵌套使用时外层更早的截止时间和外层的取消仍然有效。
+    """
+    deadline = deadline or Deadline(seconds, parent=_current.get())
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def clear_deadline():
+    """去掉当前上下文的截止时间（在为后台任务复制的上下文中调用）"""
+    _current.set(None)
+
+
+def within_deadline(items: Iterable[Any]) -> Iterator[Any]:
+    """逐个产出items，每个之前检查当前截止时间（用于读取流式响应等单次超时约束不了总耗时的场合）"""
+    for item in items:
+        deadline = _current.get()
+        if deadline is not None:
+            deadline.check()
+        yield item
+
+
+def sleep(seconds: float) -> bool:
+    """受当前截止时间约束的sleep，返回是否可以继续执行"""
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return True
+    return deadline.sleep(seconds)
+
+
+def interrupted(result: Dict[str, Any]) -> bool:
+    """结果是否因时间预算用完或命令被取消而失败（不说明指令或选择器本身有问题）"""
+    return result.get("error_code") in (DEADLINE_EXCEEDED, CANCELLED)
+
+
+class RetryRule(NamedTuple):
+    """一个错误类别的重试规则"""
+    max_attempts: int          # 最多尝试次数（含第一次），1表示不重试
+    base_delay: float = 0.0    # 第一次重试前的等待（秒），之后每次翻倍
+    max_delay: float = 0.0     # 单次等待的上限（秒）
+    wait_for_element: bool = False  # 重试前等待目标元素出现，出现即重试
+
+
+RULES: Dict[str, RetryRule] = {
+    # 元素还没渲染出来：等元素出现就重试
+    "element_missing": RetryRule(3, 0.3, 2.0, wait_for_element=True),
+    # 服务器内部错误和连接被重置可能是暂时的
+    "server_error": RetryRule(3, 0.5, 4.0),
+    "connection": RetryRule(2, 0.5, 2.0),
+    "other": RetryRule(2, 0.5, 2.0),
+    # 重试不可能成功：后端熔断、请求本身有问题、已经等满一次超时、时间预算用完
+    "unavailable": RetryRule(1),
+    "client_error": RetryRule(1),
+    "timeout": RetryRule(1),
+    "deadline": RetryRule(1),
+}
+
+
+def classify(result: Dict[str, Any]) -> str:
+    """把一次失败的IPC结果归入错误类别"""
+    code = result.get("error_code")
+    if code == CIRCUIT_OPEN:
+        return "unavailable"
+    if code in (DEADLINE_EXCEEDED, CANCELLED):
+        return "deadline"
+    if code == CONNECTION_ERROR:
+        return "connection"
+    if code == TIMEOUT:
+        return "timeout"
+    status = result.get("status")
+    if isinstance(status, int):
+        return "server_error" if status >= 500 else "client_error"
+    # 页面脚本的失败原因在message中（如clickElement返回的“元素未找到”），其他错误在error中
+    reason = f"{result.get('error') or ''} {result.get('message') or ''}".lower()
+    if "未找到" in reason or "not found" in reason:
+        return "element_missing"
+    return "other"
+
+
+class RetryPolicy:
+    """按错误类别的重试规则和带抖动的指数退避"""
+
+    def __init__(self, rules: Optional[Dict[str, RetryRule]] = None, jitter: float = 0.5,
+                 rng: Optional[random.Random] = None):
+        """
+        初始化重试策略
+
+        Args:
+            rules: 覆盖默认规则的错误类别规则
+            jitter: 抖动比例，每次等待在 [1-jitter, 1] 倍的退避时间内随机取值
+            rng: 随机数生成器（测试和基准中可以固定种子）
+        """
+        self.rules = {**RULES, **(rules or {})}
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def rule_for(self, error_class: str) -> RetryRule:
+        return self.rules.get(error_class, self.rules["other"])
+
+    def should_retry(self, error_class: str, retries: int) -> bool:
+        """已经重试retries次后再次失败时是否还能重试（截止时间已到或已取消时不重试）"""
+        deadline = _current.get()
+        if deadline is not None and (deadline.cancelled or deadline.expired):
+            return False
+        return retries + 1 < self.rule_for(error_class).max_attempts
+
+    def delay(self, error_class: str, retry: int) -> float:
+        """第retry次重试（从1开始）前的等待时间"""
+        rule = self.rule_for(error_class)
+        backoff = min(rule.max_delay, rule.base_delay * (2 ** (retry - 1)))
+        return backoff * (1 - self.jitter * self.rng.random())
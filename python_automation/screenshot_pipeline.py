@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+截图处理 - 压缩截图并计算感知哈希
+
+IPC服务器返回的截图是完整分辨率的PNG data URL，动辄数MB。这里用Pillow按宽度缩放、
+可选裁剪到关注区域，再以JPEG重新编码到指定大小以内；同时计算64位差值哈希（dHash），
+用于判断两次分析之间页面外观是否变化。Pillow不可用时原样返回截图，哈希退化为内容摘要。
+"""
+
+import base64
+import hashlib
+import io
+from typing import Any, Dict, Optional, Tuple
+
+# Pillow加载需要十几毫秒，第一次处理截图时才导入；False表示已尝试但不可用
+_image_module: Any = None
+
+DEFAULT_MAX_WIDTH = 1280
+DEFAULT_MAX_BYTES = 200 * 1024
+DEFAULT_QUALITY = 80
+MIN_QUALITY = 40
+# 汉明距离不超过该值视为页面外观没有变化
+CHANGE_THRESHOLD = 4
+
+
+def _pil_image():
+    """按需导入PIL.Image，不可用时返回None"""
+    global _image_module
+    if _image_module is None:
+        try:
+            from PIL import Image
+        except ImportError:  # pragma: no cover - 取决于运行环境
+            Image = False
+        _image_module = Image
+    return _image_module or None
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """解析 data:image/...;base64,xxx 或纯base64字符串"""
+    encoded = data_url.split(",", 1)[1] if data_url.startswith("data:") else data_url
+    return base64.b64decode(encoded)
+
+
+def parse_crop(value: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """解析命令行的裁剪区域 X,Y,W,H"""
+    if not value:
+        return None
+    try:
+        x, y, width, height = (int(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError(f"无效的裁剪区域: {value}，应为 X,Y,W,H")
+    return x, y, width, height
+
+
+def dhash(image, size: int = 8) -> str:
+    """计算差值哈希，返回16位十六进制字符串"""
+    gray = image.convert("L").resize((size + 1, size), _pil_image().BILINEAR)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hash_distance(first: Optional[str], second: Optional[str]) -> Optional[int]:
+    """两个哈希的汉明距离，无法比较时返回None"""
+    if not first or not second or len(first) != len(second):
+        return None
+    # 退化的内容摘要（sha1）不相同时距离远大于阈值，同样适用
+    return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+
+class ScreenshotProcessor:
+    """截图压缩与变化检测"""
+
+    def __init__(self, max_width: int = DEFAULT_MAX_WIDTH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 quality: int = DEFAULT_QUALITY, crop: Optional[Tuple[int, int, int, int]] = None):
+        """
+        初始化截图处理器
+
+        Args:
+            max_width: 缩放后的最大宽度（像素）
+            max_bytes: 压缩后图片的大小上限（字节，不含base64膨胀）
+            quality: 初始JPEG质量，超出大小上限时逐步降低
+            crop: 关注区域 (x, y, width, height)，为空时保留整张截图
+        """
+        self.max_width = max_width
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.crop = crop
+        # 最近一次的处理结果，已压缩的截图再次传入时直接返回
+        self._last: Optional[Dict[str, Any]] = None
+
+    def process(self, data_url: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        处理截图
+
+        Returns:
+            {"data_url", "hash", "width", "height", "original_bytes", "bytes"}，截图为空时返回None
+        """
+        if not data_url:
+            return None
+        if self._last and data_url == self._last["data_url"]:
+            return self._last
+
+        raw = decode_data_url(data_url)
+        if _pil_image() is None:
+            info = {
+                "data_url": data_url,
+                "hash": hashlib.sha1(raw).hexdigest(),
+                "width": None,
+                "height": None,
+                "original_bytes": len(raw),
+                "bytes": len(raw)
+            }
+        else:
+            info = self._compress(raw)
+        self._last = info
+        return info
+
+    def _compress(self, raw: bytes) -> Dict[str, Any]:
+        Image = _pil_image()
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+        if self.crop:
+            x, y, width, height = self.crop
+            box = (max(0, x), max(0, y), min(image.width, x + width), min(image.height, y + height))
+            if box[0] < box[2] and box[1] < box[3]:
+                image = image.crop(box)
+        if image.mode not in ("RGB", "L"):
+            # 透明背景按白色合成，JPEG不支持alpha通道
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        if image.width > self.max_width:
+            image = image.resize((self.max_width, max(1, round(image.height * self.max_width / image.width))),
+                                 Image.LANCZOS)
+
+        image_hash = dhash(image)
+        encoded = self._encode_within_budget(image)
+        return {
+            "data_url": "data:image/jpeg;base64," + base64.b64encode(encoded).decode("ascii"),
+            "hash": image_hash,
+            "width": image.width,
+            "height": image.height,
+            "original_bytes": len(raw),
+            "bytes": len(encoded)
+        }
+
+    def _encode_within_budget(self, image) -> bytes:
+        """先降低质量，仍然超出时缩小尺寸"""
+        quality = self.quality
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            encoded = buffer.getvalue()
+            if len(encoded) <= self.max_bytes or image.width <= 160:
+                return encoded
+            if quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 10)
+            else:
+                image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)),
+                                     _pil_image().LANCZOS)
+
+    def is_unchanged(self, first: Optional[str], second: Optional[str]) -> bool:
+        """根据感知哈希判断两张截图外观是否相同"""
+        distance = hash_distance(first, second)
+        return distance is not None and distance <= CHANGE_THRESHOLD
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+选择器经验库 - 按网站记录每个选择器的成败和耗时，优先尝试过去成功率最高的选择器
+
+每次点击/输入尝试都会记录到SQLite（与意图缓存共用缓存目录），计数按半衰期指数衰减，
+网站改版后旧经验会逐渐失去影响。同一用途（role，如 search_input、first_result）的选择器
+互为备选，执行时按平滑后的成功率排序，连续失败的“死”选择器排到最后且不再重试。
+
+只记录能说明选择器是否有效的结果（confirms_selector）：找不到请求的输入框时，页面脚本会改用 #q 等
+默认输入框并照常返回成功，只有结果中实际输入的元素正是所请求的选择器时，成功才计入经验。
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from intent_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_HALF_LIFE = 7 * 24 * 3600
+# 没有任何记录的选择器的先验成功率
+PRIOR_SCORE = 0.5
+# 衰减后的失败次数不少于该值且成功率低于DEAD_SCORE时视为失效
+DEAD_MIN_FAILURES = 3
+DEAD_SCORE = 0.2
+
+
+def domain_of(url: Optional[str]) -> str:
+    """从URL得到网站标识（去掉www.前缀的主机名）"""
+    if not url:
+        return ""
+    host = urlsplit(url if "//" in url else f"//{url}").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def confirms_selector(action: str, result: Dict[str, Any], selector: Optional[str]) -> bool:
+    """
+    IPC结果是否说明了选择器是否有效
+
+    点击只在请求的选择器找到元素时成功；输入成功时需要结果中实际输入的元素（element.selector）就是该选择器
+    """
+    if action != "input" or not result.get("success"):
+        return True
+    element = result.get("element")
+    return isinstance(element, dict) and element.get("selector") == selector
+
+
+class SelectorStore:
+    """按网站统计选择器成功率的持久化经验库"""
+
+    def __init__(self, db_path: Optional[str] = None, half_life_seconds: float = DEFAULT_HALF_LIFE):
+        """
+        初始化选择器经验库
+
+        Args:
+            db_path: SQLite文件路径，None表示默认缓存目录，":memory:"表示不持久化
+            half_life_seconds: 成败计数的衰减半衰期（秒）
+        """
+        if db_path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "selector_store.db")
+
+        self.db_path = db_path
+        self.half_life_seconds = half_life_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS selector_stats (
+                domain TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                successes REAL NOT NULL DEFAULT 0,
+                failures REAL NOT NULL DEFAULT 0,
+                latency_ms REAL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (domain, selector)
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS selector_roles (
+                domain TEXT NOT NULL,
+                role TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                PRIMARY KEY (domain, role, selector)
+            )
+        """)
+        self._db.commit()
+
+    def _decay(self, elapsed: float) -> float:
+        return math.pow(0.5, max(0.0, elapsed) / self.half_life_seconds)
+
+    def record(self, domain: str, selector: str, success: bool,
+               latency_ms: Optional[float] = None, role: Optional[str] = None):
+        """记录一次尝试的结果"""
+        if not domain or not selector:
+            return
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT successes, failures, latency_ms, updated_at FROM selector_stats WHERE domain = ? AND selector = ?",
+                (domain, selector)
+            ).fetchone()
+            successes, failures, latency, updated_at = row if row else (0.0, 0.0, None, now)
+            factor = self._decay(now - updated_at)
+            successes = successes * factor + (1 if success else 0)
+            failures = failures * factor + (0 if success else 1)
+            if success and latency_ms is not None:
+                # 只统计成功尝试的耗时，指数移动平均
+                latency = latency_ms if latency is None else latency * 0.7 + latency_ms * 0.3
+            self._db.execute(
+                "INSERT OR REPLACE INTO selector_stats (domain, selector, successes, failures, latency_ms, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (domain, selector, successes, failures, latency, now)
+            )
+            if role:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO selector_roles (domain, role, selector) VALUES (?, ?, ?)",
+                    (domain, role, selector)
+                )
+            self._db.commit()
+
+    def _load(self, domain: str, selectors: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        selectors = list(selectors)
+        if not selectors:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(selectors))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT selector, successes, failures, latency_ms, updated_at FROM selector_stats "
+                f"WHERE domain = ? AND selector IN ({placeholders})",
+                [domain, *selectors]
+            ).fetchall()
+        stats = {}
+        for selector, successes, failures, latency, updated_at in rows:
+            factor = self._decay(now - updated_at)
+            successes, failures = successes * factor, failures * factor
+            stats[selector] = {
+                "successes": successes,
+                "failures": failures,
+                "latency_ms": latency,
+                # 拉普拉斯平滑，记录越少越接近先验值
+                "score": (successes + PRIOR_SCORE) / (successes + failures + 1)
+            }
+        return stats
+
+    def rank(self, domain: str, candidates: Iterable[str]) -> List[str]:
+        """按成功率从高到低排列候选选择器，分数相同时耗时短的优先，其余保持原顺序"""
+        candidates = list(dict.fromkeys(c for c in candidates if c))
+        stats = self._load(domain, candidates)
+
+        def key(selector):
+            entry = stats.get(selector)
+            if entry is None:
+                return (-PRIOR_SCORE, 0.0)
+            return (-round(entry["score"], 3), entry["latency_ms"] or 0.0)
+
+        return sorted(candidates, key=key)
+
+    def candidates(self, domain: str, role: Optional[str], defaults: Iterable[str] = (),
+                   limit: int = 5) -> List[str]:
+        """默认选择器加上该用途下学到的选择器，排序后返回前limit个"""
+        selectors = list(defaults)
+        if role:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT selector FROM selector_roles WHERE domain = ? AND role = ?", (domain, role)
+                ).fetchall()
+            selectors += [row[0] for row in rows]
+        return self.rank(domain, selectors)[:limit]
+
+    def is_dead(self, domain: str, selector: str) -> bool:
+        """选择器近期屡次失败、几乎从未成功时返回True"""
+        entry = self._load(domain, [selector]).get(selector)
+        return bool(entry) and entry["failures"] >= DEAD_MIN_FAILURES and entry["score"] < DEAD_SCORE
+
+    def get_stats(self, domain: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出（某个网站的）全部选择器统计，按成功率排序"""
+        with self._lock:
+            if domain:
+                rows = self._db.execute("SELECT DISTINCT domain, selector FROM selector_stats WHERE domain = ?",
+                                        (domain,)).fetchall()
+            else:
+                rows = self._db.execute("SELECT DISTINCT domain, selector FROM selector_stats").fetchall()
+        report = []
+        for row_domain in sorted({r[0] for r in rows}):
+            stats = self._load(row_domain, [r[1] for r in rows if r[0] == row_domain])
+            for selector, entry in stats.items():
+                report.append({
+                    "domain": row_domain,
+                    "selector": selector,
+                    "successes": round(entry["successes"], 3),
+                    "failures": round(entry["failures"], 3),
+                    "latency_ms": entry["latency_ms"],
+                    "score": round(entry["score"], 4)
+                })
+        return sorted(report, key=lambda e: (e["domain"], -e["score"]))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+搜索网站登记表 - 已知网站的搜索结果页地址，搜索只需一次导航
+
+原先的搜索流程是打开首页、等待、在搜索框输入再等待提交后的页面加载。对登记了结果页地址模板的网站，
+直接导航到 结果页?关键词=... 并等待结果列表出现即可；结果页没有就绪时回退到交互式流程，
+被重定向到登录页等其他页面时不等到超时，页面加载完成即回退。没有结果页模板的网站直接使用交互式流程。
+
+网站标识与规则引擎（command_rules.extract_search_info）识别的网站一致。
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote_plus
+
+DIRECT_READY_TIMEOUT = 8.0
+INTERACTIVE_READY_TIMEOUT = 10.0
+
+
+class SearchSite(NamedTuple):
+    """一个网站的搜索配置"""
+    name: str                          # 显示名称
+    home_url: str                      # 首页（交互式搜索的起点）
+    results_url: Optional[str]         # 结果页地址模板，{query}处填入编码后的关键词；None表示只能交互式搜索
+    encoding: str                      # 关键词的编码
+    results_marker: str                # 结果页URL中一定包含的文本，用于识别重定向
+    ready_selectors: Tuple[str, ...]   # 结果页就绪的标志元素（任一出现即可）
+    input_selectors: Tuple[str, ...]   # 交互式搜索的搜索框（按优先级）
+
+
+SITES: Dict[str, SearchSite] = {
+    'taobao': SearchSite(
+        name='淘宝',
+        home_url='https://www.taobao.com',
+        results_url='https://s.taobao.com/search?q={query}',
+        encoding='utf-8',
+        results_marker='s.taobao.com',
+        ready_selectors=('#content_items_wrapper', '.m-itemlist', '[class*="contentInner"]'),
+        input_selectors=('#q', 'input[name="q"]', '.search-combobox-input')
+    ),
+    'jd': SearchSite(
+        name='京东',
+        home_url='https://www.jd.com',
+        results_url='https://search.jd.com/Search?keyword={query}&enc=utf-8',
+        encoding='utf-8',
+        results_marker='search.jd.com',
+        ready_selectors=('#J_goodsList', '.gl-warp'),
+        input_selectors=('#key', 'input[name="keyword"]')
+    ),
+    'baidu': SearchSite(
+        name='百度',
+        home_url='https://www.baidu.com',
+        results_url='https://www.baidu.com/s?wd={query}',
+        encoding='utf-8',
+        results_marker='baidu.com/s',
+        ready_selectors=('#content_left', '#container .result'),
+        input_selectors=('#kw', 'input[name="wd"]')
+    ),
+    'google': SearchSite(
+        name='谷歌',
+        home_url='https://www.google.com',
+        results_url='https://www.google.com/search?q={query}',
+        encoding='utf-8',
+        results_marker='google.com/search',
+        ready_selectors=('#search', '#rso'),
+        input_selectors=('textarea[name="q"]', 'input[name="q"]')
+    ),
+    'bing': SearchSite(
+        name='必应',
+        home_url='https://www.bing.com',
+        results_url='https://www.bing.com/search?q={query}',
+        encoding='utf-8',
+        results_marker='bing.com/search',
+        ready_selectors=('#b_results',),
+        input_selectors=('#sb_form_q', 'input[name="q"]')
+    ),
+}
+
+
+def get_site(site: Optional[str]) -> Optional[SearchSite]:
+    return SITES.get((site or '').lower())
+
+
+def results_url(site: Optional[str], query: str) -> Optional[str]:
+    """网站搜索结果页的地址，网站未登记或没有结果页模板时返回None"""
+    spec = get_site(site)
+    if spec is None or not spec.results_url or not query:
+        return None
+    return spec.results_url.format(query=quote_plus(query, encoding=spec.encoding))
+
+
+def ready_condition(site: Optional[str], from_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    结果页就绪的等待条件：URL仍是结果页，且任一结果列表元素出现
+
+    页面加载完成但URL不是结果页（被重定向到登录页、验证页）时立即停止等待（fail_if）。
+    from_url 为导航前的URL：导航还没有生效时探测到的仍是原页面，URL变化之后才判断重定向；
+    在已确认导航生效的等待步骤中可以省略。
+    """
+    spec = get_site(site)
+    conditions: List[Dict[str, Any]] = [{"type": "url_contains", "value": spec.results_marker}]
+    if spec.ready_selectors:
+        conditions.append({
+            "type": "any",
+            "conditions": [{"type": "selector", "selector": selector} for selector in spec.ready_selectors]
+        })
+    redirected: List[Dict[str, Any]] = [{"type": "loaded"}, {"type": "url_lacks", "value": spec.results_marker}]
+    if from_url:
+        redirected.insert(0, {"type": "url_changed", "from": from_url})
+    return {"type": "all", "conditions": conditions, "fail_if": {"type": "all", "conditions": redirected}}
+
+
+def interactive_actions(site: str, query: str) -> List[Dict[str, Any]]:
+    """交互式搜索：打开首页、在搜索框输入（自动提交），等待结果页"""
+    spec = SITES[site]
+    return [
+        {
+            "action": "navigate",
+            "target": spec.home_url,
+            "description": f"导航到{spec.name}首页",
+            "order": 1
+        },
+        {
+            "action": "input",
+            "target": spec.input_selectors[0],
+            "alternatives": list(spec.input_selectors[1:]),
+            "role": "search_input",
+            "value": query,
+            "description": f"在搜索框输入并搜索: {query}",
+            "order": 2
+        },
+        {
+            "action": "wait",
+            "target": "",
+            "condition": {
+                "type": "all",
+                "conditions": [{"type": "url_contains", "value": spec.results_marker}, {"type": "loaded"}]
+            },
+            "timeout": INTERACTIVE_READY_TIMEOUT,
+            "description": "等待搜索结果页加载",
+            "order": 3
+        }
+    ]
+
+
+def search_plan(site: str, query: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    生成搜索计划
+
+    Returns:
+        {"actions": 优先执行的操作, "fallback_actions": actions未能完成时改用的交互式操作（可能为空）}
+    """
+    spec = SITES[site]
+    url = results_url(site, query)
+    if url is None:
+        return {"actions": interactive_actions(site, query), "fallback_actions": []}
+    return {
+        "actions": [
+            {
+                "action": "navigate",
+                "target": url,
+                "description": f"直接打开{spec.name}搜索结果页: {query}",
+                "order": 1
+            },
+            {
+                "action": "wait",
+                "target": "",
+                "condition": ready_condition(site),
+                "timeout": DIRECT_READY_TIMEOUT,
+                "description": "等待搜索结果出现",
+                "order": 2
+            }
+        ],
+        "fallback_actions": interactive_actions(site, query)
+    }
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+本地替身服务器 - 在没有Electron应用和模型服务的情况下模拟IPC服务器和AI接口
+
+    with StubIpcServer() as server, StubAiServer(plan) as ai:
+        automation = EnhancedWebViewAutomation(ipc_port=server.port)
+        automation.set_ai_api(ai.url)
+        ...
+        print(server.calls)
+
+两个服务器都可以模拟处理耗时和故障（benchmarks/suite.py 用它们测量端到端性能）：
+
+    server.latency = 0.005        # 每个请求的基础耗时（秒）
+    server.jitter = 0.002         # 额外的随机耗时上限（秒）
+    server.failure_rate = 0.05    # 以该概率返回HTTP 500
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _StubServer:
+    """替身服务器的公共部分：后台线程运行、上下文管理和请求记录"""
+
+    def __init__(self, port: int = 0):
+        self.calls: List[Dict[str, Any]] = []
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.failure_rate = 0.0
+        # 固定种子，同样的配置每次运行注入的耗时和故障相同
+        self.rng = random.Random(0)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, path: str, data: Dict[str, Any]):
+        with self._lock:
+            self.calls.append({"path": path, "data": data, "time": time.time()})
+
+    def call_paths(self) -> List[str]:
+        with self._lock:
+            return [call["path"] for call in self.calls]
+
+    def simulate(self) -> bool:
+        """按配置模拟请求的处理耗时，返回这次请求是否应当模拟失败"""
+        with self._lock:
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.failure_rate > 0 and self.rng.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    def _make_handler(self):
+        raise NotImplementedError
+
+
+class StubIpcServer(_StubServer):
+    """模拟 main/ipc-server.js 的本地HTTP服务器"""
+
+    def __init__(self, port: int = 0, batch_supported: bool = True,
+                 html: str = "<html><head><title>stub</title></head><body></body></html>"):
+        """
+        初始化替身服务器
+
+        Args:
+            port: 监听端口，0表示随机分配
+            batch_supported: 是否提供 /api/webview/batch 接口
+            html: extract-page-data 返回的页面HTML
+        """
+        self.batch_supported = batch_supported
+        self.html = html
+        self.screenshot = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        self.current_url = "about:blank"
+        # 选择器 -> 剩余失败次数，用于模拟元素暂时不可用
+        self.failing_selectors: Dict[str, int] = {}
+        # 页面中不存在的选择器，影响等待探测脚本的结果
+        self.missing_selectors = set()
+        self.ready_state = "complete"
+        # 接口路径 -> 模拟的处理耗时（秒）
+        self.delays: Dict[str, float] = {}
+        super().__init__(port)
+
+    # ---- 接口实现 ----
+
+    def handle(self, path: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """处理请求，返回None表示404"""
+        if path == "/api/health":
+            return {"success": True, "message": "IPC服务器运行正常", "webViewReady": True}
+        if path == "/api/capture-screenshot":
+            return {"success": True, "url": self.screenshot, "size": len(self.screenshot), "format": "base64"}
+        if path == "/api/extract-page-data":
+            return {"success": True, "html": self.html, "title": "stub", "url": self.current_url}
+        if path == "/api/webview/batch":
+            return self.handle_batch(data) if self.batch_supported else None
+        if path.startswith("/api/webview/"):
+            return self.handle_webview(path[len("/api/webview/"):], data)
+        return None
+
+    def handle_webview(self, endpoint: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if endpoint == "navigate":
+            if not data.get("url"):
+                return {"success": False, "error": "缺少URL参数"}
+            self.current_url = data["url"]
+            return {"success": True, "url": data["url"], "message": "导航命令已发送"}
+        if endpoint in ("click", "input", "submit"):
+            selector = data.get("selector")
+            with self._lock:
+                remaining = self.failing_selectors.get(selector, 0)
+                if remaining:
+                    self.failing_selectors[selector] = remaining - 1
+            if remaining:
+                # 与真实服务器一致：页面脚本找不到元素时原因在message中
+                return {"success": False, "message": "元素未找到"}
+            if endpoint == "input":
+                # 与真实服务器一致：返回实际输入的元素所用的选择器
+                return {"success": True, "message": "输入完成",
+                        "element": {"selector": selector, "tagName": "INPUT"}}
+            return {"success": True, "selector": selector}
+        if endpoint == "search":
+            return {"success": True, "query": data.get("query"), "site": data.get("site", "baidu")}
+        if endpoint == "execute-script":
+            return {"success": True, "result": self.probe_state(data.get("script", ""))}
+        if endpoint == "page-info":
+            return {"url": self.current_url, "title": "stub", "readyState": "complete"}
+        return None
+
+    def probe_state(self, script: str) -> Optional[Dict[str, Any]]:
+        """模拟 page_waiter 探测脚本的返回值，其他脚本返回None"""
+        if "__webviewWaiter" not in script:
+            return None
+        selectors = [
+            "".join(chr(int(code)) for code in codes.split(",") if code.strip())
+            for codes in re.findall(r"String\.fromCodePoint\(([\d,]*)\)", script)
+        ]
+        return {
+            "url": self.current_url,
+            "readyState": self.ready_state,
+            "found": [selector not in self.missing_selectors for selector in selectors],
+            "quietMs": 10000
+        }
+
+    def handle_batch(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """与 ipc-server.js 的 handleBatch 保持一致（不含重试等待）"""
+        steps = data.get("steps") or []
+        if not steps:
+            return {"success": False, "error": "缺少操作步骤"}
+
+        batch_start = time.perf_counter()
+        deadline = batch_start + data["deadlineMs"] / 1000 if data.get("deadlineMs") is not None else None
+        results = []
+        for index, step in enumerate(steps):
+            step_start = time.perf_counter()
+            if deadline is not None and step_start >= deadline:
+                results.append({
+                    "index": index, "action": step.get("action"), "success": False,
+                    "result": {"success": False, "error": "命令的时间预算已用完", "error_code": "DEADLINE_EXCEEDED"},
+                    "attempts": 0, "selector": step.get("target"), "elapsed_ms": 0
+                })
+                break
+            action = step.get("action")
+            selector = step.get("target")
+            attempts = 1
+            if action == "navigate":
+                result = self.handle_webview("navigate", {"url": step.get("target")})
+            elif action in ("click", "input"):
+                # 首选选择器之后依次尝试备选选择器
+                for attempts, selector in enumerate([step.get("target")] + list(step.get("alternatives") or []), 1):
+                    result = self.handle_webview(action, {"selector": selector, "text": step.get("value", "")})
+                    if result.get("success"):
+                        break
+            elif action == "submit":
+                result = self.handle_webview(action, {"selector": step.get("target")})
+            elif action == "wait" and step.get("condition"):
+                # 替身页面总是处于就绪状态
+                result = {"success": True, "message": "等待条件已满足", "elapsed_ms": 0, "polls": 1}
+            elif action == "wait":
+                seconds = float(step.get("value") or 2)
+                # 与真实服务器一致：等待不超过批量请求剩余的时间预算
+                time.sleep(max(0.0, min(seconds, deadline - time.perf_counter())) if deadline is not None else seconds)
+                result = {"success": True, "message": f"等待 {seconds} 秒"}
+            else:
+                result = {"success": False, "error": f"不支持的操作类型: {action}"}
+
+            results.append({
+                "index": index,
+                "action": action,
+                "success": bool(result and result.get("success")),
+                "result": result,
+                "attempts": attempts,
+                "selector": selector,
+                "elapsed_ms": round((time.perf_counter() - step_start) * 1000, 2)
+            })
+            if data.get("stopOnError") and not results[-1]["success"]:
+                break
+
+        return {
+            "success": any(r["success"] for r in results),
+            "results": results,
+            "completed": len(results),
+            "total": len(steps),
+            "elapsed_ms": round((time.perf_counter() - batch_start) * 1000, 2)
+        }
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和正文分两次写出，关闭Nagle算法以免与延迟ACK叠加出约40ms的等待
+            disable_nagle_algorithm = True
+
+            def _respond(self, status: int, body: Dict[str, Any]):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _dispatch(self, data: Dict[str, Any]):
+                path = urlparse(self.path).path
+                stub.record(path, data)
+                if stub.delays.get(path):
+                    time.sleep(stub.delays[path])
+                if stub.simulate():
+                    self._respond(500, {"success": False, "error": "模拟的服务器故障"})
+                    return
+                result = stub.handle(path, data)
+                if result is None:
+                    self._respond(404, {"success": False, "error": f"未找到处理器: {path}"})
+                else:
+                    self._respond(200, result)
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                self._dispatch({key: values[-1] for key, values in query.items()})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                try:
+                    data = json.loads(body) if body else {}
+                except json.JSONDecodeError:
+                    self._respond(500, {"success": False, "error": "Invalid JSON"})
+                    return
+                self._dispatch(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class StubAiServer(_StubServer):
+    """
+    模拟兼容chat-completions的AI接口
+
+    请求中 stream 为 true 时以SSE分块返回，每块之间间隔 chunk_delay 秒，模拟模型逐步生成；
+    否则等待 chunk_delay * 块数 后一次性返回完整内容。
+    """
+
+    def __init__(self, content: Any = None, port: int = 0, chunk_size: int = 24,
+                 chunk_delay: float = 0.05, stream_supported: bool = True):
+        """
+        初始化AI替身服务器
+
+        Args:
+            content: 模型回复，非字符串时按JSON序列化（如操作计划字典）
+            port: 监听端口，0表示随机分配
+            chunk_size: 流式返回时每块的字符数
+            chunk_delay: 每块的生成耗时（秒）
+            stream_supported: 为False时忽略stream参数，总是一次性返回
+        """
+        self.content = content if content is not None else {"success": True, "recommended_actions": []}
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.stream_supported = stream_supported
+        super().__init__(port)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def reply_text(self) -> str:
+        if isinstance(self.content, str):
+            return self.content
+        return json.dumps(self.content, ensure_ascii=False, indent=2)
+
+    def chunks(self) -> List[str]:
+        text = self.reply_text()
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和正文分两次写出，关闭Nagle算法以免与延迟ACK叠加出约40ms的等待
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length) or b"{}")
+                stub.record(urlparse(self.path).path, data)
+                chunks = stub.chunks()
+                if stub.simulate():
+                    payload = json.dumps({"error": {"message": "模拟的服务器故障"}}).encode("utf-8")
+                    self.send_response(500)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                if data.get("stream") and stub.stream_supported:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                    self.send_header("Cache-Control", "no-cache")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for piece in chunks:
+                        time.sleep(stub.chunk_delay)
+                        event = {"choices": [{"index": 0, "delta": {"content": piece}}], "model": "stub"}
+                        self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self._write_chunk(b"")
+                    return
+
+                time.sleep(stub.chunk_delay * len(chunks))
+                body = {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.reply_text()}}],
+                    "model": "stub"
+                }
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _write_chunk(self, data: bytes):
+                """按HTTP分块传输编码写出一块，空块表示结束"""
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""pytest公共配置：测试直接导入上一级目录中的模块，并提供替身服务器"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_servers import StubIpcServer  # noqa: E402
+
+
+@pytest.fixture
+def ipc():
+    with StubIpcServer() as server:
+        yield server
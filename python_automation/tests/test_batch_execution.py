@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""批量执行与服务器不支持批量接口（404）时的流水线回退"""
+
+from enhanced_webview_automation import EnhancedWebViewAutomation
+from http_transport import HttpTransport
+from stub_servers import StubIpcServer
+
+PLAN = [
+    {"action": "navigate", "target": "https://www.taobao.com", "description": "打开首页", "order": 1},
+    {"action": "input", "target": "#q", "value": "手机", "description": "输入关键词", "order": 2},
+    {"action": "click", "target": ".item a", "description": "打开第一个结果", "order": 3}
+]
+
+INDIVIDUAL_PATHS = ("/api/webview/navigate", "/api/webview/input", "/api/webview/click")
+
+
+def make_automation(ipc, **options):
+    return EnhancedWebViewAutomation(ipc_port=ipc.port, transport=options.pop("transport", None) or HttpTransport(),
+                                     optimize_plans=False, **options)
+
+
+def test_plan_runs_as_one_batch_request(ipc):
+    automation = make_automation(ipc)
+
+    outcome = automation.execute_action_plan(PLAN)
+
+    assert outcome["mode"] == "batch"
+    assert [r["success"] for r in outcome["results"]] == [True, True, True]
+    assert [r["action"] for r in outcome["results"]] == PLAN
+    assert ipc.call_paths() == ["/api/webview/batch"]
+    assert ipc.current_url == "https://www.taobao.com"
+
+
+def test_batch_404_falls_back_to_pipeline_and_is_remembered():
+    with StubIpcServer(batch_supported=False) as ipc:
+        automation = make_automation(ipc)
+
+        outcome = automation.execute_action_plan(PLAN)
+
+        assert outcome["mode"] == "pipeline"
+        assert [r["success"] for r in outcome["results"]] == [True, True, True]
+        assert automation.batch_supported is False
+        paths = ipc.call_paths()
+        assert paths.count("/api/webview/batch") == 1
+        assert [p for p in paths if p in INDIVIDUAL_PATHS] == list(INDIVIDUAL_PATHS)
+
+        # 探测结果已缓存，之后的计划不再请求批量接口
+        del ipc.calls[:]
+        assert automation.execute_action_plan(PLAN)["mode"] == "pipeline"
+        assert "/api/webview/batch" not in ipc.call_paths()
+
+
+def test_batch_read_timeout_marks_every_step_failed_without_rerun(ipc):
+    ipc.delays["/api/webview/batch"] = 1.0
+    automation = make_automation(ipc, transport=HttpTransport(timeouts={"batch": 0.2}))
+
+    outcome = automation.execute_action_plan(PLAN)
+
+    # 服务器可能已经执行了部分步骤，不能再逐个重新执行
+    assert outcome["mode"] == "batch"
+    assert len(outcome["results"]) == len(PLAN)
+    assert not any(r["success"] for r in outcome["results"])
+    assert not [p for p in ipc.call_paths() if p in INDIVIDUAL_PATHS]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""规则解析引擎的黄金语料：解析结果必须与语料中记录的结果一致"""
+
+import json
+import os
+
+import pytest
+
+import command_rules
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "benchmarks", "rule_golden_corpus.json")
+
+with open(CORPUS_PATH, encoding="utf-8") as f:
+    CORPUS = json.load(f)
+
+
+def describe(parsed: command_rules.ParsedCommand) -> dict:
+    """把解析结果转换成黄金语料中的格式（与 benchmarks/rule_engine_bench.py 相同）"""
+    if parsed.error:
+        return {"error": parsed.error}
+    if parsed.action == "search":
+        return {"action": "search", "query": parsed.query, "site": parsed.site}
+    if parsed.action == "navigate":
+        return {"action": "navigate", "url": parsed.url}
+    return {"action": "click", "selector": parsed.selector}
+
+
+def test_corpus_is_not_empty():
+    assert len(CORPUS) > 100
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[str(i) for i in range(len(CORPUS))])
+def test_rules_match_golden_corpus(entry):
+    command = entry["command"]
+    # 绕过解析缓存，每条命令都完整解析
+    assert command_rules.extract_search_info.__wrapped__(command) == (entry["site"], entry["query"])
+    assert describe(command_rules.parse_command.__wrapped__(command)) == entry["expected"]
+
+
+@pytest.mark.parametrize("entry", CORPUS[:50], ids=[str(i) for i in range(min(50, len(CORPUS)))])
+def test_cached_parse_matches_uncached(entry):
+    command = entry["command"]
+    assert command_rules.parse_command(command) == command_rules.parse_command.__wrapped__(command)
+    assert command_rules.extract_search_info(command) == command_rules.extract_search_info.__wrapped__(command)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""流式AI分析：操作按生成顺序执行，完整计划校验不一致时不补充执行"""
+
+import pytest
+
+from enhanced_webview_automation import EnhancedWebViewAutomation
+from http_transport import HttpTransport
+from stub_servers import StubAiServer
+
+
+def plan(*actions):
+    return {
+        "analysis": "搜索页面",
+        "elements_found": [],
+        "recommended_actions": list(actions),
+        "success": True,
+        "confidence": 0.9
+    }
+
+
+def run_streamed(ipc, reply, command="打开淘宝搜索手机"):
+    with StubAiServer(reply, chunk_size=16, chunk_delay=0) as ai:
+        automation = EnhancedWebViewAutomation(ipc_port=ipc.port, transport=HttpTransport(), stream_ai=True)
+        automation.set_ai_api(ai.url)
+        return automation.execute_ai_guided_task(command)
+
+
+def webview_calls(ipc, *endpoints):
+    return [(call["path"].rsplit("/", 1)[-1], call["data"].get("selector") or call["data"].get("url"))
+            for call in ipc.calls if call["path"].rsplit("/", 1)[-1] in endpoints]
+
+
+def test_streamed_actions_dispatch_in_plan_order(ipc):
+    reply = plan(
+        {"action": "navigate", "target": "https://www.taobao.com", "description": "打开首页", "order": 1},
+        {"action": "input", "target": "#q", "value": "手机", "description": "输入关键词", "order": 2},
+        {"action": "click", "target": ".item a", "description": "打开第一个结果", "order": 3}
+    )
+
+    summary = run_streamed(ipc, reply)
+
+    assert summary["execution_mode"] == "stream"
+    assert summary["plan_valid"] is True
+    assert all(r.get("streamed") for r in summary["action_results"])
+    assert webview_calls(ipc, "navigate", "input", "click") == [
+        ("navigate", "https://www.taobao.com"), ("input", "#q"), ("click", ".item a")
+    ]
+    # 所有操作都在流式阶段执行，不再提交批量请求
+    assert "/api/webview/batch" not in ipc.call_paths()
+
+
+def test_identical_streamed_actions_each_execute(ipc):
+    click = {"action": "click", "target": ".next", "description": "下一页"}
+    reply = plan({**click, "order": 1}, {**click, "order": 2})
+
+    summary = run_streamed(ipc, reply)
+
+    assert summary["plan_valid"] is True
+    assert len(summary["action_results"]) == 2
+    assert webview_calls(ipc, "click") == [("click", ".next"), ("click", ".next")]
+
+
+@pytest.mark.parametrize("orders", [(2, 1), (1, 3, 2)])
+def test_order_mismatch_is_reported_without_extra_execution(ipc, orders):
+    targets = ["#first", "#second", "#third"][:len(orders)]
+    reply = plan(*[
+        {"action": "click", "target": target, "description": target, "order": order}
+        for target, order in zip(targets, orders)
+    ])
+
+    summary = run_streamed(ipc, reply)
+
+    assert summary["plan_valid"] is False
+    # 流式阶段按回复中的先后顺序执行，每个操作只执行一次
+    assert webview_calls(ipc, "click") == [("click", target) for target in targets]
+    assert len(summary["action_results"]) == len(targets)
+    assert "/api/webview/batch" not in ipc.call_paths()
@@ -7,19 +7,27 @@ WebView自动化 - 通过IPC控制Electron应用内的webview
 import json
 import sys
 import os
-import re
 import requests
 import time
+from contextlib import redirect_stdout
 from typing import Dict, List, Optional, Any
 
+from command_rules import extract_search_info, parse_command
+from circuit_breaker import CIRCUIT_OPEN, CircuitOpenError
+from http_transport import HttpTransport, configure_shared_transport, get_shared_transport, parse_timeouts
+from instance_pool import InstancePool, parse_ports
+from page_waiter import PageWaiter
+from plan_decoder import decode_intent
+from profiler import profile_call, span
+from retry_policy import CONNECTION_ERROR, TIMEOUT, DeadlineError, deadline_scope, interrupted
+from selector_store import SelectorStore, confirms_selector, domain_of
+from site_registry import DIRECT_READY_TIMEOUT, ready_condition, results_url
+
 # 设置UTF-8编码
 if sys.platform.startswith('win'):
-    import locale
     import codecs
-    
-    # 设置控制台编码
-    os.system('chcp 65001 > nul')
-    
+
+    # 不再调用chcp切换控制台代码页：启动子进程要几十毫秒，而标准输出已经直接按UTF-8重新配置
     # 设置环境变量
     os.environ['PYTHONIOENCODING'] = 'utf-8'
     os.environ['LANG'] = 'zh_CN.UTF-8'
@@ -37,16 +45,29 @@ if sys.platform.startswith('win'):
 class WebViewAutomation:
     """WebView自动化控制器"""
     
-    def __init__(self, ipc_port=3001):
+    def __init__(self, ipc_port=3001, transport: Optional[HttpTransport] = None,
+                 intent_cache=None, selector_store: Optional[SelectorStore] = None, command_index=None,
+                 command_timeout: Optional[float] = None):
         """
         初始化WebView自动化控制器
         
         Args:
             ipc_port: IPC通信端口
+            transport: HTTP传输层，默认使用进程内共享的连接池
+            intent_cache: AI意图缓存（IntentCache），为空时每条命令都请求AI
+            selector_store: 选择器经验库，记录点击/输入的成败并为候选选择器排序
+            command_index: 相似命令索引（CommandIndex），措辞不同的命令复用已验证的AI指令
+            command_timeout: 每条命令的默认时间预算（秒），None表示只受各请求自身的超时限制
         """
         self.ipc_port = ipc_port
         self.base_url = f"http://localhost:{ipc_port}/api"
         self.ai_api_url = None
+        self.transport = transport or get_shared_transport()
+        self.intent_cache = intent_cache
+        self.selector_store = selector_store
+        self.command_index = command_index
+        self.command_timeout = command_timeout
+        self.waiter = PageWaiter(self.send_ipc_command)
         
 
     
@@ -68,11 +89,12 @@ class WebViewAutomation:
         """
         try:
             url = f"http://localhost:{self.ipc_port}/api/webview/{endpoint}"
-            response = requests.post(
+            response = self.transport.post(
                 url,
+                endpoint="ipc",
+                default_timeout=30,
                 json=kwargs,
-                headers={"Content-Type": "application/json"},
-                timeout=30
+                headers={"Content-Type": "application/json"}
             )
 
             if response.status_code == 200:
@@ -82,14 +104,34 @@ class WebViewAutomation:
                 error_msg = f"HTTP {response.status_code}: {response.text}"
                 return {
                     "success": False,
-                    "error": error_msg
+                    "error": error_msg,
+                    "status": response.status_code
                 }
 
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": f"Electron应用{e}",
+                "error_code": CIRCUIT_OPEN
+            }
+        except DeadlineError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": e.error_code
+            }
         except requests.exceptions.ConnectionError:
             error_msg = "无法连接到Electron应用，请确保应用正在运行"
             return {
                 "success": False,
-                "error": error_msg
+                "error": error_msg,
+                "error_code": CONNECTION_ERROR
+            }
+        except requests.exceptions.Timeout:
+            return {
+                "success": False,
+                "error": "IPC请求超时",
+                "error_code": TIMEOUT
             }
         except Exception as e:
             return {
@@ -102,8 +144,38 @@ class WebViewAutomation:
         return self.send_ipc_command("navigate", url=url)
 
     def search(self, query: str, site: str = "baidu") -> Dict[str, Any]:
-        """执行搜索操作"""
-        return self.send_ipc_command("search", query=query, site=site)
+        """
+        执行搜索操作
+
+        登记了结果页地址的网站直接打开搜索结果页，结果没有出现或被重定向到登录页等其他页面时
+        改由服务器在首页输入关键词搜索
+        """
+        url = results_url(site, query)
+        if url:
+            with span("direct_search", site=site):
+                before_url = self.waiter.current_url()
+                result = self.navigate(url)
+                ready = self.waiter.wait_for(ready_condition(site, before_url), timeout=DIRECT_READY_TIMEOUT) \
+                    if result.get("success") else None
+            if ready and ready["success"]:
+                return {
+                    "success": True,
+                    "query": query,
+                    "site": site,
+                    "url": url,
+                    "mode": "direct",
+                    "ready_ms": ready["elapsed_ms"]
+                }
+            failure = ready if ready is not None else result
+            if failure.get("error_code") == CIRCUIT_OPEN or interrupted(failure):
+                # Electron应用不可用或命令已停止，首页搜索同样会失败
+                return failure
+            print(f"↩️ 搜索结果页未就绪（{failure.get('error')}），改用首页搜索", file=sys.stderr)
+
+        result = self.send_ipc_command("search", query=query, site=site)
+        if result.get("success"):
+            result["mode"] = "interactive"
+        return result
 
     def click_element(self, selector: str) -> Dict[str, Any]:
         """点击元素"""
@@ -120,6 +192,10 @@ class WebViewAutomation:
     def get_page_info(self) -> Dict[str, Any]:
         """获取页面信息"""
         return self.send_ipc_command("page-info")
+
+    def get_transport_stats(self) -> Dict[str, Any]:
+        """获取HTTP连接复用统计"""
+        return self.transport.get_stats()
     
     def send_to_ai(self, prompt: str, context: str = "") -> Dict[str, Any]:
         """发送请求到AI模型"""
@@ -135,11 +211,12 @@ class WebViewAutomation:
                 "temperature": 0.7
             }
             
-            response = requests.post(
+            response = self.transport.post(
                 self.ai_api_url,
+                endpoint="ai",
+                default_timeout=30,
                 json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
+                headers={"Content-Type": "application/json"}
             )
             
             if response.status_code == 200:
@@ -155,25 +232,70 @@ class WebViewAutomation:
                     "error": f"AI API请求失败: {response.status_code}"
                 }
                 
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": f"AI服务{e}",
+                "error_code": CIRCUIT_OPEN
+            }
+        except DeadlineError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": e.error_code
+            }
         except Exception as e:
             return {
                 "success": False,
                 "error": f"AI请求异常: {str(e)}"
             }
     
-    def execute_universal_command(self, command: str, use_ai: bool = True) -> Dict[str, Any]:
+    def execute_universal_command(self, command: str, use_ai: bool = True,
+                                  timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         执行通用自然语言命令
         
         Args:
             command: 自然语言命令
             use_ai: 是否使用AI分析命令
+            timeout: 整条命令的时间预算（秒），默认使用command_timeout
             
         Returns:
             执行结果
         """
+        with deadline_scope(timeout if timeout is not None else self.command_timeout):
+            return self._execute_universal_command(command, use_ai)
+
+    def _execute_universal_command(self, command: str, use_ai: bool) -> Dict[str, Any]:
         try:
             if use_ai and self.ai_api_url:
+                # 重复命令直接使用缓存的指令，跳过AI请求
+                if self.intent_cache is not None:
+                    cached_instruction = self.intent_cache.get(command)
+                    if cached_instruction is not None:
+                        result = self._execute_ai_instruction(cached_instruction)
+                        if not result.get("success") and not interrupted(result):
+                            self.intent_cache.invalidate(command)
+                        elif self.command_index is not None:
+                            self.command_index.add(command, cached_instruction)
+                        return result
+
+                # 措辞不同的相似命令复用已验证的指令（换上本条命令的搜索词）
+                if self.command_index is not None:
+                    with span("similar_lookup"):
+                        similar = self.command_index.lookup(command)
+                    if similar is not None:
+                        print(f"🔁 复用相似命令的指令: {similar.command}（相似度 {similar.similarity}）", file=sys.stderr)
+                        result = self._execute_ai_instruction(similar.instruction)
+                        if not result.get("success"):
+                            if not interrupted(result):
+                                self.command_index.invalidate(similar.command)
+                        else:
+                            self.command_index.add(command, similar.instruction)
+                            if self.intent_cache is not None:
+                                self.intent_cache.put(command, similar.instruction)
+                        return result
+
                 # 使用AI分析命令意图
                 ai_prompt = f"""
                 请分析以下用户命令，并返回JSON格式的操作指令。请特别注意搜索场景的处理：
@@ -206,13 +328,18 @@ class WebViewAutomation:
 
                 ai_result = self.send_to_ai(ai_prompt)
                 if ai_result.get("success"):
-                    try:
-                        ai_instruction = json.loads(ai_result["content"])
-                        # 验证AI返回的置信度
-                        if ai_instruction.get("confidence", 0) > 0.7:
-                            return self._execute_ai_instruction(ai_instruction)
-                    except json.JSONDecodeError:
-                        pass
+                    decoded = decode_intent(ai_result["content"])
+                    if not decoded.ok:
+                        print(f"⚠️ AI返回的指令无法使用，改用规则分析: {'; '.join(decoded.errors)}", file=sys.stderr)
+                    # 验证AI返回的置信度（字符串形式的置信度已转换为数字）
+                    elif decoded.value.get("confidence", 0) > 0.7:
+                        ai_instruction = decoded.value
+                        result = self._execute_ai_instruction(ai_instruction)
+                        if result.get("success") and self.intent_cache is not None:
+                            self.intent_cache.put(command, ai_instruction)
+                        if result.get("success") and self.command_index is not None:
+                            self.command_index.add(command, ai_instruction)
+                        return result
             
             # 使用规则分析命令
             return self._execute_rule_based_command(command)
@@ -236,12 +363,9 @@ class WebViewAutomation:
             site = instruction.get("site", "baidu")
             return self.search(query, site)
         elif action == "click":
-            return self.click_element(instruction.get("target"))
+            return self._try_selectors("click", [instruction.get("target")])
         elif action == "input":
-            return self.input_text(
-                instruction.get("target"),
-                instruction.get("text", "")
-            )
+            return self._try_selectors("input", [instruction.get("target")], text=instruction.get("text", ""))
         else:
             return {
                 "success": False,
@@ -250,93 +374,43 @@ class WebViewAutomation:
     
     def _execute_rule_based_command(self, command: str) -> Dict[str, Any]:
         """基于规则分析并执行命令"""
-        command_lower = command.lower()
+        with span("rule_parse"):
+            parsed = parse_command(command)
 
-        # 搜索命令
-        if '搜索' in command or 'search' in command_lower:
-            # 智能提取搜索关键词和网站
-            site, query = self._extract_search_info(command)
+        if parsed.error:
+            return {"success": False, "message": parsed.error}
 
-            if not query:
-                return {"success": False, "message": "无法提取搜索关键词"}
-
-            return self.search(query, site)
-        
-        # 导航命令
-        elif '打开' in command or '访问' in command or 'navigate' in command_lower:
-            # 提取URL
-            url_match = re.search(r'(https?://[^\s]+)', command)
-            if url_match:
-                url = url_match.group(1)
-            elif '淘宝' in command:
-                url = 'https://www.taobao.com'
-            elif '百度' in command:
-                url = 'https://www.baidu.com'
-            elif '京东' in command:
-                url = 'https://www.jd.com'
-            else:
-                return {"success": False, "message": "无法确定要访问的网站"}
-            
-            return self.navigate(url)
-        
-        # 点击命令
-        elif '点击' in command or 'click' in command_lower:
-            if '第一' in command or 'first' in command_lower:
-                # 点击第一个搜索结果
-                return self.click_element('.result:first-child a, .c-container:first-child a')
-            else:
-                return {"success": False, "message": "暂不支持复杂的点击操作"}
-        
+        if parsed.action == "search":
+            return self.search(parsed.query, parsed.site)
+        elif parsed.action == "navigate":
+            return self.navigate(parsed.url)
         else:
-            return {"success": False, "message": f"无法理解命令: {command}"}
+            # 点击第一个搜索结果，各候选选择器按过去的成功率依次尝试
+            candidates = [selector.strip() for selector in parsed.selector.split(",")]
+            return self._try_selectors("click", candidates, role="first_result")
+
+    def _try_selectors(self, action: str, candidates: List[str], text: str = "",
+                       role: Optional[str] = None) -> Dict[str, Any]:
+        """按经验库排序依次尝试候选选择器，记录每次尝试的结果"""
+        if self.selector_store is None:
+            selector = ", ".join(candidates)
+            return self.click_element(selector) if action == "click" else self.input_text(selector, text)
+
+        domain = domain_of(self.get_page_info().get("url"))
+        result = {"success": False, "error": "没有可用的选择器"}
+        for selector in self.selector_store.candidates(domain, role, candidates):
+            start = time.perf_counter()
+            result = self.click_element(selector) if action == "click" else self.input_text(selector, text)
+            latency = round((time.perf_counter() - start) * 1000, 2)
+            if confirms_selector(action, result, selector):
+                self.selector_store.record(domain, selector, bool(result.get("success")), latency, role)
+            if result.get("success"):
+                return {**result, "selector": selector}
+        return result
 
     def _extract_search_info(self, command: str) -> tuple:
         """智能提取搜索网站和关键词"""
-        # 网站检测模式
-        site_patterns = {
-            'taobao': ['淘宝', 'taobao', '天猫', 'tmall'],
-            'jd': ['京东', 'jd', '京东商城'],
-            'baidu': ['百度', 'baidu'],
-            'google': ['谷歌', 'google'],
-            'bing': ['必应', 'bing']
-        }
-
-        # 默认网站
-        detected_site = 'baidu'
-
-        # 检测网站
-        command_lower = command.lower()
-        for site, patterns in site_patterns.items():
-            for pattern in patterns:
-                if pattern in command_lower:
-                    detected_site = site
-                    break
-            if detected_site != 'baidu':
-                break
-
-        # 提取搜索关键词的多种模式
-        query_patterns = [
-            r'搜索["""]?([^"""]+?)["""]?(?:在|$)',  # "搜索手机"
-            r'(?:在|用|打开).*?搜索["""]?([^"""]+)["""]?',  # "在淘宝搜索手机"
-            r'(?:查找|找|买)["""]?([^"""]+)["""]?',  # "买手机"
-            r'(?:淘宝|百度|京东|谷歌|必应).*?["""]?([^"""]+?)["""]?(?:怎么样|价格|评价|$)',  # "淘宝手机"
-        ]
-
-        query = ""
-        for pattern in query_patterns:
-            match = re.search(pattern, command)
-            if match:
-                query = match.group(1).strip()
-                break
-
-        # 如果没有匹配到，使用更宽泛的提取
-        if not query:
-            # 移除网站名称和动作词，剩下的作为搜索词
-            cleaned = re.sub(r'(在|用|打开|访问|去|到)?(淘宝|百度|京东|谷歌|必应|天猫|京东商城)?(搜索|查找|找|买|看|要)?', '', command).strip()
-            # 移除标点符号
-            query = re.sub(r'[，。！？、；：""''（）【】《》]', '', cleaned).strip()
-
-        return detected_site, query
+        return extract_search_info(command)
 
 def main():
     """主函数"""
@@ -347,19 +421,135 @@ def main():
     parser.add_argument('--ai-api', type=str, help='AI API地址')
     parser.add_argument('--no-ai', action='store_true', help='禁用AI分析')
     parser.add_argument('--ipc-port', type=int, default=3001, help='IPC通信端口')
+    parser.add_argument('--ipc-ports', type=str, metavar='PORTS',
+                        help='多个Electron实例的IPC端口（如 3001,3002 或 3001-3004），按健康状态和负载分发命令')
+    parser.add_argument('--server', action='store_true', help='以常驻服务模式运行，通过stdin/stdout处理JSON Lines请求')
+    parser.add_argument('--socket', type=str, help='常驻服务模式下监听的Unix Socket路径')
+    parser.add_argument('--pool-size', type=int, help='HTTP连接池每个主机保留的最大连接数')
+    parser.add_argument('--timeout', action='append', metavar='ENDPOINT=SECONDS',
+                        help='按端点类别设置超时，如 ipc=10、page_data=10、ai=60，可重复指定')
+    parser.add_argument('--circuit-threshold', type=int, default=3,
+                        help='IPC服务器或AI接口连续失败多少次后熔断（快速失败），0表示不熔断')
+    parser.add_argument('--circuit-reset', type=float, default=5.0, help='熔断后多久重新检查后端是否恢复（秒）')
+    parser.add_argument('--intent-cache', type=str, help='AI意图缓存的SQLite文件路径')
+    parser.add_argument('--no-intent-cache', action='store_true', help='禁用AI意图缓存')
+    parser.add_argument('--cache-ttl', type=float, default=7 * 24 * 3600, help='意图缓存有效期（秒）')
+    parser.add_argument('--similar-commands', type=int, default=200000,
+                        help='相似命令索引保留的命令数，0表示不复用相似命令的指令')
+    parser.add_argument('--similarity-threshold', type=float, default=0.4,
+                        help='复用相似命令的指令要求的最低相似度（0-1）')
+    parser.add_argument('--selector-store', type=str, help='选择器经验库的SQLite文件路径')
+    parser.add_argument('--no-selector-store', action='store_true', help='不记录和使用选择器成功率')
+    parser.add_argument('--command-timeout', type=float,
+                        help='每条命令的时间预算（秒），用完后不再发出请求和重试；请求中的timeout字段优先')
+    parser.add_argument('--profile', action='store_true', help='记录各阶段耗时并附加到结果JSON的profile字段')
+    parser.add_argument('--profile-export', type=str, metavar='FILE',
+                        help='把各阶段耗时累加到Prometheus文本格式的直方图文件（隐含--profile）')
+    parser.add_argument('--batch', type=str, metavar='FILE',
+                        help='从JSON Lines文件（-表示stdin）读取并批量执行命令，结果按完成顺序逐行输出')
+    parser.add_argument('--concurrency', type=int, help='批量模式下同时执行的命令数，默认为Electron实例数')
+    parser.add_argument('--batch-output', type=str, metavar='FILE',
+                        help='批量模式的结果文件（追加写入），重新运行时跳过已有结果的命令')
+    parser.add_argument('--retry-failed', action='store_true', help='续跑时重新执行之前失败的命令')
 
     args = parser.parse_args()
 
-    # 初始化自动化控制器
-    automation = WebViewAutomation(ipc_port=args.ipc_port)
-
-    if args.ai_api:
-        automation.set_ai_api(args.ai_api)
-
-    if args.command:
+    ports = parse_ports(args.ipc_ports)
+    # 批量模式默认每个Electron实例同时执行一条命令
+    concurrency = args.concurrency or max(len(ports), 1)
+
+    if args.pool_size or args.timeout or concurrency > 8 or (args.circuit_threshold, args.circuit_reset) != (3, 5.0):
+        configure_shared_transport(
+            pool_maxsize=max(args.pool_size or 8, concurrency),
+            timeouts=parse_timeouts(args.timeout),
+            circuit_threshold=args.circuit_threshold,
+            circuit_reset=args.circuit_reset
+        )
+    pool = InstancePool(ports) if ports else None
+
+    # 只有AI分析的结果需要缓存
+    intent_cache = None
+    if (args.ai_api or args.server or args.socket or args.batch) and not args.no_ai and not args.no_intent_cache:
+        from intent_cache import IntentCache
+        intent_cache = IntentCache(db_path=args.intent_cache, ttl_seconds=args.cache_ttl)
+    command_index = None
+    if (args.ai_api or args.server or args.socket or args.batch) and not args.no_ai and args.similar_commands > 0:
+        from command_index import CommandIndex
+        command_index = CommandIndex(threshold=args.similarity_threshold, max_entries=args.similar_commands)
+    selector_store = None if args.no_selector_store else SelectorStore(db_path=args.selector_store)
+
+    def create_automation(ipc_port: int) -> WebViewAutomation:
+        """创建自动化控制器，意图缓存和选择器经验库在实例之间共享"""
+        automation = WebViewAutomation(
+            ipc_port=ipc_port,
+            intent_cache=intent_cache,
+            selector_store=selector_store,
+            command_index=command_index,
+            command_timeout=args.command_timeout
+        )
+        if args.ai_api:
+            automation.set_ai_api(args.ai_api)
+        return automation
+
+    profile = args.profile or bool(args.profile_export)
+
+    def dispatch(run_on, session=None):
+        """在单个IPC端口或端口池选出的实例上执行"""
+        return run_on(args.ipc_port) if pool is None else pool.run(run_on, session=session)
+
+    def execute(automation: WebViewAutomation, request: Dict[str, Any]) -> Dict[str, Any]:
+        if request.get("ai_api"):
+            automation.set_ai_api(request["ai_api"])
+        use_ai = request.get("use_ai", not args.no_ai)
+        return profile_call(
+            lambda: automation.execute_universal_command(request["command"], use_ai=use_ai,
+                                                         timeout=request.get("timeout")),
+            enabled=request.get("profile", profile),
+            export_path=args.profile_export
+        )
+
+    if args.batch:
+        from batch_runner import run_batch
+
+        def run_one(request):
+            # 每条命令使用独立的控制器，请求中的ai_api只影响这一条命令
+            return dispatch(lambda port: execute(create_automation(port), request), request.get("session"))
+
+        run_batch(args.batch, run_one, concurrency=concurrency,
+                  output_path=args.batch_output, retry_failed=args.retry_failed)
+        if pool is not None:
+            print(json.dumps({"type": "instances", "instances": pool.get_stats()}, ensure_ascii=False),
+                  file=sys.stderr)
+    elif args.server or args.socket:
+        from automation_server import run_server
+
+        # 每个Electron实例一个常驻的自动化控制器
+        automations: Dict[int, WebViewAutomation] = {}
+
+        def runner(request):
+            def run_on(port):
+                if port not in automations:
+                    automations[port] = create_automation(port)
+                return execute(automations[port], request)
+
+            result = dispatch(run_on, request.get("session"))
+            if pool is not None and request.get("end_session"):
+                pool.end_session(request.get("session"))
+            return result
+
+        def stats():
+            snapshot = {"circuits": get_shared_transport().get_stats()["circuits"]}
+            if command_index is not None:
+                snapshot["similar_commands"] = command_index.get_stats()
+            if pool is not None:
+                snapshot["instances"] = pool.get_stats()
+            return snapshot
+
+        run_server(runner, name="webview_automation", socket_path=args.socket, stats=stats)
+    elif args.command:
         # 执行命令
-        use_ai = not args.no_ai
-        result = automation.execute_universal_command(args.command, use_ai=use_ai)
+        with redirect_stdout(sys.stderr if profile else sys.stdout):
+            result = dispatch(lambda port: execute(create_automation(port), {"command": args.command}))
         print(json.dumps(result, ensure_ascii=False, indent=2))
     else:
         print("请使用 --command 参数指定要执行的命令")